@@ -3,6 +3,12 @@ from source.checker import Checker
 from source.lexer import Lexer
 from source.ircode import IRCode
 from source.stack_machine import StackMachine
+from source.closure import ClosureMachine
+from source.pyback import PythonMachine
+from source.cback import CMachine
+from source.regvm import RegisterMachine
+from source.optimizer import Optimizer
+from source.inliner import Inliner
 from rich import print
 import json,os
 
@@ -21,6 +27,15 @@ def load_config():
 
 CONFIG = load_config()# Global configuration
 
+# Backends de ejecución, se seleccionan con "Backend" en settings/config.json
+backends = {
+    'stack': StackMachine,      # Intérprete de la máquina de pila
+    'closure': ClosureMachine,  # Funciones compiladas a closures de Python
+    'python': PythonMachine,    # IR traducido a código fuente Python
+    'c': CMachine,              # IR traducido a C y cargado con ctypes
+    'register': RegisterMachine,# IR de registros (tres direcciones)
+}
+
 def read_file(file_path):
     """Read the content of a file and return it as a string."""
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -52,8 +67,11 @@ def compile(file):
         systab = Checker.check(top,fileName)  # Perform semantic checks
         if debug:systab.print()  # Print the symbol table
         module = IRCode.gencode(statements, fileName)
+        if CONFIG.get("Optimize", True):
+            optimizer = Optimizer.optimize(module, Inliner.from_config(CONFIG))  # Optimizador de mirilla e inlining sobre el IR
+            if CONFIG.get("OptimizerStats", False): optimizer.report()
         if debug:module.dump()
-        vm = StackMachine()
+        vm = backends[CONFIG.get("Backend", "stack")]()  # Backend de ejecución
         vm.load_module(module)  # Cargar el módulo IR en la máquina virtual
         vm.run()  # Ejecutar el código IR
     except Exception as e:
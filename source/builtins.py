@@ -0,0 +1,45 @@
+# builtins.py
+'''
+Funciones incorporadas
+======================
+
+Funciones que el programa puede llamar sin declararlas. El checker las
+conoce desde una tabla de símbolos padre de la tabla global, así que se
+validan como cualquier otra llamada. IRCode no emite un CALL para ellas,
+sino directamente su instrucción IR:
+
+    free(addr int) int     ; FREE - libera un bloque asignado con ^n y
+                           ;        retorna cuántos bytes se liberaron
+    memset(addr int, value int, n int)
+                           ; MEMSET - llena n bytes con value
+    memcpy(dst int, src int, n int)
+                           ; MEMCPY - copia n bytes (las regiones pueden solaparse)
+    memcmp(a int, b int, n int) int
+                           ; MEMCMP - compara n bytes, retorna -1, 0 o 1
+
+memset y memcpy no retornan valor. Como toda llamada usada como
+instrucción termina en DROP, su código apila un 0 después de la
+instrucción, igual que el RET por defecto de una función sin tipo.
+
+Los nombres de las funciones incorporadas quedan reservados.
+'''
+from source.model  import Function, Parameter
+from source.symtab import Symtab
+
+# nombre: (parámetros [(nombre, tipo)], tipo de retorno, código IR)
+builtins = {
+	'free':   ([('addr', 'int')], 'int', [('FREE',)]),
+	'memset': ([('addr', 'int'), ('value', 'int'), ('n', 'int')], None, [('MEMSET',), ('CONSTI', 0)]),
+	'memcpy': ([('dst', 'int'), ('src', 'int'), ('n', 'int')], None, [('MEMCPY',), ('CONSTI', 0)]),
+	'memcmp': ([('a', 'int'), ('b', 'int'), ('n', 'int')], 'int', [('MEMCMP',)]),
+}
+
+def builtin_symtab():
+	'''
+	Crea la tabla de símbolos con las funciones incorporadas, para usarla
+	como padre de la tabla global.
+	'''
+	env = Symtab("builtins")
+	for name, (params, return_type, _) in builtins.items():
+		env.add(name, Function(True, name, [Parameter(pname, ptype) for pname, ptype in params], return_type, []))
+	return env
@@ -0,0 +1,572 @@
+# cback.py
+'''
+Backend de C
+============
+
+CMachine traduce el módulo IR a C portable (a partir de los árboles de
+source/irtree.py), lo compila con el compilador de C del sistema como
+biblioteca compartida y la carga con ctypes:
+
+* Cada función IR es una función de C (gox_f<índice>). Las variables
+  locales y temporales son variables de C: int64_t para 'I' y double
+  para 'F'. Las globales son variables estáticas del archivo.
+* La memoria es el mismo bytearray (o mmap) de la máquina, visto desde C
+  como un uint8_t*. PEEK/POKE son lecturas y escrituras tipadas con
+  memcpy, del tamaño de IntSize y FloatSize, con verificación de límites.
+* PRINT, GROW, free() y las funciones importadas llaman de vuelta a
+  Python (salida, Heap y funciones del anfitrión). Después de GROW la
+  memoria puede estar en otra dirección, así que se vuelve a pasar a C.
+* Los errores (acceso fuera de límites, división por cero, ...) hacen
+  longjmp a la función de entrada y se lanzan como la excepción que
+  lanzaría el intérprete.
+* C no tiene variables sin asignar: las locales empiezan en 0 y las
+  globales son estáticas. Las variables que se pueden leer antes de
+  asignarse (LinkedFunction.unassigned, LinkedModule.unassigned_globals)
+  llevan una bandera (sv<slot>, sg<slot>) que se marca al asignarlas, y leerlas sin
+  la bandera lanza el error del intérprete.
+
+Los enteros son de 64 bits (el intérprete usa enteros de Python sin
+límite) y la memoria se supone little-endian, igual que en
+source/memory.py.
+
+La biblioteca se guarda en un caché con el hash del código C y del
+comando de compilación como nombre, así que solo se vuelve a compilar
+cuando el IR cambia. Si no hay compilador de C, o la compilación falla,
+el módulo se ejecuta en el intérprete.
+
+    "Backend": "c"
+    "CCompiler": "cc"              ; Comando del compilador
+    "CFlags": ["-O2"]
+    "CCacheDir": "output/ccache"
+'''
+import ctypes
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import sys
+
+from source.stack_machine import CONFIG
+from source.closure import ClosureMachine
+from source.irtree import build_tree, TreeError
+
+_binops = {
+	'ADDI': '+', 'SUBI': '-', 'MULI': '*', 'ANDI': '&', 'ORI': '|',
+	'ADDF': '+', 'SUBF': '-', 'MULF': '*',
+	'LTI': '<', 'LEI': '<=', 'GTI': '>', 'GEI': '>=', 'EQI': '==', 'NEI': '!=',
+	'LTF': '<', 'LEF': '<=', 'GTF': '>', 'GEF': '>=', 'EQF': '==', 'NEF': '!=',
+}
+_ctypes = { 'I': 'int64_t', 'F': 'double' }
+_int_types = { 1: 'int8_t', 2: 'int16_t', 4: 'int32_t', 8: 'int64_t' }
+_float_types = { 4: 'float', 8: 'double' }
+
+# Códigos de error (gox_error)
+OOB, DIVI_ZERO, DIVF_ZERO, BYTE_VALUE, NEGATIVE_SIZE, CALLBACK, UNSET_LOCAL, UNSET_GLOBAL = 1, 2, 3, 4, 5, 6, 7, 8
+
+_prelude = """\
+#include <stdint.h>
+#include <string.h>
+#include <setjmp.h>
+
+typedef union { int64_t i; double f; } gox_value;
+
+static uint8_t *mem;
+static int64_t mem_top;
+static jmp_buf gox_env;
+const char *gox_error_op;
+int64_t gox_error_a, gox_error_b;
+
+static int (*rt_print_i)(int64_t);
+static int (*rt_print_f)(double);
+static int64_t (*rt_grow)(int64_t);
+static int64_t (*rt_free)(int64_t);
+static int (*rt_import)(int, gox_value *, gox_value *);
+
+void gox_set_memory(uint8_t *m, int64_t top) { mem = m; mem_top = top; }
+
+void gox_set_runtime(void *print_i, void *print_f, void *grow, void *free_, void *import)
+{
+    rt_print_i = (int (*)(int64_t))print_i;
+    rt_print_f = (int (*)(double))print_f;
+    rt_grow = (int64_t (*)(int64_t))grow;
+    rt_free = (int64_t (*)(int64_t))free_;
+    rt_import = (int (*)(int, gox_value *, gox_value *))import;
+}
+
+static void gox_fail(int code, const char *op, int64_t a, int64_t b)
+{
+    gox_error_op = op;
+    gox_error_a = a;
+    gox_error_b = b;
+    longjmp(gox_env, code);
+}
+
+static inline void gox_check(const char *op, int64_t a, int64_t size)
+{
+    if (size < 0)
+        gox_fail(NEGATIVE_SIZE, op, a, size);
+    if (a < 0 || a + size > mem_top)
+        gox_fail(OOB, op, a, size);
+}
+
+static inline int64_t gox_peeki(int64_t a)
+{
+    INT_T v;
+    gox_check("PEEKI", a, sizeof v);
+    memcpy(&v, mem + a, sizeof v);
+    return v;
+}
+
+static inline double gox_peekf(int64_t a)
+{
+    FLOAT_T v;
+    gox_check("PEEKF", a, sizeof v);
+    memcpy(&v, mem + a, sizeof v);
+    return v;
+}
+
+static inline int64_t gox_peekb(int64_t a)
+{
+    gox_check("PEEKB", a, 1);
+    return mem[a];
+}
+
+static inline void gox_pokei(int64_t a, int64_t value)
+{
+    INT_T v = (INT_T)value;
+    gox_check("POKEI", a, sizeof v);
+    memcpy(mem + a, &v, sizeof v);
+}
+
+static inline void gox_pokef(int64_t a, double value)
+{
+    FLOAT_T v = (FLOAT_T)value;
+    gox_check("POKEF", a, sizeof v);
+    memcpy(mem + a, &v, sizeof v);
+}
+
+static inline void gox_pokeb(int64_t a, int64_t value)
+{
+    gox_check("POKEB", a, 1);
+    if (value < 0 || value > 255)
+        gox_fail(BYTE_VALUE, "POKEB", value, 0);
+    mem[a] = (uint8_t)value;
+}
+
+/* Lectura de una variable sin asignar; op es su nombre */
+static int gox_unset(int code, const char *name)
+{
+    gox_fail(code, name, 0, 0);
+    return 0;
+}
+
+static inline int64_t gox_divi(int64_t a, int64_t b)
+{
+    int64_t q;
+    if (b == 0)
+        gox_fail(DIVI_ZERO, "DIVI", a, b);
+    /* Como // en Python: redondeo hacia abajo */
+    q = a / b;
+    if (a % b != 0 && (a < 0) != (b < 0))
+        q--;
+    return q;
+}
+
+static inline double gox_divf(double a, double b)
+{
+    if (b == 0.0)
+        gox_fail(DIVF_ZERO, "DIVF", 0, 0);
+    return a / b;
+}
+
+static void gox_print_i(int64_t v) { if (rt_print_i(v)) gox_fail(CALLBACK, "PRINT", 0, 0); }
+static void gox_print_f(double v) { if (rt_print_f(v)) gox_fail(CALLBACK, "PRINT", 0, 0); }
+
+static int64_t gox_grow(int64_t size)
+{
+    int64_t a = rt_grow(size);
+    if (a < 0)
+        gox_fail(CALLBACK, "GROW", size, 0);
+    return a;
+}
+
+static int64_t gox_free(int64_t a)
+{
+    int64_t size = rt_free(a);
+    if (size < 0)
+        gox_fail(CALLBACK, "FREE", a, 0);
+    return size;
+}
+
+static void gox_memset(int64_t a, int64_t value, int64_t size)
+{
+    gox_check("MEMSET", a, size);
+    if (value < 0 || value > 255)
+        gox_fail(BYTE_VALUE, "MEMSET", value, 0);
+    memset(mem + a, (int)value, (size_t)size);
+}
+
+static void gox_memcpy(int64_t dst, int64_t src, int64_t size)
+{
+    gox_check("MEMCPY", dst, size);
+    gox_check("MEMCPY", src, size);
+    memmove(mem + dst, mem + src, (size_t)size);
+}
+
+static int64_t gox_memcmp(int64_t a, int64_t b, int64_t size)
+{
+    int r;
+    gox_check("MEMCMP", a, size);
+    gox_check("MEMCMP", b, size);
+    r = memcmp(mem + a, mem + b, (size_t)size);
+    return (r > 0) - (r < 0);
+}
+
+static void gox_filli(int64_t a, int64_t value, int64_t count)
+{
+    INT_T v = (INT_T)value;
+    int64_t i;
+    gox_check("FILLI", a, count * (int64_t)sizeof v);
+    for (i = 0; i < count; i++)
+        memcpy(mem + a + i * (int64_t)sizeof v, &v, sizeof v);
+}
+
+static void gox_fillf(int64_t a, double value, int64_t count)
+{
+    FLOAT_T v = (FLOAT_T)value;
+    int64_t i;
+    gox_check("FILLF", a, count * (int64_t)sizeof v);
+    for (i = 0; i < count; i++)
+        memcpy(mem + a + i * (int64_t)sizeof v, &v, sizeof v);
+}
+
+static gox_value gox_import(int index, gox_value *args)
+{
+    gox_value result;
+    if (rt_import(index, args, &result))
+        gox_fail(CALLBACK, "CALL", index, 0);
+    return result;
+}
+"""
+
+def function_name(func):
+	return f"gox_f{func.index}"
+
+class CGenerator:
+	'''
+	Genera el código C de un módulo enlazado.
+	'''
+	def __init__(self, linked, int_size, float_size):
+		self.linked = linked
+		self.int_size = int_size
+		self.float_size = float_size
+
+	def module_source(self):
+		lines = [
+			f"/* Generado a partir del IR de '{self.linked.name}' */",
+			f"#define INT_T {_int_types[self.int_size]}",
+			f"#define FLOAT_T {_float_types[self.float_size]}",
+			f"enum {{ OOB = {OOB}, DIVI_ZERO, DIVF_ZERO, BYTE_VALUE, NEGATIVE_SIZE, CALLBACK, UNSET_LOCAL, UNSET_GLOBAL }};",
+			_prelude,
+		]
+		for slot, name in enumerate(self.linked.globals):
+			lines.append(f"static {_ctypes[self.linked.global_types[slot]]} g{slot};   /* {name} */")
+			if slot in self.linked.unassigned_globals:
+				lines.append(f"static uint8_t sg{slot};")
+		lines.append("")
+		functions = [func for func in self.linked.functions if not func.imported]
+		for func in functions:
+			lines.append(self.signature(func) + ";")
+		lines.append("")
+		for func in functions:
+			lines.extend(self.function_source(build_tree(func, self.linked)))
+			lines.append("")
+		main = self.linked.functions[self.linked.main]
+		lines.extend([
+			"int gox_main(gox_value *result)",
+			"{",
+			*(f"    sg{slot} = 0;" for slot in sorted(self.linked.unassigned_globals)),
+			"    int code = setjmp(gox_env);",
+			"    if (code)",
+			"        return code;",
+			f"    result->{'f' if main.return_type == 'F' else 'i'} = {function_name(main)}();",
+			"    return 0;",
+			"}",
+		])
+		return "\n".join(lines) + "\n"
+
+	def signature(self, func):
+		params = ", ".join(f"{_ctypes[func.slot_types[slot]]} v{slot}" for slot in range(func.nparams))
+		return f"static {self.ctype(func.return_type)} {function_name(func)}({params or 'void'})"
+
+	def ctype(self, ir_type):
+		return 'double' if ir_type == 'F' else 'int64_t'
+
+	def function_source(self, tree):
+		self.tree = tree
+		func = tree.func
+		self.lines = [f"/* {func.name} */", self.signature(func), "{"]
+		for slot in range(func.nparams, tree.nslots):
+			self.emit(1, f"{self.ctype(tree.slot_types[slot])} {self.local(slot)} = 0;")
+		for slot in sorted(func.unassigned):
+			self.emit(1, f"uint8_t sv{slot} = 0;")
+		self.block(tree.body, 1)
+		self.lines.append("}")
+		return self.lines
+
+	def local(self, slot):
+		return f"t{slot}" if slot in self.tree.temps else f"v{slot}"
+
+	def emit(self, depth, line):
+		self.lines.append("    " * depth + line)
+
+	# --- Instrucciones ---
+	def block(self, stmts, depth):
+		for stmt in stmts:
+			self.stmt(stmt, depth)
+
+	def stmt(self, stmt, depth):
+		kind = stmt[0]
+		if kind == 'assign':
+			self.emit(depth, f"{self.local(stmt[1])} = {self.expr(stmt[2])};")
+			if stmt[1] in self.tree.func.unassigned:
+				self.emit(depth, f"sv{stmt[1]} = 1;")
+		elif kind == 'gassign':
+			self.emit(depth, f"g{stmt[1]} = {self.expr(stmt[2])};")
+			if stmt[1] in self.linked.unassigned_globals:
+				self.emit(depth, f"sg{stmt[1]} = 1;")
+		elif kind == 'store':
+			self.emit(depth, f"gox_{stmt[1].lower()}({self.expr(stmt[2])}, {self.expr(stmt[3])});")
+		elif kind == 'print':
+			self.emit(depth, f"gox_print_{'f' if stmt[1] == 'PRINTF' else 'i'}({self.expr(stmt[2])});")
+		elif kind == 'mem':
+			args = ", ".join(self.expr(arg) for arg in stmt[2:])
+			self.emit(depth, f"gox_{stmt[1].lower()}({args});")
+		elif kind == 'expr':
+			self.emit(depth, f"(void)({self.expr(stmt[1])});")
+		elif kind == 'if':
+			self.emit(depth, f"if ({self.expr(stmt[1])}) {{")
+			self.block(stmt[2], depth + 1)
+			if stmt[3]:
+				self.emit(depth, "} else {")
+				self.block(stmt[3], depth + 1)
+			self.emit(depth, "}")
+		elif kind == 'loop':
+			self.emit(depth, "for (;;) {")
+			self.block(stmt[1], depth + 1)
+			self.emit(depth, "}")
+		elif kind == 'break_if':
+			self.emit(depth, f"if ({self.expr(stmt[1])}) break;")
+		elif kind == 'continue':
+			self.emit(depth, "continue;")
+		elif kind == 'return':
+			self.emit(depth, f"return {self.expr(stmt[1])};")
+		else:
+			raise TreeError(f"Unknown statement {kind}")
+
+	# --- Expresiones ---
+	def expr(self, expr):
+		kind = expr[0]
+		if kind == 'const':
+			value = expr[1]
+			if isinstance(value, float):
+				if not math.isfinite(value):
+					raise TreeError(f"Constant {value} has no C literal")
+				return f"{value!r}" if value >= 0 else f"({value!r})"
+			if not -2**63 <= value < 2**63:
+				raise TreeError(f"Constant {value} does not fit in 64 bits")
+			return f"INT64_C({value})"
+		if kind == 'local':
+			slot = expr[1]
+			if slot in self.tree.func.unassigned:
+				return f"(sv{slot} || gox_unset(UNSET_LOCAL, \"{self.tree.names[slot]}\"), {self.local(slot)})"
+			return self.local(slot)
+		if kind == 'global':
+			slot = expr[1]
+			if slot in self.linked.unassigned_globals:
+				return f"(sg{slot} || gox_unset(UNSET_GLOBAL, \"{self.linked.globals[slot]}\"), g{slot})"
+			return f"g{slot}"
+		if kind == 'binop':
+			op, left, right = expr[1], self.expr(expr[2]), self.expr(expr[3])
+			if op in ('DIVI', 'DIVF'):
+				return f"gox_{op.lower()}({left}, {right})"
+			if op in ('ADDI', 'SUBI', 'MULI'):
+				# Aritmética sin signo: el desbordamiento da la vuelta en lugar de ser indefinido
+				return f"(int64_t)((uint64_t){left} {_binops[op]} (uint64_t){right})"
+			return f"({left} {_binops[op]} {right})"
+		if kind == 'unop':
+			op, value = expr[1], self.expr(expr[2])
+			if op == 'ITOF':
+				return f"(double)({value})"
+			if op == 'FTOI':
+				return f"(int64_t)({value})"
+			if op == 'NEGI':
+				return f"(int64_t)(0 - (uint64_t){value})"
+			if op == 'NEGF':
+				return f"(-{value})"
+			if op == 'NOT':
+				return f"(int64_t)!({value})"
+			return f"gox_{op.lower()}({value})"
+		if kind == 'call':
+			func = self.linked.functions[expr[1]]
+			args = [self.expr(arg) for arg in expr[2]]
+			if not func.imported:
+				return f"{function_name(func)}({', '.join(args)})"
+			# Los argumentos de una función importada pasan como gox_value
+			values = ", ".join(f"{{ .{'f' if t == 'F' else 'i'} = {arg} }}" for t, arg in zip(func.parmtypes, args))
+			field = 'f' if func.return_type == 'F' else 'i'
+			return f"gox_import({func.index}, (gox_value[]){{ {values or '{ .i = 0 }'} }}).{field}"
+		if kind == 'builtin':
+			args = ", ".join(self.expr(arg) for arg in expr[2])
+			return f"gox_{expr[1].lower()}({args})"
+		raise TreeError(f"Unknown expression {kind}")
+
+class _Value(ctypes.Union):
+	_fields_ = [('i', ctypes.c_int64), ('f', ctypes.c_double)]
+
+_PRINT_I = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int64)
+_PRINT_F = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double)
+_HEAP_OP = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_int64)
+_IMPORT = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Value), ctypes.POINTER(_Value))
+
+class CMachine(ClosureMachine):
+	def __init__(self, output=None):
+		super().__init__(output)
+		self.source = None            # Código C generado
+		self.library = None           # Biblioteca cargada con ctypes
+		self.buffer = None            # Memoria exportada a C (ctypes sobre Heap.memory)
+		self.error = None             # Excepción lanzada en un callback
+
+	def compile_module(self):
+		compiler = shutil.which(CONFIG.get("CCompiler", "cc"))
+		if compiler is None or sys.byteorder != 'little':
+			self._log_debug("No C compiler available, running in the interpreter.")
+			return None
+		self.source = CGenerator(self.linked, self.INT_SIZE, self.FLOAT_SIZE).module_source()
+		path = self.build(compiler, self.source)
+		if path is None:
+			return None
+		self.library = ctypes.CDLL(path)
+		self.library.gox_main.argtypes = [ctypes.POINTER(_Value)]
+		self.library.gox_main.restype = ctypes.c_int
+		self.library.gox_set_memory.argtypes = [ctypes.c_void_p, ctypes.c_int64]
+		self.callbacks = (_PRINT_I(self._print), _PRINT_F(self._print), _HEAP_OP(self._grow), _HEAP_OP(self._free), _IMPORT(self._import))
+		self.library.gox_set_runtime(*self.callbacks)
+		compiled = [None] * len(self.functions)
+		compiled[self.linked.main] = self.run_main
+		return compiled
+
+	def build(self, compiler, source):
+		'''
+		Compila el código C a una biblioteca compartida en el caché y
+		retorna su ruta, o None si la compilación falla.
+		'''
+		flags = CONFIG.get("CFlags", ["-O2"])
+		command = [compiler, *flags, "-shared", "-fPIC"]
+		key = hashlib.sha256("\0".join([*command, source]).encode('utf-8')).hexdigest()[:24]
+		cache = CONFIG.get("CCacheDir", os.path.join("output", "ccache"))
+		if not os.path.isabs(cache):
+			cache = os.path.join(os.path.dirname(__file__), '..', cache)
+		path = os.path.abspath(os.path.join(cache, f"gox_{key}.so"))
+		if os.path.exists(path):
+			self._log_debug(f"Using cached C build {path}")
+			return path
+		os.makedirs(cache, exist_ok=True)
+		c_file = path[:-3] + ".c"
+		with open(c_file, 'w', encoding='utf-8') as f:
+			f.write(source)
+		partial = f"{path}.{os.getpid()}.tmp"
+		result = subprocess.run([*command, "-o", partial, c_file], capture_output=True, text=True)
+		if result.returncode != 0:
+			self._log_debug(f"C compilation failed, running in the interpreter:\n{result.stderr}")
+			return None
+		os.replace(partial, path)     # Otro proceso nunca ve una biblioteca a medias
+		return path
+
+	# --- Memoria compartida con C ---
+	def export_memory(self):
+		memory = self.heap.memory
+		self.buffer = (ctypes.c_ubyte * len(memory)).from_buffer(memory)
+		self.library.gox_set_memory(ctypes.addressof(self.buffer), self.heap.top)
+
+	def release_memory(self):
+		# Mientras exista la vista el bytearray/mmap no puede crecer
+		self.buffer = None
+
+	# --- Callbacks (retornan -1 o 1 si Python lanzó una excepción) ---
+	def _print(self, value):
+		try:
+			self.output.write(value)
+			return 0
+		except Exception as e:
+			self.error = e
+			return 1
+
+	def _grow(self, size):
+		try:
+			self.release_memory()
+			return self.heap.alloc(size)
+		except Exception as e:
+			self.error = e
+			return -1
+		finally:
+			self.export_memory()
+
+	def _free(self, address):
+		try:
+			return self.heap.free(address)
+		except Exception as e:
+			self.error = e
+			return -1
+
+	def _import(self, index, args, result):
+		try:
+			func = self.functions[index]
+			values = [args[i].f if t == 'F' else args[i].i for i, t in enumerate(func.parmtypes)]
+			value = self._call_imported(func, values)
+			if func.return_type == 'F':
+				result[0].f = value
+			else:
+				result[0].i = value
+			return 0
+		except Exception as e:
+			self.error = e
+			return 1
+
+	def run_main(self):
+		result = _Value()
+		self.error = None
+		self.export_memory()
+		try:
+			code = self.library.gox_main(ctypes.byref(result))
+		finally:
+			self.release_memory()
+		if code:
+			raise self.exception(code)
+		return result.f if self.functions[self.linked.main].return_type == 'F' else result.i
+
+	def exception(self, code):
+		op = ctypes.c_char_p.in_dll(self.library, "gox_error_op").value.decode('ascii')
+		a = ctypes.c_int64.in_dll(self.library, "gox_error_a").value
+		b = ctypes.c_int64.in_dll(self.library, "gox_error_b").value
+		if code == CALLBACK and self.error is not None:
+			return self.error
+		if code == OOB:
+			# Como en StackMachine: solo las operaciones sobre rangos informan el tamaño
+			if op.startswith(('PEEK', 'POKE')):
+				return IndexError(f"{op}: Memory access out of bounds. Address: {a}, Memory size: {self.heap.top}")
+			return IndexError(f"{op}: Memory access out of bounds. Address: {a}, Size: {b}, Memory size: {self.heap.top}")
+		if code == DIVI_ZERO:
+			return ZeroDivisionError("Integer division by zero")
+		if code == DIVF_ZERO:
+			return ZeroDivisionError("Floating point division by zero")
+		if code == BYTE_VALUE:
+			return ValueError(f"{op}: Byte value must be 0-255, got {a}")
+		if code == NEGATIVE_SIZE:
+			return ValueError(f"{op}: Size must be non-negative, got {b}")
+		if code == UNSET_LOCAL:
+			return ValueError(f"Local variable '{op}' accessed before assignment.")
+		if code == UNSET_GLOBAL:
+			return ValueError(f"Global variable '{op}' accessed before assignment.")
+		return RuntimeError(f"{op}: Error {code} in compiled code")
@@ -0,0 +1,644 @@
+# cfg.py
+'''
+Análisis de flujo de control y de datos
+=======================================
+
+Las optimizaciones del IR trabajan sobre IRFunction.code, una lista plana
+con marcadores estructurados (IF/ELSE/ENDIF, LOOP/CBREAK/ENDLOOP). Este
+módulo construye sobre esa lista el grafo de flujo de control (CFG) de
+bloques básicos y los análisis clásicos:
+
+    analysis = Analysis.of(func)
+    analysis.cfg                ; Bloques básicos y aristas
+    analysis.idom               ; Dominador inmediato de cada bloque
+    analysis.frontiers          ; Fronteras de dominancia
+    analysis.live_in/live_out   ; Locales vivas al entrar/salir de cada bloque
+    analysis.reaching(pc, x)    ; Definiciones de x que alcanzan la instrucción pc
+    analysis.unassigned_reads() ; Locales que se pueden leer sin asignar
+    unassigned_globals(module)  ; Globales que se pueden leer sin asignar
+    structure(code)             ; ELSE/ENDIF de cada IF y ENDLOOP de cada ciclo
+    to_ssa(func)                ; Forma SSA de las locales (SSAForm)
+    from_ssa(ssa)               ; De vuelta a IR
+
+Bloques
+-------
+Un bloque es un tramo code[start:end]. Terminan un bloque las
+instrucciones que saltan: IF, ELSE, LOOP, ENDLOOP, CBREAK,
+CBREAK_IF_FALSE, CONTINUE y RET. ENDIF y la instrucción después de LOOP
+(la cabeza del ciclo, destino de ENDLOOP y CONTINUE) empiezan uno. Las
+aristas siguen la semántica de la máquina de pila:
+
+    IF          ->  siguiente instrucción, y después del ELSE (o el ENDIF)
+    ELSE        ->  ENDIF
+    LOOP        ->  cabeza del ciclo
+    ENDLOOP     ->  cabeza del ciclo
+    CONTINUE    ->  cabeza del ciclo
+    CBREAK      ->  siguiente instrucción, y después del ENDLOOP
+    RET         ->  salida
+
+Si la condición de un IF o CBREAK es un CONSTI del mismo bloque, solo se
+agrega la arista que se toma. El último bloque (cfg.exit) es la salida:
+vacío, en len(code). Los valores que quedan en la pila entre bloques (el
+IF de && y ||) no se modelan; los análisis son sobre variables locales
+(LOCAL_GET/LOCAL_SET).
+
+Caché
+-----
+Analysis.of(func) guarda el análisis en func.analysis junto con una copia
+del código. Si el código cambió, o después de invalidate(func), se
+construye de nuevo. Los análisis se calculan la primera vez que se usan.
+
+SSA
+---
+to_ssa(func) renombra cada asignación de una local a una versión nueva
+(x.1, x.2, ...; x.0 es el valor de entrada) e inserta funciones PHI en la
+frontera de dominancia de las definiciones, solo donde la variable está
+viva (SSA podado):
+
+    ('PHI', 'x.3', (('x.1', bloque1), ('x.2', bloque2)))
+
+from_ssa(ssa) elimina las PHI y devuelve cada versión a su variable
+original. Eso es correcto mientras dos versiones de una misma variable
+no estén vivas a la vez (SSA convencional), que es lo que produce
+to_ssa; un PHI cuyos operandos son de otra variable se reemplaza por
+copias al final de los predecesores. from_ssa lanza ValueError si eso no
+es posible.
+'''
+_terminators = { 'IF', 'ELSE', 'LOOP', 'ENDLOOP', 'CBREAK', 'CBREAK_IF_FALSE', 'CONTINUE', 'RET' }
+
+def structure(code):
+	'''
+	Retorna (if_parts, loop_of) de los marcadores estructurados de code:
+
+	    if_parts    ; pc del IF -> (pc del ELSE o None, pc del ENDIF)
+	    loop_of     ; pc de LOOP, ENDLOOP, CBREAK y CONTINUE -> (pc del LOOP, pc del ENDLOOP)
+
+	Lanza ValueError si un IF o LOOP no se cierra.
+	'''
+	if_parts = { }
+	loop_of = { }
+	opened = []
+	for pc, instr in enumerate(code):
+		opname = instr[0]
+		if opname in ('IF', 'LOOP'):
+			opened.append([opname, pc, None, []])
+		elif opname == 'ELSE':
+			opened[-1][2] = pc
+		elif opname == 'ENDIF':
+			_, start, else_pc, _ = opened.pop()
+			if_parts[start] = (else_pc, pc)
+		elif opname in ('CBREAK', 'CBREAK_IF_FALSE', 'CONTINUE'):
+			next(block for block in reversed(opened) if block[0] == 'LOOP')[3].append(pc)
+		elif opname == 'ENDLOOP':
+			_, start, _, exits = opened.pop()
+			for other in exits + [start, pc]:
+				loop_of[other] = (start, pc)
+	if opened:
+		raise ValueError(f"{opened[-1][0]} sin cerrar en PC {opened[-1][1]}")
+	return if_parts, loop_of
+
+def loop_end(code, pc):
+	# PC del ENDLOOP que cierra el LOOP en `pc`
+	return structure(code)[1][pc][1]
+
+class BasicBlock:
+	def __init__(self, index, start, end):
+		self.index = index
+		self.start = start          # code[start:end]
+		self.end = end
+		self.succs = []             # Índices de los bloques sucesores
+		self.preds = []             # Índices de los bloques predecesores
+
+	def __repr__(self):
+		return f"BasicBlock({self.index}, {self.start}:{self.end}, succs={self.succs})"
+
+class CFG:
+	def __init__(self, code):
+		self.code = code
+		self.blocks = []
+		self.block_at = [ ]         # Bloque de cada pc
+		self.if_parts = { }         # Ver structure()
+		self.loop_of = { }
+		self.build()
+
+	@property
+	def entry(self):
+		return self.blocks[0]
+
+	@property
+	def exit(self):
+		return self.blocks[-1]
+
+	def build(self):
+		code = self.code
+		n = len(code)
+		if_parts, loop_of = self.if_parts, self.loop_of = structure(code)
+
+		leaders = { 0, n }
+		for pc, instr in enumerate(code):
+			if instr[0] in _terminators or instr[0] == 'ENDIF':
+				leaders.add(pc + 1)
+			if instr[0] == 'ENDIF':
+				leaders.add(pc)
+		leaders = sorted(leader for leader in leaders if leader <= n)
+		for start, end in zip(leaders, leaders[1:]):
+			self.blocks.append(BasicBlock(len(self.blocks), start, end))
+		self.blocks.append(BasicBlock(len(self.blocks), n, n))    # Salida
+		self.block_at = [ None ] * n
+		for block in self.blocks:
+			for pc in range(block.start, block.end):
+				self.block_at[pc] = block.index
+
+		exit = self.blocks[-1].index
+		def target(pc):
+			return exit if pc >= n else self.block_at[pc]
+		for block in self.blocks[:-1]:
+			last = block.end - 1
+			opname = code[last][0]
+			if opname == 'IF':
+				else_pc, endif_pc = if_parts[last]
+				succs = [last + 1, else_pc + 1 if else_pc is not None else endif_pc]
+			elif opname == 'ELSE':
+				succs = [next(endif for if_pc, (else_pc, endif) in if_parts.items() if else_pc == last)]
+			elif opname in ('LOOP',):
+				succs = [last + 1]
+			elif opname in ('ENDLOOP', 'CONTINUE'):
+				succs = [loop_of[last][0] + 1]
+			elif opname in ('CBREAK', 'CBREAK_IF_FALSE'):
+				succs = [last + 1, loop_of[last][1] + 1]
+			elif opname == 'RET':
+				succs = [n]
+			else:
+				succs = [block.end]
+			test = code[last - 1] if last > block.start else None
+			if opname in ('IF', 'CBREAK', 'CBREAK_IF_FALSE') and test and test[0] == 'CONSTI':
+				# Condición constante: solo una de las dos aristas es posible
+				taken = bool(test[1]) != (opname == 'CBREAK')
+				succs = [succs[0 if taken else 1]]
+			for pc in succs:
+				succ = target(pc)
+				if succ not in block.succs:
+					block.succs.append(succ)
+					self.blocks[succ].preds.append(block.index)
+
+	def postorder(self):
+		'''
+		Bloques alcanzables desde la entrada, en postorden.
+		'''
+		order = []
+		seen = { 0 }
+		stack = [ (0, iter(self.blocks[0].succs)) ]
+		while stack:
+			index, succs = stack[-1]
+			for succ in succs:
+				if succ not in seen:
+					seen.add(succ)
+					stack.append((succ, iter(self.blocks[succ].succs)))
+					break
+			else:
+				stack.pop()
+				order.append(index)
+		return order
+
+	def instructions(self, block):
+		return self.code[block.start:block.end]
+
+class Analysis:
+	def __init__(self, func):
+		self.func = func
+		self.code = list(func.code)  # Copia para saber si el código cambió
+		self.cfg = CFG(self.code)
+		self._idom = None
+		self._frontiers = None
+		self._liveness = None
+		self._reaching = None
+
+	@classmethod
+	def of(cls, func):
+		'''
+		Retorna el análisis de func, reutilizando el anterior si el código
+		no cambió.
+		'''
+		cached = getattr(func, 'analysis', None)
+		if cached is None or cached.code != func.code:
+			cached = func.analysis = cls(func)
+		return cached
+
+	# --- Dominadores
+	@property
+	def idom(self):
+		'''
+		{bloque: dominador inmediato}. La entrada es su propio dominador;
+		los bloques inalcanzables no aparecen.
+		'''
+		if self._idom is None:
+			self._idom = _dominators(self.cfg)
+		return self._idom
+
+	def dominates(self, a, b):
+		idom = self.idom
+		if b not in idom:
+			return False
+		while b != a:
+			if idom[b] == b:
+				return False
+			b = idom[b]
+		return True
+
+	@property
+	def frontiers(self):
+		'''
+		{bloque: conjunto de bloques en su frontera de dominancia}.
+		'''
+		if self._frontiers is None:
+			idom = self.idom
+			frontiers = { index: set() for index in idom }
+			for index in idom:
+				preds = [ pred for pred in self.cfg.blocks[index].preds if pred in idom ]
+				if len(preds) < 2:
+					continue
+				for pred in preds:
+					runner = pred
+					while runner != idom[index]:
+						frontiers[runner].add(index)
+						runner = idom[runner]
+			self._frontiers = frontiers
+		return self._frontiers
+
+	# --- Variables vivas
+	@property
+	def live_in(self):
+		return self.liveness[0]
+
+	@property
+	def live_out(self):
+		return self.liveness[1]
+
+	@property
+	def liveness(self):
+		'''
+		(live_in, live_out): listas por bloque con los conjuntos de locales
+		vivas al entrar y al salir.
+		'''
+		if self._liveness is None:
+			uses, defs = [], []
+			for block in self.cfg.blocks:
+				used, defined = set(), set()
+				for instr in self.cfg.instructions(block):
+					if instr[0] == 'LOCAL_GET' and instr[1] not in defined:
+						used.add(instr[1])
+					elif instr[0] == 'LOCAL_SET':
+						defined.add(instr[1])
+				uses.append(used)
+				defs.append(defined)
+			self._liveness = _backward(self.cfg, uses, defs)
+		return self._liveness
+
+	def live_after(self, pc):
+		'''
+		Locales vivas justo después de la instrucción pc.
+		'''
+		block = self.cfg.blocks[self.cfg.block_at[pc]]
+		live = set(self.live_out[block.index])
+		for instr in reversed(self.code[pc + 1:block.end]):
+			if instr[0] == 'LOCAL_SET':
+				live.discard(instr[1])
+			elif instr[0] == 'LOCAL_GET':
+				live.add(instr[1])
+		return live
+
+	# --- Definiciones que alcanzan
+	@property
+	def reaching_in(self):
+		'''
+		Lista por bloque con las definiciones que lo alcanzan: pares
+		(local, pc del LOCAL_SET). pc es None para el valor de entrada
+		(parámetro o local sin asignar).
+		'''
+		if self._reaching is None:
+			self._reaching = _reaching(self.cfg, self.func)
+		return self._reaching
+
+	def reaching(self, pc, name):
+		'''
+		PCs de los LOCAL_SET de name que alcanzan la instrucción pc (None
+		si alcanza el valor de entrada).
+		'''
+		block = self.cfg.blocks[self.cfg.block_at[pc]]
+		defs = { where for local, where in self.reaching_in[block.index] if local == name }
+		for where in range(block.start, pc):
+			if self.code[where] == ('LOCAL_SET', name):
+				defs = { where }
+		return defs
+
+	def assigned(self, pc, name):
+		'''
+		True si la local name está asignada en todo camino que llega a la
+		instrucción pc. Los parámetros siempre lo están.
+		'''
+		return name in self.func.parmnames or None not in self.reaching(pc, name)
+
+	def unassigned_reads(self):
+		'''
+		Conjunto de las locales que algún LOCAL_GET alcanzable puede leer
+		antes de que se asignen.
+		'''
+		unassigned = set()
+		for block in self.cfg.blocks:
+			maybe = { name for name, where in self.reaching_in[block.index]
+					if where is None and name not in self.func.parmnames }
+			for instr in self.cfg.instructions(block):
+				if instr[0] == 'LOCAL_SET':
+					maybe.discard(instr[1])
+				elif instr[0] == 'LOCAL_GET' and instr[1] in maybe:
+					unassigned.add(instr[1])
+		return unassigned
+
+def global_assigned(module, func, pc, name):
+	'''
+	True si la global name está asignada cuando func ejecuta la
+	instrucción pc. Las globales se asignan en main: la asignación debe
+	estar en el nivel superior de main (fuera de IF y LOOP), antes de pc
+	si func es main o antes de la primera llamada si no lo es.
+	'''
+	main = module.functions.get('main')
+	if main is None:
+		return False
+	code = main.code
+	if func is not main:
+		pc = next((other for other, instr in enumerate(code) if instr[0] == 'CALL'), len(code))
+	depth = 0
+	for instr in code[:pc]:
+		if instr[0] in ('IF', 'LOOP'):
+			depth += 1
+		elif instr[0] in ('ENDIF', 'ENDLOOP'):
+			depth -= 1
+		elif depth == 0 and instr == ('GLOBAL_SET', name):
+			return True
+	return False
+
+def unassigned_globals(module):
+	'''
+	Conjunto de las globales que algún GLOBAL_GET del módulo puede leer
+	antes de que se asignen (ver global_assigned).
+	'''
+	main = module.functions.get('main')
+	first = { }                 # Global -> pc de su primera asignación en el nivel superior de main
+	call = None                 # pc de la primera llamada en main
+	depth = 0
+	for pc, instr in enumerate(main.code if main else []):
+		if instr[0] in ('IF', 'LOOP'):
+			depth += 1
+		elif instr[0] in ('ENDIF', 'ENDLOOP'):
+			depth -= 1
+		elif instr[0] == 'CALL' and call is None:
+			call = pc
+		elif depth == 0 and instr[0] == 'GLOBAL_SET':
+			first.setdefault(instr[1], pc)
+	unassigned = set()
+	for func in module.functions.values():
+		for pc, instr in enumerate(func.code):
+			if instr[0] != 'GLOBAL_GET':
+				continue
+			limit = pc if func is main else call
+			if instr[1] not in first or (limit is not None and first[instr[1]] > limit):
+				unassigned.add(instr[1])
+	return unassigned
+
+def invalidate(func):
+	'''
+	Descarta el análisis guardado de func.
+	'''
+	func.analysis = None
+
+def _dominators(cfg):
+	# Cooper, Harvey y Kennedy, "A Simple, Fast Dominance Algorithm"
+	postorder = cfg.postorder()
+	number = { index: i for i, index in enumerate(postorder) }
+	idom = { 0: 0 }
+	changed = True
+	while changed:
+		changed = False
+		for index in reversed(postorder):
+			if index == 0:
+				continue
+			preds = [ pred for pred in cfg.blocks[index].preds if pred in idom ]
+			new = preds[0]
+			for pred in preds[1:]:
+				a, b = pred, new
+				while a != b:
+					while number[a] < number[b]:
+						a = idom[a]
+					while number[b] < number[a]:
+						b = idom[b]
+				new = a
+			if idom.get(index) != new:
+				idom[index] = new
+				changed = True
+	return idom
+
+def _backward(cfg, uses, defs):
+	live_in = [ set() for _ in cfg.blocks ]
+	live_out = [ set() for _ in cfg.blocks ]
+	order = cfg.postorder()
+	changed = True
+	while changed:
+		changed = False
+		for index in order:
+			out = set()
+			for succ in cfg.blocks[index].succs:
+				out |= live_in[succ]
+			new_in = uses[index] | (out - defs[index])
+			if new_in != live_in[index] or out != live_out[index]:
+				live_in[index], live_out[index] = new_in, out
+				changed = True
+	return live_in, live_out
+
+def _reaching(cfg, func):
+	code = cfg.code
+	all_defs = { }              # local -> definiciones
+	for pc, instr in enumerate(code):
+		if instr[0] == 'LOCAL_SET':
+			all_defs.setdefault(instr[1], set()).add((instr[1], pc))
+	gen, kill = [], []
+	for block in cfg.blocks:
+		last = { }
+		for pc in range(block.start, block.end):
+			if code[pc][0] == 'LOCAL_SET':
+				last[code[pc][1]] = (code[pc][1], pc)
+		gen.append(set(last.values()))
+		kill.append(set().union(*(all_defs[name] | { (name, None) } for name in last)))
+	entry = { (name, None) for name in func.locals }
+	reach_in = [ set() for _ in cfg.blocks ]
+	reach_out = [ set(g) for g in gen ]
+	order = list(reversed(cfg.postorder()))
+	changed = True
+	while changed:
+		changed = False
+		for index in order:
+			new_in = set(entry) if index == 0 else set()
+			for pred in cfg.blocks[index].preds:
+				new_in |= reach_out[pred]
+			new_out = gen[index] | (new_in - kill[index])
+			if new_in != reach_in[index] or new_out != reach_out[index]:
+				reach_in[index], reach_out[index] = new_in, new_out
+				changed = True
+	return reach_in
+
+# ----------------------------------------------------------------------
+# SSA
+
+class SSAForm:
+	def __init__(self, func, analysis):
+		self.func = func
+		self.cfg = analysis.cfg
+		self.blocks = []            # Instrucciones de cada bloque, con PHI al inicio
+		self.origin = { }           # Versión -> local original
+
+	def dump(self):
+		for index, code in enumerate(self.blocks):
+			block = self.cfg.blocks[index]
+			print(f"B{index} preds={block.preds} succs={block.succs}")
+			for instr in code:
+				print(f"    {instr}")
+
+def to_ssa(func):
+	'''
+	Retorna la forma SSA (SSAForm) de las locales de func. No modifica
+	func.
+	'''
+	analysis = Analysis.of(func)
+	cfg = analysis.cfg
+	idom = analysis.idom
+	ssa = SSAForm(func, analysis)
+	ssa.blocks = [ list(cfg.instructions(block)) for block in cfg.blocks ]
+
+	# Inserción de PHI en la frontera de dominancia iterada
+	phis = [ { } for _ in cfg.blocks ]    # bloque -> {local: None}
+	for name in func.locals:
+		pending = [ block.index for block in cfg.blocks
+				if block.index in idom and ('LOCAL_SET', name) in cfg.instructions(block) ]
+		placed = set()
+		while pending:
+			index = pending.pop()
+			for frontier in analysis.frontiers.get(index, ()):
+				if frontier not in placed and name in analysis.live_in[frontier]:
+					placed.add(frontier)
+					phis[frontier][name] = None
+					pending.append(frontier)
+
+	# Renombrado en preorden del árbol de dominadores
+	children = { index: [] for index in idom }
+	for index, parent in idom.items():
+		if index != parent:
+			children[parent].append(index)
+	counters = { name: 0 for name in func.locals }
+	for name in func.locals:
+		ssa.origin[f"{name}.0"] = name
+	phi_names = [ { } for _ in cfg.blocks ]
+	args = [ { } for _ in cfg.blocks ]    # bloque -> {local: [(versión, pred)]}
+
+	def new_version(name):
+		counters[name] += 1
+		version = f"{name}.{counters[name]}"
+		ssa.origin[version] = name
+		return version
+
+	def rename(index, current):
+		current = dict(current)
+		for name in phis[index]:
+			phi_names[index][name] = current[name] = new_version(name)
+		renamed = []
+		for instr in ssa.blocks[index]:
+			if instr[0] == 'LOCAL_GET':
+				instr = ('LOCAL_GET', current[instr[1]])
+			elif instr[0] == 'LOCAL_SET':
+				current[instr[1]] = new_version(instr[1])
+				instr = ('LOCAL_SET', current[instr[1]])
+			renamed.append(instr)
+		ssa.blocks[index] = renamed
+		for succ in cfg.blocks[index].succs:
+			for name in phis[succ]:
+				args[succ].setdefault(name, []).append((current[name], index))
+		return current
+
+	stack = [ (0, { name: f"{name}.0" for name in func.locals }) ]
+	while stack:
+		index, current = stack.pop()
+		current = rename(index, current)
+		for child in children[index]:
+			stack.append((child, current))
+
+	for index in range(len(cfg.blocks)):
+		ssa.blocks[index][0:0] = [ ('PHI', phi_names[index][name], tuple(args[index].get(name, ())))
+				for name in phis[index] if index in idom ]
+	return ssa
+
+def from_ssa(ssa):
+	'''
+	Retorna el código IR (lista de instrucciones) de ssa, con las locales
+	originales.
+	'''
+	origin = ssa.origin
+	cfg = ssa.cfg
+	copies = [ [] for _ in cfg.blocks ]   # Copias al final de cada bloque
+	for index, code in enumerate(ssa.blocks):
+		for instr in code:
+			if instr[0] != 'PHI':
+				continue
+			for source, pred in instr[2]:
+				if origin.get(source, source) == origin[instr[1]]:
+					continue
+				if len(cfg.blocks[pred].succs) != 1:
+					raise ValueError(f"PHI {instr[1]} necesita una copia en una arista crítica (B{pred} -> B{index})")
+				copies[pred].append([('LOCAL_GET', origin.get(source, source)), ('LOCAL_SET', origin[instr[1]])])
+	_check_conventional(ssa)
+	code = []
+	for index, block in enumerate(ssa.blocks):
+		body = [ instr for instr in block if instr[0] != 'PHI' ]
+		body = [ (instr[0], origin.get(instr[1], instr[1])) if instr[0] in ('LOCAL_GET', 'LOCAL_SET') else instr for instr in body ]
+		extra = [ instr for copy in copies[index] for instr in copy ]
+		if extra and body and body[-1][0] in _terminators:
+			body[-1:-1] = extra
+		else:
+			body.extend(extra)
+		code.extend(body)
+	return code
+
+def _check_conventional(ssa):
+	# Dos versiones de una misma local no pueden estar vivas a la vez
+	cfg = ssa.cfg
+	uses, defs = [], []
+	for index, code in enumerate(ssa.blocks):
+		used, defined = set(), set()
+		for instr in code:
+			if instr[0] == 'PHI':
+				defined.add(instr[1])
+			elif instr[0] == 'LOCAL_GET' and instr[1] not in defined:
+				used.add(instr[1])
+			elif instr[0] == 'LOCAL_SET':
+				defined.add(instr[1])
+		uses.append(used)
+		defs.append(defined)
+	# Los operandos de un PHI se usan al final del predecesor
+	phi_uses = [ set() for _ in cfg.blocks ]
+	for code in ssa.blocks:
+		for instr in code:
+			if instr[0] == 'PHI':
+				for source, pred in instr[2]:
+					phi_uses[pred].add(source)
+	for index, used in enumerate(phi_uses):
+		uses[index] |= used - defs[index]
+	live_in, live_out = _backward(cfg, uses, defs)
+	origin = lambda name: ssa.origin.get(name, name)
+	for index, code in enumerate(ssa.blocks):
+		live = live_out[index] | phi_uses[index]
+		for instr in reversed(code):
+			if instr[0] in ('LOCAL_SET', 'PHI'):
+				name = instr[1]
+				live.discard(name)
+				clash = [ other for other in live if origin(other) == origin(name) ]
+				if clash:
+					raise ValueError(f"{name} y {clash[0]} están vivas a la vez: la forma SSA no es convencional")
+			elif instr[0] == 'LOCAL_GET':
+				live.add(instr[1])
@@ -15,6 +15,7 @@ from functools import singledispatchmethod
 from source.model   import *
 from source.symtab  import Symtab
 from source.typesys import typenames, check_binop, check_unaryop
+from source.builtins import builtin_symtab
 import json,os
 # Load configuration
 def load_config():
@@ -47,7 +48,7 @@ class Checker():
 		check.fileName = fileName
 		if check.debug:
 			print(f"[bold green][DEBUG][/bold green] Iniciando análisis semántico del archivo '{fileName}'.")
-		env = Symtab("")
+		env = Symtab("", builtin_symtab())  # Las funciones incorporadas quedan en la tabla padre
 		n.accept(check, env)  # No es necesario pasar la lista de errores
 		if check.hasErrors:
 			raise SyntaxError("Errores semánticos encontrados!!")
@@ -0,0 +1,369 @@
+# closure.py
+'''
+Backend de closures
+===================
+
+ClosureMachine ejecuta el mismo módulo IR que StackMachine, pero antes de
+ejecutar compila cada función una sola vez a un árbol de closures de
+Python (a partir de los árboles de source/irtree.py). Cada expresión es
+una función f(frame) que retorna su valor y cada instrucción una función
+f(frame) que retorna None o una señal de control:
+
+    BREAK      ; Salir del LOOP actual
+    CONTINUE   ; Volver al inicio del LOOP actual
+    RETURN     ; Retornar; el valor queda en el último slot del frame
+
+IF y LOOP se convierten en if/while de Python, así que ejecutar el
+programa es una cadena de llamadas directas, sin ciclo de fetch/decode.
+
+El frame de una función es una lista con un slot por variable local, uno
+por temporal y uno para el valor de retorno. La memoria, las globales,
+la salida y las funciones del anfitrión son las de StackMachine.
+
+Solo se compilan módulos verificados (modo rápido, valores sin etiqueta).
+Si la verificación falla o el IR no se puede convertir a árbol, el
+módulo se ejecuta en el intérprete de StackMachine. No hay límite de
+instrucciones (MaxInstructions) en código compilado.
+
+Las llamadas de GoxLang usan la pila de Python y cada una ocupa varios
+frames (unos cinco en d(n) = 1 + d(n - 1)). run() sube el límite de
+recursión a RECURSION_LIMIT (ver source/stack_machine.py), así que la
+recursión llega a unas 200000 llamadas de profundidad; más allá falla
+con RecursionError, mientras que el intérprete, que guarda los frames en
+una lista, no tiene ese límite.
+
+Se selecciona con "Backend": "closure" en settings/config.json.
+'''
+import sys
+
+from source.stack_machine import StackMachine, RECURSION_LIMIT
+from source.irtree import build_tree, TreeError
+
+BREAK, CONTINUE, RETURN = 1, 2, 3
+
+def _div_int(a, b):
+	def div(f):
+		x = a(f)
+		y = b(f)
+		if y == 0:
+			raise ZeroDivisionError("Integer division by zero")
+		return x // y
+	return div
+
+def _div_float(a, b):
+	def div(f):
+		x = a(f)
+		y = b(f)
+		if y == 0.0:
+			raise ZeroDivisionError("Floating point division by zero")
+		return x / y
+	return div
+
+# Fábricas de closures para las operaciones binarias
+_binops = {
+	'ADDI': lambda a, b: lambda f: a(f) + b(f),
+	'SUBI': lambda a, b: lambda f: a(f) - b(f),
+	'MULI': lambda a, b: lambda f: a(f) * b(f),
+	'DIVI': _div_int,
+	'ANDI': lambda a, b: lambda f: a(f) & b(f),
+	'ORI':  lambda a, b: lambda f: a(f) | b(f),
+	'LTI':  lambda a, b: lambda f: 1 if a(f) < b(f) else 0,
+	'LEI':  lambda a, b: lambda f: 1 if a(f) <= b(f) else 0,
+	'GTI':  lambda a, b: lambda f: 1 if a(f) > b(f) else 0,
+	'GEI':  lambda a, b: lambda f: 1 if a(f) >= b(f) else 0,
+	'EQI':  lambda a, b: lambda f: 1 if a(f) == b(f) else 0,
+	'NEI':  lambda a, b: lambda f: 1 if a(f) != b(f) else 0,
+	'DIVF': _div_float,
+}
+for _op in ('ADD', 'SUB', 'MUL', 'LT', 'LE', 'GT', 'GE', 'EQ', 'NE'):
+	_binops[_op + 'F'] = _binops[_op + 'I']
+
+# Operaciones con una variable local y una constante, las más comunes en
+# los ciclos (i + 1, n - 1, i < n, ...)
+_local_const = {
+	'ADDI': lambda s, c: lambda f: f[s] + c,
+	'SUBI': lambda s, c: lambda f: f[s] - c,
+	'MULI': lambda s, c: lambda f: f[s] * c,
+	'LTI':  lambda s, c: lambda f: 1 if f[s] < c else 0,
+	'LEI':  lambda s, c: lambda f: 1 if f[s] <= c else 0,
+	'GTI':  lambda s, c: lambda f: 1 if f[s] > c else 0,
+	'GEI':  lambda s, c: lambda f: 1 if f[s] >= c else 0,
+	'EQI':  lambda s, c: lambda f: 1 if f[s] == c else 0,
+	'NEI':  lambda s, c: lambda f: 1 if f[s] != c else 0,
+}
+for _op in ('ADD', 'SUB', 'MUL', 'LT', 'LE', 'GT', 'GE', 'EQ', 'NE'):
+	_local_const[_op + 'F'] = _local_const[_op + 'I']
+
+class ClosureMachine(StackMachine):
+	def __init__(self, output=None):
+		super().__init__(output)
+		self.compiled = None          # Funciones compiladas, indexadas por slot
+
+	def load_module(self, ir_module):
+		super().load_module(ir_module)
+		self.compiled = None
+		if not self.fast:
+			self._log_debug("Module not verified, running in the interpreter.")
+			return
+		try:
+			self.compiled = self.compile_module()
+		except TreeError as e:
+			self._log_debug(f"Cannot compile module, running in the interpreter: {e}")
+
+	def compile_module(self):
+		'''
+		Retorna la lista de funciones compiladas, indexada por slot. Los
+		backends que heredan de ClosureMachine redefinen este método.
+		'''
+		return _Compiler(self).compile_module()
+
+	def run(self):
+		if self.compiled is None:
+			return super().run()
+		self._log_debug("--- Starting compiled execution from 'main' ---")
+		limit = sys.getrecursionlimit()
+		sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+		try:
+			result = self.compiled[self.linked.main]()
+		finally:
+			sys.setrecursionlimit(limit)
+			self.instruction_count = None
+			self.output.close()
+			self.heap.flush()
+		self.stack = [result]
+		self._log_debug("--- Execution halted ---")
+
+class _Compiler:
+	def __init__(self, vm):
+		self.vm = vm
+		self.functions = []           # Se llena con las funciones compiladas
+
+	def compile_module(self):
+		for func in self.vm.functions:
+			self.functions.append(self.compile_imported(func) if func.imported else None)
+		for func in self.vm.functions:
+			if not func.imported:
+				self.functions[func.index] = self.compile_function(func)
+		return self.functions
+
+	def compile_imported(self, func):
+		vm = self.vm
+		def call(*args):
+			return vm._call_imported(func, args)
+		return call
+
+	def compile_function(self, func):
+		tree = build_tree(func, self.vm.linked)
+		self.tree = tree
+		ret = tree.nslots
+		template = [None] * (ret + 1)
+		nparams = func.nparams
+		body = self.block(tree.body, ret)
+		if nparams == 0:
+			def call():
+				f = template[:]
+				body(f)
+				return f[ret]
+		elif nparams == 1:
+			def call(a):
+				f = template[:]
+				f[0] = a
+				body(f)
+				return f[ret]
+		else:
+			def call(*args):
+				f = template[:]
+				f[:nparams] = args
+				body(f)
+				return f[ret]
+		return call
+
+	# --- Instrucciones ---
+	def block(self, stmts, ret):
+		compiled = tuple(self.stmt(stmt, ret) for stmt in stmts)
+		if not compiled:
+			return lambda f: None
+		if len(compiled) == 1:
+			return compiled[0]
+		if len(compiled) == 2:
+			s0, s1 = compiled
+			def block2(f):
+				r = s0(f)
+				if r is not None:
+					return r
+				return s1(f)
+			return block2
+		def block(f):
+			for stmt in compiled:
+				r = stmt(f)
+				if r is not None:
+					return r
+		return block
+
+	def stmt(self, stmt, ret):
+		kind = stmt[0]
+		vm = self.vm
+		if kind == 'assign':
+			slot, value = stmt[1], self.expr(stmt[2])
+			def assign(f):
+				f[slot] = value(f)
+			return assign
+		if kind == 'gassign':
+			slot, value, globals_ = stmt[1], self.expr(stmt[2]), vm.globals
+			def gassign(f):
+				globals_[slot] = value(f)
+			return gassign
+		if kind == 'store':
+			return self.store(stmt[1], self.expr(stmt[2]), self.expr(stmt[3]))
+		if kind == 'print':
+			value, write = self.expr(stmt[2]), vm.output.write
+			return lambda f: write(value(f))
+		if kind == 'mem':
+			op = { 'MEMSET': vm._memset, 'MEMCPY': vm._memcpy, 'FILLI': vm._filli, 'FILLF': vm._fillf }[stmt[1]]
+			a, b, c = (self.expr(e) for e in stmt[2:])
+			return lambda f: op(a(f), b(f), c(f))
+		if kind == 'expr':
+			value = self.expr(stmt[1])
+			def discard(f):
+				value(f)
+			return discard
+		if kind == 'if':
+			cond, then = self.expr(stmt[1]), self.block(stmt[2], ret)
+			if not stmt[3]:
+				def if_(f):
+					if cond(f):
+						return then(f)
+				return if_
+			orelse = self.block(stmt[3], ret)
+			def if_else(f):
+				if cond(f):
+					return then(f)
+				return orelse(f)
+			return if_else
+		if kind == 'loop':
+			body = self.block(stmt[1], ret)
+			def loop(f):
+				while True:
+					r = body(f)
+					if r is not None and r != CONTINUE:
+						return None if r == BREAK else r
+			return loop
+		if kind == 'break_if':
+			cond = self.expr(stmt[1])
+			def break_if(f):
+				if cond(f):
+					return BREAK
+			return break_if
+		if kind == 'continue':
+			return lambda f: CONTINUE
+		if kind == 'return':
+			value = self.expr(stmt[1])
+			def return_(f):
+				f[ret] = value(f)
+				return RETURN
+			return return_
+		raise TreeError(f"Unknown statement {kind}")
+
+	def store(self, op, address, value):
+		vm = self.vm
+		heap, memory = vm.heap, vm.memory
+		if op == 'POKEB':
+			def pokeb(f):
+				addr = address(f)
+				v = value(f)
+				if addr < 0 or addr >= heap.top:
+					raise IndexError(f"POKEB: Memory access out of bounds. Address: {addr}, Memory size: {heap.top}")
+				memory[addr] = v
+			return pokeb
+		size, pack = (vm.INT_SIZE, vm.pack_int) if op == 'POKEI' else (vm.FLOAT_SIZE, vm.pack_float)
+		def poke(f):
+			addr = address(f)
+			v = value(f)
+			if addr < 0 or addr + size > heap.top:
+				raise IndexError(f"{op}: Memory access out of bounds. Address: {addr}, Memory size: {heap.top}")
+			pack(memory, addr, v)
+		return poke
+
+	# --- Expresiones ---
+	def expr(self, expr):
+		kind = expr[0]
+		vm = self.vm
+		if kind == 'const':
+			value = expr[1]
+			return lambda f: value
+		if kind == 'local':
+			slot = expr[1]
+			if slot in self.tree.func.unassigned:
+				name = self.tree.names[slot]
+				def local(f):
+					value = f[slot]
+					if value is None:
+						raise ValueError(f"Local variable '{name}' accessed before assignment.")
+					return value
+				return local
+			return lambda f: f[slot]
+		if kind == 'global':
+			slot, globals_ = expr[1], vm.globals
+			def global_(f):
+				value = globals_[slot]
+				if value is None:
+					raise ValueError(f"Global variable '{vm.linked.globals[slot]}' accessed before assignment.")
+				return value
+			return global_
+		if kind == 'binop':
+			op, left, right = expr[1], expr[2], expr[3]
+			if (op in _local_const and left[0] == 'local' and right[0] == 'const'
+					and left[1] not in self.tree.func.unassigned):
+				return _local_const[op](left[1], right[1])
+			return _binops[op](self.expr(left), self.expr(right))
+		if kind == 'unop':
+			return self.unop(expr[1], self.expr(expr[2]))
+		if kind == 'call':
+			functions, index = self.functions, expr[1]
+			args = [self.expr(arg) for arg in expr[2]]
+			if not args:
+				return lambda f: functions[index]()
+			if len(args) == 1:
+				a0 = args[0]
+				return lambda f: functions[index](a0(f))
+			if len(args) == 2:
+				a0, a1 = args
+				return lambda f: functions[index](a0(f), a1(f))
+			return lambda f: functions[index](*[arg(f) for arg in args])
+		if kind == 'builtin':
+			args = [self.expr(arg) for arg in expr[2]]
+			if expr[1] == 'GROW':
+				alloc, size = vm.heap.alloc, args[0]
+				return lambda f: alloc(size(f))
+			if expr[1] == 'FREE':
+				free, address = vm.heap.free, args[0]
+				return lambda f: free(address(f))
+			memcmp, (a, b, n) = vm._memcmp, args
+			return lambda f: memcmp(a(f), b(f), n(f))
+		raise TreeError(f"Unknown expression {kind}")
+
+	def unop(self, op, value):
+		vm = self.vm
+		if op == 'ITOF':
+			return lambda f: float(value(f))
+		if op == 'FTOI':
+			return lambda f: int(value(f))
+		if op in ('NEGI', 'NEGF'):
+			return lambda f: -value(f)
+		if op == 'NOT':
+			return lambda f: 0 if value(f) else 1
+		heap, memory = vm.heap, vm.memory
+		if op == 'PEEKB':
+			def peekb(f):
+				addr = value(f)
+				if addr < 0 or addr >= heap.top:
+					raise IndexError(f"PEEKB: Memory access out of bounds. Address: {addr}, Memory size: {heap.top}")
+				return memory[addr]
+			return peekb
+		size, unpack = (vm.INT_SIZE, vm.unpack_int) if op == 'PEEKI' else (vm.FLOAT_SIZE, vm.unpack_float)
+		def peek(f):
+			addr = value(f)
+			if addr < 0 or addr + size > heap.top:
+				raise IndexError(f"{op}: Memory access out of bounds. Address: {addr}, Memory size: {heap.top}")
+			return unpack(memory, addr)[0]
+		return peek
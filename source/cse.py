@@ -0,0 +1,172 @@
+# cse.py
+'''
+Eliminación de subexpresiones comunes
+=====================================
+
+IRCode genera cada expresión completa en cada uso. En a[i] = a[i] + 1 la
+dirección (base + i*4) se calcula dos veces:
+
+    LOCAL_GET base          LOCAL_GET base
+    LOCAL_GET i             LOCAL_GET i
+    CONSTI 4                CONSTI 4
+    MULI                    MULI
+    ADDI                    ADDI
+                            LOCAL_SET $temp1      ; Se guarda la primera vez
+                            LOCAL_GET $temp1
+    ...                     ...
+    LOCAL_GET base          LOCAL_GET $temp1      ; Y se reutiliza
+    LOCAL_GET i
+    CONSTI 4
+    MULI
+    ADDI
+
+eliminate_subexpressions() recorre cada bloque de una función evaluando la pila de forma
+simbólica: cada valor tiene una clave que describe cómo se calculó, por
+ejemplo ('ADDI', ('LOCAL_GET', 'base', 0), ('MULI', ...)). Si una clave ya se
+calculó en el mismo bloque, la expresión se reemplaza por una lectura del
+temporal (creado con new_temp()) donde se guardó la primera.
+
+Las claves incluyen versiones: LOCAL_SET cambia la versión de la local,
+GLOBAL_SET la de la global, y POKE, las operaciones de memoria, GROW,
+FREE y CALL la de la memoria (CALL además la de todas las globales). Una
+expresión calculada antes de una asignación nunca coincide con una
+calculada después.
+
+Un bloque termina en IF, ELSE, ENDIF, LOOP, ENDLOOP, CONTINUE o RET. Los
+CBREAK no lo terminan: el código que sigue solo se ejecuta si no se salió
+del ciclo. Solo se reemplaza una expresión si se ahorran instrucciones:
+guardar el valor cuesta dos (LOCAL_SET, LOCAL_GET).
+'''
+from source.ircode import new_temp
+from source.verifier import ir_signatures, ir_leaves, ir_barriers, gox_types
+
+_memory_reads = { 'PEEKI', 'PEEKF', 'PEEKB', 'MEMCMP' }
+_memory_writes = { 'POKEI', 'POKEF', 'POKEB', 'MEMSET', 'MEMCPY', 'FILLI', 'FILLF', 'GROW', 'FREE' }
+
+def _is_pure(opname):
+	# Operaciones que calculan un valor sin efectos
+	if opname not in ir_signatures or opname in _memory_writes:
+		return False
+	pops, pushes = ir_signatures[opname]
+	return len(pops) > 0 and len(pushes) == 1
+
+def eliminate_subexpressions(func):
+	'''
+	Elimina las subexpresiones comunes de func en su lugar. Retorna la
+	cantidad de expresiones reemplazadas.
+	'''
+	groups = _find(func)
+	selected = _select(groups)
+	_rewrite(func, selected)
+	return sum(len(group['selected']) for group in selected)
+
+def _find(func):
+	'''
+	Retorna los grupos de evaluaciones de una misma clave dentro de un
+	bloque: {'first': (start, pc), 'uses': [(start, pc)], 'type': tipo IR}.
+	'''
+	code = func.code
+	module = func.module
+	versions = { }                  # Versión de cada local, global y de la memoria
+	available = { }                 # clave -> grupo, en el bloque actual
+	groups = []
+	stack = []                      # (clave, start); clave None si es desconocida
+
+	def pop(n):
+		values = stack[len(stack) - n:] if n else []
+		del stack[len(stack) - n:]
+		return [(None, None)] * (n - len(values)) + values
+
+	def bump(name):
+		versions[name] = versions.get(name, 0) + 1
+
+	for pc, instr in enumerate(code):
+		opname = instr[0]
+		if opname in ir_barriers:
+			stack = []
+			available.clear()
+		elif opname in ('CONSTI', 'CONSTF'):
+			stack.append((instr, pc))
+		elif opname in ('LOCAL_GET', 'GLOBAL_GET'):
+			stack.append(((opname, instr[1], versions.get((opname, instr[1]), 0)), pc))
+		elif opname in ('LOCAL_SET', 'GLOBAL_SET'):
+			pop(1)
+			bump(('LOCAL_GET' if opname == 'LOCAL_SET' else 'GLOBAL_GET', instr[1]))
+		elif opname == 'CALL':
+			callee = module.functions.get(instr[1])
+			pop(len(callee.parmnames) if callee else len(stack))
+			bump('memory')
+			for name in module.globals:
+				bump(('GLOBAL_GET', name))
+			stack.append((None, None))
+		elif _is_pure(opname):
+			pops, pushes = ir_signatures[opname]
+			args = pop(len(pops))
+			start = args[0][1]
+			if any(key is None for key, _ in args) or not _replaceable(code, start, pc):
+				stack.append((None, None))
+				continue
+			key = (opname, *(key for key, _ in args))
+			if opname in _memory_reads:
+				key += (versions.get('memory', 0),)
+			if key in available:
+				available[key]['uses'].append((start, pc))
+			else:
+				available[key] = { 'first': (start, pc), 'uses': [], 'type': pushes[0] }
+				groups.append(available[key])
+			stack.append((key, start))
+		else:
+			# Escrituras a memoria, PRINT, CBREAK y DROP solo consumen valores
+			if opname in ir_signatures:
+				pops, pushes = ir_signatures[opname]
+			else:
+				pops, pushes = ('I',), ()
+			pop(len(pops))
+			if opname in _memory_writes:
+				bump('memory')
+			stack.extend((None, None) for _ in pushes)
+	return [ group for group in groups if group['uses'] ]
+
+def _replaceable(code, start, pc):
+	# La expresión ocupa code[start:pc+1] y no tiene efectos
+	if start is None:
+		return False
+	return all(instr[0] in ir_leaves or _is_pure(instr[0])
+			for instr in code[start:pc + 1])
+
+def _select(groups):
+	'''
+	Elige las evaluaciones a reemplazar. Las expresiones grandes tienen
+	prioridad sobre las que contienen, y un grupo se descarta si no ahorra
+	instrucciones.
+	'''
+	while True:
+		ranges = sorted(((start, pc, group) for group in groups for start, pc in group['uses']),
+				key=lambda item: item[0] - item[1])
+		accepted = []
+		for start, pc, group in ranges:
+			if not any(s <= start and pc <= p for s, p, _ in accepted):
+				accepted.append((start, pc, group))
+		selected = []
+		for group in groups:
+			group['selected'] = [ (s, p) for s, p, g in accepted if g is group ]
+			saved = sum(p - s for s, p in group['selected']) - 2
+			first_start, first_pc = group['first']
+			inside = any(s <= first_start and first_pc <= p for s, p, _ in accepted)
+			if saved > 0 and not inside:
+				selected.append(group)
+		if len(selected) == len(groups):
+			return selected
+		groups = selected
+
+def _rewrite(func, groups):
+	edits = []                      # (posición, orden, reemplazo, fin)
+	for group in groups:
+		temp = new_temp()
+		func.new_local(temp, group['type'], gox_types[group['type']])
+		pc = group['first'][1]
+		edits.append((pc + 1, 0, [('LOCAL_SET', temp), ('LOCAL_GET', temp)], pc + 1))
+		for start, end in group['selected']:
+			edits.append((start, 1, [('LOCAL_GET', temp)], end + 1))
+	for position, _, replacement, end in sorted(edits, key=lambda edit: edit[:2], reverse=True):
+		func.code[position:end] = replacement
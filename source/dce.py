@@ -0,0 +1,146 @@
+# dce.py
+'''
+Eliminación de código muerto
+============================
+
+IRCode genera código que nunca se ejecuta o cuyo resultado nadie usa:
+
+* Código después de un RET o CONTINUE dentro de una rama, y el retorno
+  por defecto (CONSTI 0, RET) que visit(Function) agrega aunque todos los
+  caminos ya retornen.
+* Asignaciones a locales que nunca se leen, por ejemplo los parámetros de
+  una función expandida por el Inliner que solo se usaban en ramas
+  plegadas.
+* Funciones declaradas que main nunca llama, directa ni indirectamente,
+  incluidas las que el Inliner expandió en todos sus usos.
+
+remove_dead_functions(module) elimina del módulo las funciones que no
+son alcanzables desde main en el grafo de llamadas (ver
+source/inliner.py).
+
+remove_unreachable(func) pliega primero los IF con condición constante
+(CONSTI 1, IF, <a>, ELSE, <b>, ENDIF -> <a>) y luego elimina las
+instrucciones de los bloques que el grafo de flujo (ver source/cfg.py)
+no alcanza desde la entrada. Los ELSE, ENDIF y ENDLOOP inalcanzables se
+conservan si su IF o LOOP se alcanza, para que el código siga bien
+estructurado.
+
+remove_dead_stores(func, module) reemplaza cada LOCAL_SET de una local
+que no está viva después de la asignación por un DROP, y elimina la
+expresión que calcula el valor si no tiene efectos ni puede fallar (sin
+llamadas, lecturas de memoria, FTOI, divisiones ni lecturas de variables
+que se pueden leer sin asignar, ver source/cfg.py). Las locales que
+quedan sin usar, salvo los parámetros, se eliminan de la función.
+'''
+from source.cfg import Analysis, CFG, unassigned_globals
+from source.inliner import call_graph
+from source.verifier import ir_signatures, ir_leaves, ir_safe
+
+_markers = { 'ELSE', 'ENDIF', 'ENDLOOP' }
+_pure = ir_leaves | ir_safe
+
+def remove_dead_functions(module):
+	'''
+	Elimina las funciones que main no puede llamar. Retorna la cantidad de
+	funciones eliminadas.
+	'''
+	if 'main' not in module.functions:
+		return 0
+	graph = call_graph(module)
+	reachable = { 'main' }
+	pending = [ 'main' ]
+	while pending:
+		for callee in graph.get(pending.pop(), ()):
+			if callee not in reachable:
+				reachable.add(callee)
+				pending.append(callee)
+	dead = [ name for name in module.functions if name not in reachable ]
+	for name in dead:
+		del module.functions[name]
+	return len(dead)
+
+def remove_unreachable(func):
+	'''
+	Elimina de func, en su lugar, las instrucciones que no se pueden
+	ejecutar. Retorna la cantidad de instrucciones eliminadas.
+	'''
+	code = func.code
+	before = len(code)
+	while _fold_constant_if(code):
+		pass
+	cfg = CFG(code)
+	reachable = set(cfg.postorder())
+	owner = { }                 # pc de ELSE/ENDIF/ENDLOOP -> pc del IF/LOOP
+	for if_pc, (else_pc, endif_pc) in cfg.if_parts.items():
+		owner[endif_pc] = if_pc
+		if else_pc is not None:
+			owner[else_pc] = if_pc
+	for loop_pc, endloop_pc in set(cfg.loop_of.values()):
+		owner[endloop_pc] = loop_pc
+	code[:] = [ instr for pc, instr in enumerate(code)
+			if cfg.block_at[pc] in reachable
+			or (instr[0] in _markers and cfg.block_at[owner[pc]] in reachable) ]
+	return before - len(code)
+
+def _fold_constant_if(code):
+	# Reemplaza un CONSTI, IF ... ENDIF por la rama que se toma
+	cfg = CFG(code)
+	for if_pc, (else_pc, endif_pc) in cfg.if_parts.items():
+		if if_pc > 0 and code[if_pc - 1][0] == 'CONSTI':
+			end = else_pc if else_pc is not None else endif_pc
+			if code[if_pc - 1][1]:
+				taken = code[if_pc + 1:end]
+			else:
+				taken = code[else_pc + 1:endif_pc] if else_pc is not None else []
+			code[if_pc - 1:endif_pc + 1] = taken
+			return True
+	return False
+
+def remove_dead_stores(func, module):
+	'''
+	Elimina de func, en su lugar, las asignaciones a locales cuyo valor no
+	se lee. Retorna la cantidad de asignaciones eliminadas.
+	'''
+	removed = 0
+	globals_ = unassigned_globals(module)
+	while True:
+		analysis = Analysis.of(func)
+		code = func.code
+		# Leer una variable sin asignar falla, así que esa lectura se conserva
+		unsafe = { ('LOCAL_GET', name) for name in analysis.unassigned_reads() }
+		unsafe |= { ('GLOBAL_GET', name) for name in globals_ }
+		dead = [ pc for pc, instr in enumerate(code)
+				if instr[0] == 'LOCAL_SET' and instr[1] not in analysis.live_after(pc) ]
+		if not dead:
+			break
+		for pc in reversed(dead):
+			start = _expression_start(code, pc, unsafe)
+			if start is None:
+				code[pc] = ('DROP',)
+			else:
+				del code[start:pc + 1]
+		removed += len(dead)
+	used = { instr[1] for instr in func.code if instr[0] in ('LOCAL_GET', 'LOCAL_SET') }
+	for name in list(func.locals):
+		if name not in used and name not in func.parmnames:
+			del func.locals[name]
+			func.locals_gox.pop(name, None)
+			func.consts.discard(name)
+	return removed
+
+def _expression_start(code, pc, unsafe):
+	# Inicio de la expresión sin efectos que apila el valor que consume
+	# code[pc], o None. unsafe son las lecturas que pueden fallar
+	needed = 1
+	for start in range(pc - 1, -1, -1):
+		opname = code[start][0]
+		if opname not in _pure or code[start] in unsafe:
+			return None
+		if opname in ir_signatures:
+			pops, pushes = ir_signatures[opname]
+			needed += len(pops) - len(pushes)
+		else:
+			needed -= 1         # CONSTx, LOCAL_GET y GLOBAL_GET apilan un valor
+		if needed == 0:
+			return start
+	return None
@@ -0,0 +1,89 @@
+# host.py
+'''
+Funciones del anfitrión
+=======================
+
+Una función declarada con `import func` no tiene cuerpo en GoxLang. Si
+existe una función de Python registrada con el mismo nombre, la máquina
+de pila la llama en lugar de retornar 0:
+
+    import func put_image(base int, width int, height int) int;
+
+La función de Python recibe primero un memoryview de la memoria de la
+máquina (sin copiar, de 0 a Heap.top) y luego los argumentos de la
+llamada. Lo que retorna se convierte al tipo de retorno declarado; None
+equivale a 0. La vista solo es válida durante la llamada.
+
+Para registrar una función:
+
+    @host_function('sqrt', params=['F'], returns='F')
+    def _sqrt(memory, x):
+        return math.sqrt(x)
+
+params y returns son tipos IR ('I', 'F') y son opcionales. Si se indican,
+la máquina los compara con la declaración `import func` al cargar el
+módulo y lanza TypeError si no coinciden.
+'''
+import os
+
+DEFAULT_IMAGE_FILE = os.path.join('output', 'image.ppm')
+
+class HostFunction:
+	def __init__(self, name, func, params=None, returns=None):
+		self.name = name
+		self.func = func
+		self.params = params
+		self.returns = returns
+
+	def check(self, parmtypes, return_type):
+		'''
+		Verifica que la declaración `import func` coincida con la firma
+		registrada.
+		'''
+		if self.params is not None and list(self.params) != list(parmtypes):
+			raise TypeError(f"Host function '{self.name}' expects parameters {self.params}, declared as {parmtypes}.")
+		if self.returns is not None and self.returns != return_type:
+			raise TypeError(f"Host function '{self.name}' returns '{self.returns}', declared as '{return_type}'.")
+
+host_functions = { }      # Registro {nombre: HostFunction}
+
+def host_function(name, params=None, returns=None):
+	'''
+	Decorador que registra una función de Python como implementación de
+	`import func name`.
+	'''
+	def register(func):
+		host_functions[name] = HostFunction(name, func, params, returns)
+		return func
+	return register
+
+# ----------------------------------------------------------------------
+# Funciones incluidas
+
+image_file = DEFAULT_IMAGE_FILE
+
+@host_function('put_image', params=['I', 'I', 'I'], returns='I')
+def put_image(memory, base, width, height):
+	'''
+	Escribe una imagen PPM (P6) a partir de width*height pixeles RGBA
+	guardados desde la dirección base; el canal alfa se descarta. Usa
+	NumPy si está instalado. Retorna la cantidad de bytes de pixeles
+	escritos.
+	'''
+	size = width * height * 4
+	if width < 0 or height < 0 or base < 0 or base + size > len(memory):
+		raise IndexError(f"put_image: Image out of bounds. Base: {base}, Size: {width}x{height}, Memory size: {len(memory)}")
+	try:
+		import numpy as np
+		rgb = np.frombuffer(memory, dtype=np.uint8, count=size, offset=base).reshape(height, width, 4)[:, :, :3].tobytes()
+	except ImportError:
+		rgb = bytearray(memory[base:base + size])
+		del rgb[3::4]
+	path = image_file
+	if not os.path.isabs(path):
+		path = os.path.join(os.path.dirname(__file__), '..', path)
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	with open(path, 'wb') as f:
+		f.write(f"P6\n{width} {height}\n255\n".encode('ascii'))
+		f.write(rgb)
+	return len(rgb)
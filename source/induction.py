@@ -0,0 +1,136 @@
+# induction.py
+'''
+Reducción de fuerza de las variables de inducción
+=================================================
+
+Un acceso `(base + j) a enteros genera base + j*4 en cada uso:
+
+    GLOBAL_GET base, GLOBAL_GET j, CONSTI 4, MULI, ADDI
+
+Si en el ciclo j solo cambia con j = j + paso, donde el paso y base no
+cambian en el ciclo, la dirección se lleva en un puntero temporal
+(new_temp()) que avanza junto con j, y el acceso es una lectura:
+
+    <base + j*4>, LOCAL_SET $p          ; Antes del LOOP
+    LOOP
+      ...
+      LOCAL_GET $p                      ; En lugar de base + j*4
+      ...
+      GLOBAL_GET j, GLOBAL_GET i, ADDI, GLOBAL_SET j
+      LOCAL_GET $p, LOCAL_GET $paso4, ADDI, LOCAL_SET $p
+    ENDLOOP
+
+Con un paso constante el incremento del puntero es CONSTI paso*4, y con
+un paso variable paso*4 se calcula antes del ciclo. Así desaparecen las
+multiplicaciones del ciclo.
+
+reduce_induction_variables() busca en cada LOOP las variables (locales o
+globales) cuyas asignaciones en el cuerpo son todas de la forma
+v = v + paso o v = v - paso. Una global no puede serlo si el cuerpo tiene
+un CALL. Un grupo de accesos con la misma base y escala se reduce si
+tiene más accesos que incrementos la variable: cada incremento del
+puntero cuesta las mismas cuatro instrucciones que ahorra un acceso, y
+el cálculo del puntero antes del LOOP se paga en cada entrada al ciclo,
+así que un grupo que solo empata por vuelta es más lento. Como el puntero se inicializa antes del LOOP, las variables que
+usa deben estar asignadas en todo camino que llega al ciclo.
+'''
+from source.ircode import new_temp
+from source.cfg import loop_end
+from source.licm import assigned
+
+_getters = { 'LOCAL_SET': 'LOCAL_GET', 'GLOBAL_SET': 'GLOBAL_GET' }
+
+def reduce_induction_variables(func):
+	'''
+	Reemplaza en func, en su lugar, las direcciones base + v*escala de las
+	variables de inducción v por punteros temporales. Retorna la cantidad
+	de grupos de accesos reducidos.
+	'''
+	reduced = 0
+	pc = 0
+	while pc < len(func.code):
+		if func.code[pc][0] == 'LOOP':
+			count, pc = _reduce(func, pc)
+			reduced += count
+		pc += 1
+	return reduced
+
+def _reduce(func, start):
+	code = func.code
+	end = loop_end(code, start)
+	calls = any(code[pc][0] == 'CALL' for pc in range(start + 1, end))
+	written = { code[pc][:2] for pc in range(start + 1, end) if code[pc][0] in _getters }
+
+	def invariant(instr):
+		# Una instrucción que apila un entero que no cambia en el ciclo
+		if instr[0] == 'CONSTI':
+			return True
+		if instr[0] == 'LOCAL_GET':
+			return ('LOCAL_SET', instr[1]) not in written
+		if instr[0] == 'GLOBAL_GET':
+			return not calls and ('GLOBAL_SET', instr[1]) not in written
+		return False
+
+	# Variables de inducción: {instrucción que la lee: [(pc del SET, paso, op)]}
+	inductions = { }
+	for setter, name in written:
+		if setter == 'GLOBAL_SET' and calls:
+			continue
+		get = (_getters[setter], name)
+		steps = []
+		for pc in range(start + 1, end):
+			if code[pc] != (setter, name):
+				continue
+			window = code[pc - 3:pc]
+			if len(window) == 3 and window[0] == get and invariant(window[1]) and window[1] != get and window[2][0] in ('ADDI', 'SUBI'):
+				steps.append((pc, window[1], window[2]))
+			else:
+				steps = None
+				break
+		if steps:
+			inductions[get] = steps
+
+	# Accesos: base, v, CONSTI escala, MULI, ADDI
+	groups = { }                # (base, v, escala) -> [pc]
+	pc = start + 1
+	while pc + 4 < end:
+		base, var, scale, mul, add = code[pc:pc + 5]
+		if (var in inductions and invariant(base) and base != var and scale[0] == 'CONSTI'
+				and mul == ('MULI',) and add == ('ADDI',)):
+			groups.setdefault((base, var, scale[1]), []).append(pc)
+			pc += 5
+		else:
+			pc += 1
+
+	prelude = []
+	edits = []                  # (pc, fin, reemplazo); en el mismo pc, el reemplazo antes que la inserción
+	count = 0
+	for (base, var, scale), accesses in groups.items():
+		steps = inductions[var]
+		if len(accesses) <= len(steps):
+			continue
+		# El puntero se calcula antes del LOOP, aunque el ciclo no dé
+		# ninguna vuelta: lo que lee ya debe estar asignado
+		if not all(assigned(func, start, instr) for instr in [base, var] + [step for _, step, _ in steps]):
+			continue
+		pointer = new_temp()
+		func.new_local(pointer, 'I', 'int')
+		prelude.extend([base, var, ('CONSTI', scale), ('MULI',), ('ADDI',), ('LOCAL_SET', pointer)])
+		for pc in accesses:
+			edits.append((pc, pc + 5, [('LOCAL_GET', pointer)]))
+		scaled = { }            # Paso -> instrucción que apila paso*escala
+		for pc, step, op in steps:
+			if step not in scaled:
+				if step[0] == 'CONSTI':
+					scaled[step] = ('CONSTI', step[1] * scale)
+				else:
+					temp = new_temp()
+					func.new_local(temp, 'I', 'int')
+					prelude.extend([step, ('CONSTI', scale), ('MULI',), ('LOCAL_SET', temp)])
+					scaled[step] = ('LOCAL_GET', temp)
+			edits.append((pc + 1, pc + 1, [('LOCAL_GET', pointer), scaled[step], op, ('LOCAL_SET', pointer)]))
+		count += 1
+	for pc, stop, replacement in sorted(edits, key=lambda edit: edit[:2], reverse=True):
+		code[pc:stop] = replacement
+	code[start:start] = prelude
+	return count, start + len(prelude)
@@ -0,0 +1,248 @@
+# inliner.py
+'''
+Expansión en línea (inlining)
+=============================
+
+Un CALL en la máquina de pila crea un frame, copia los argumentos y
+guarda la dirección de retorno. Las funciones pequeñas llamadas en los
+ciclos internos (in_mandelbrot desde mandel) pagan ese costo en cada
+vuelta. Inliner reemplaza esas llamadas por el código de la función:
+
+    CALL f          ->  LOCAL_SET b$temp2       ; Parámetros, en orden inverso
+                        LOCAL_SET a$temp1
+                        LOOP                    ; Solo si hay RET antes del final
+                          <código de f>         ; Locales renombradas
+                          <RET: LOCAL_SET $temp3, CONSTI 1, CBREAK>
+                        ENDLOOP
+                        LOCAL_GET $temp3        ; Valor retornado
+
+Las variables de la función llamada se renombran con new_temp(), así que
+no chocan con las del llamador ni con otra expansión de la misma función.
+Si la única instrucción RET está al final, el código se copia sin el RET
+y el valor queda en la pila, sin LOOP. Un argumento que es una constante
+o una local del llamador (la función llamada no puede modificarla) se
+usa directamente en lugar del parámetro, si la función no lo asigna y,
+en el caso de la local, si está asignada en todo camino que llega al
+CALL: si no, leerla en el cuerpo movería o eliminaría el error de
+lectura sin asignar. Un RET dentro de un ciclo de la
+función llamada marca además una bandera que, después de cada ENDLOOP,
+sigue saliendo hasta el LOOP de la expansión.
+
+Solo se expanden funciones no importadas, no recursivas (según el grafo
+de llamadas) y con un tamaño máximo. Las funciones se procesan de las
+hojas hacia main, así que una función ya tiene expandidas sus propias
+llamadas cuando se mide para expandirla en otra. Como las locales sin
+asignar no se pueden representar en el IR, tampoco se expande una
+función que, en algún camino, puede leer una local antes de asignarla
+(según las definiciones que la alcanzan, ver source/cfg.py): la copia
+renombrada vive en el llamador y conservaría el valor de la llamada
+anterior.
+
+    "InlineMaxSize": 60           ; Instrucciones de la función llamada (0 desactiva)
+    "InlineMaxCallerSize": 2000   ; No se expande en funciones más grandes
+'''
+from source.cfg import Analysis, structure
+from source.ircode import new_temp
+
+_simple = { 'CONSTI', 'CONSTF', 'LOCAL_GET' }   # Argumentos que se pueden leer en cada uso
+
+class Inliner:
+	def __init__(self, max_size=60, max_caller_size=2000):
+		self.max_size = max_size
+		self.max_caller_size = max_caller_size
+		self.inlined = 0            # Llamadas expandidas
+
+	@classmethod
+	def from_config(cls, config):
+		return cls(config.get("InlineMaxSize", 60), config.get("InlineMaxCallerSize", 2000))
+
+	def run(self, module):
+		'''
+		Expande las llamadas en todas las funciones del módulo, en su
+		lugar. Retorna la cantidad de llamadas expandidas.
+		'''
+		if self.max_size <= 0:
+			return 0
+		self.module = module
+		graph = call_graph(module)
+		recursive = { name for name in graph if _reaches(graph, name, name) }
+		before = self.inlined
+		for func in _postorder(module, graph):
+			self.inline_calls(func, recursive)
+		return self.inlined - before
+
+	def can_inline(self, callee, recursive):
+		return (not callee.imported and callee.name not in recursive
+				and callee.name != 'main' and len(callee.code) <= self.max_size
+				and _assigns_before_reads(callee))
+
+	def inline_calls(self, func, recursive):
+		code = func.code
+		pc = 0
+		while pc < len(code):
+			instr = code[pc]
+			if instr[0] == 'CALL' and len(code) <= self.max_caller_size:
+				callee = self.module.functions.get(instr[1])
+				if callee is not None and self.can_inline(callee, recursive):
+					args = _simple_args(func, pc, callee)
+					body = self.expand(func, callee, args)
+					code[pc - len(args):pc + 1] = body
+					self.inlined += 1
+					pc += len(body) - len(args)
+					continue
+			pc += 1
+
+	def expand(self, func, callee, args):
+		'''
+		Retorna el código que reemplaza un CALL a callee dentro de func,
+		junto con las instrucciones args, que apilan los últimos argumentos.
+		'''
+		names = { }
+		substitutes = dict(zip(callee.parmnames[len(callee.parmnames) - len(args):], args))
+		for name, ir_type in callee.locals.items():
+			if name not in substitutes:
+				names[name] = f"{name}{new_temp()}"
+				func.new_local(names[name], ir_type, callee.locals_gox.get(name))
+		body = [ ('LOCAL_SET', names[name]) for name in reversed(callee.parmnames) if name not in substitutes ]
+		code = callee.code
+		straight = _as_value(code)
+		if straight is not None:
+			# Los RET terminan ramas de IF: el valor queda en la pila
+			body.extend(_rename(instr, names, substitutes) for instr in straight)
+			return body
+		rets = [ pc for pc, instr in enumerate(code) if instr[0] == 'RET' ]
+		result = new_temp()
+		func.new_local(result, callee.return_type, callee.return_type_gox)
+		flag = None
+		loops = set(structure(code)[1].values())
+		if any(start < pc < end for pc in rets for start, end in loops):
+			flag = new_temp()
+			func.new_local(flag, 'I', 'bool')
+			body.extend([('CONSTI', 0), ('LOCAL_SET', flag)])
+		body.append(('LOOP',))
+		loops = 0                   # Ciclos de callee abiertos
+		for instr in code:
+			opname = instr[0]
+			if opname == 'RET':
+				body.append(('LOCAL_SET', result))
+				if loops:
+					body.extend([('CONSTI', 1), ('LOCAL_SET', flag)])
+				body.extend([('CONSTI', 1), ('CBREAK',)])
+				continue
+			body.append(_rename(instr, names, substitutes))
+			if opname == 'LOOP':
+				loops += 1
+			elif opname == 'ENDLOOP':
+				loops -= 1
+				if flag is not None:
+					# Un RET dentro del ciclo sigue saliendo
+					body.extend([('LOCAL_GET', flag), ('CBREAK',)])
+		body.extend([('ENDLOOP',), ('LOCAL_GET', result)])
+		return body
+
+def call_graph(module):
+	'''
+	Retorna {función: conjunto de funciones que llama} del módulo.
+	'''
+	return { name: { instr[1] for instr in func.code if instr[0] == 'CALL' }
+			for name, func in module.functions.items() }
+
+def _reaches(graph, start, target):
+	seen = set()
+	pending = list(graph.get(start, ()))
+	while pending:
+		name = pending.pop()
+		if name == target:
+			return True
+		if name not in seen:
+			seen.add(name)
+			pending.extend(graph.get(name, ()))
+	return False
+
+def _postorder(module, graph):
+	# Funciones no importadas, cada una después de las que llama
+	order = []
+	seen = set()
+	def visit(name):
+		seen.add(name)
+		for callee in graph.get(name, ()):
+			if callee not in seen:
+				visit(callee)
+		func = module.functions.get(name)
+		if func is not None and not func.imported:
+			order.append(func)
+	for name in graph:
+		if name not in seen:
+			visit(name)
+	return order
+
+def _as_value(code):
+	'''
+	Reescribe code, que termina en RET, para que deje el valor retornado
+	en la pila al terminar, sin RET:
+
+	    IF, <a>, RET, ENDIF, <b>, RET  ->  IF, <a>, ELSE, <b>, ENDIF
+
+	Retorna None si hay un RET dentro de un ciclo.
+	'''
+	depth = 0
+	for pc, instr in enumerate(code):
+		opname = instr[0]
+		if opname in ('LOOP', 'ENDLOOP', 'ENDIF'):
+			depth += -1 if opname[:3] == 'END' else 1
+		elif opname == 'RET':
+			if depth:
+				return None
+			return code[:pc]        # Lo que sigue es inalcanzable
+		elif opname == 'IF':
+			if depth:
+				depth += 1
+				continue
+			else_pc, end_pc = structure(code)[0][pc]
+			then = code[pc + 1:else_pc if else_pc is not None else end_pc]
+			other = code[else_pc + 1:end_pc] if else_pc is not None else []
+			rest = code[end_pc + 1:]
+			if not (then and then[-1] == ('RET',)) and not (other and other[-1] == ('RET',)):
+				depth += 1          # Un IF sin RET al final de una rama
+				continue
+			if then and then[-1] == ('RET',):
+				then = _as_value(then)
+				other = _as_value(other if other and other[-1] == ('RET',) else other + rest)
+			else:
+				then = _as_value(then + rest)
+				other = _as_value(other)
+			if then is None or other is None:
+				return None
+			return code[:pc] + [('IF',)] + then + [('ELSE',)] + other + [('ENDIF',)]
+	return None
+
+def _assigns_before_reads(func):
+	# Ningún LOCAL_GET puede leer una local sin asignar, en ningún camino
+	return not Analysis.of(func).unassigned_reads()
+
+def _simple_args(func, pc, callee):
+	'''
+	Retorna las instrucciones que apilan los últimos argumentos del CALL
+	en `pc` de func y que se pueden usar en lugar del parámetro: una
+	constante o una local asignada en todo camino, cuando callee no
+	asigna el parámetro.
+	'''
+	code = func.code
+	count = 0
+	for name in reversed(callee.parmnames):
+		if count >= pc or code[pc - count - 1][0] not in _simple:
+			break
+		if any(instr == ('LOCAL_SET', name) for instr in callee.code):
+			break
+		arg = code[pc - count - 1]
+		if arg[0] == 'LOCAL_GET' and not Analysis.of(func).assigned(pc, arg[1]):
+			break
+		count += 1
+	return code[pc - count:pc]
+
+def _rename(instr, names, substitutes):
+	if instr[0] == 'LOCAL_GET' and instr[1] in substitutes:
+		return substitutes[instr[1]]
+	if instr[0] in ('LOCAL_GET', 'LOCAL_SET'):
+		return (instr[0], names[instr[1]])
+	return instr
@@ -66,6 +66,8 @@ nuestro Código IR:
     PEEKI                    ; Leer entero desde memoria (dirección en la pila)
     POKEI                    ; Escribir entero en memoria (valor, dirección en la pila)
     ITOF                     ; Convertir entero a flotante
+    NEGI                     ; Cambiar el signo (lo genera el optimizador)
+    NOT                      ; 1 si el elemento superior es 0, si no 0 (lo genera el optimizador)
 
     ; Operaciones en punto flotante
     CONSTF value             ; Apilar un literal flotante
@@ -83,6 +85,7 @@ nuestro Código IR:
     PEEKF                    ; Leer flotante desde memoria (dirección en la pila)
     POKEF                    ; Escribir flotante en memoria (valor, dirección en la pila)
     FTOI                     ; Convertir flotante a entero
+    NEGF                     ; Cambiar el signo (lo genera el optimizador)
 
     ; Operaciones orientadas a bytes (los valores se presentan como enteros)
     PRINTB                   ; Imprimir el elemento superior de la pila
@@ -113,11 +116,16 @@ nuestro Código IR:
 
     LOOP                     ; Inicio de un ciclo
     CBREAK                   ; Ruptura condicional. Prueba en la pila
+    CBREAK_IF_FALSE          ; Ruptura si la prueba es falsa (lo genera el optimizador)
     CONTINUE                 ; Regresa al inicio del ciclo
     ENDLOOP                  ; Fin del ciclo
 
     ; Memoria
     GROW                     ; Incrementar memoria (tamaño en la pila) (retorna nuevo tamaño)
+    FREE                     ; Liberar el bloque cuya dirección está en la pila (retorna bytes liberados)
+
+    ; Pila
+    DROP                     ; Descartar el elemento superior de la pila
 
 Una palabra sobre el acceso a memoria... las instrucciones PEEK y POKE
 se usan para acceder a direcciones de memoria cruda. Ambas instrucciones
@@ -199,6 +207,7 @@ from functools import singledispatchmethod
 from source.model  import *
 from source.symtab import Symtab
 from source.typesys import typenames, check_binop, check_unaryop
+from source.builtins import builtins
 import json,os
 # Load configuration
 def load_config():
@@ -218,7 +227,8 @@ CONFIG = load_config()# Global configuration
 # módulo es un conjunto de funciones.
 
 class IRModule:
-	def __init__(self):
+	def __init__(self, name=None):
+		self.name = name           # Nombre del programa (archivo sin extensión)
 		self.functions = { }       # Dict de funciones IR 
 		self.globals = { }         # Dict de variables global
 		
@@ -232,10 +242,11 @@ class IRModule:
 			
 # Variables Globales
 class IRGlobal:
-	def __init__(self, name, ir_type, gox_type=None):
+	def __init__(self, name, ir_type, gox_type=None, const=False):
 		self.name = name
 		self.type = ir_type      # Tipo IR
 		self.gox_type = gox_type # Tipo GoxLang original
+		self.const = const       # Declarada con const
 		
 	def dump(self):
 		print(f"GLOBAL::: {self.name}: {self.type}")
@@ -259,7 +270,9 @@ class IRFunction:
 		self.imported = imported
 		self.locals = { }        # Variables Locales (tipo IR)
 		self.locals_gox = { }    # Tipos GoxLang originales
+		self.consts = set()      # Variables locales declaradas con const
 		self.code = [ ]          # Lista de Instrucciones IR 
+		self.analysis = None     # Análisis de flujo guardado (source.cfg)
 		
 	def new_local(self, name, ir_type, gox_type=None):
 		self.locals[name] = ir_type
@@ -352,14 +365,14 @@ class IRCode(Visitor):
 		ircode = cls()
 		ircode.debug = CONFIG.get("Debug", False)
 		ircode.createOutputFile = CONFIG.get("GenerateOutputFile", False)
-		ircode.module = IRModule()
+		ircode.module = IRModule(fileName)
 
 		func = IRFunction(ircode.module, 'main', [], [], 'I', 'int')
 		# Then process statements in main function
 		if ircode.debug:
 			print(f"[bold green][DEBUG][/bold green] Iniciando generacion de codigo intermedio del archivo: {fileName}")
 		for item in node:
-			item.accept(ircode, func)
+			ircode.statement(item, func)
 		if '_actual_main' in ircode.module.functions:
 			func.append(('CALL', '_actual_main'))
 		else:
@@ -385,6 +398,110 @@ class IRCode(Visitor):
 			print(f"[bold blue][OUTPUT][/bold blue] Código IR guardado en: {output_file}")
 		return ircode.module
 
+	def statement(self, stmt, func: IRFunction):
+		'''
+		Genera el código de una instrucción. Una llamada a función usada
+		como instrucción deja su valor de retorno en la pila, así que se
+		descarta con DROP para que la pila quede balanceada.
+		'''
+		stmt.accept(self, func)
+		if isinstance(stmt, FunctionCall):
+			func.append(('DROP',))
+
+	def var_type(self, name, func: IRFunction):
+		if name in func.module.globals:
+			return func.module.globals[name].gox_type
+		return func.locals_gox.get(name)
+
+	def is_invariant(self, n, var):
+		'''
+		True si la expresión n no tiene efectos secundarios, no lee
+		memoria y no depende de la variable var.
+		'''
+		if isinstance(n, (Integer, Float, Char, Bool)):
+			return True
+		if isinstance(n, NamedLocation):
+			return n.name != var
+		if isinstance(n, BinOp):
+			return self.is_invariant(n.left, var) and self.is_invariant(n.right, var)
+		if isinstance(n, UnaryOp):
+			return n.operator != '^' and self.is_invariant(n.operand, var)
+		return False
+
+	def fill_loop(self, n: While, func: IRFunction):
+		'''
+		Reconoce un ciclo que llena un arreglo con un valor constante:
+
+		    while i <= fin {          // o i < fin
+		        `(base + i) = valor;
+		        i = i + 1;
+		    }
+
+		donde base, valor y fin no dependen de i ni leen memoria. Se emite
+		una sola instrucción FILLI/FILLF/MEMSET con la cantidad de
+		elementos y se deja i con el valor que tendría al salir del ciclo.
+		Retorna False si el ciclo no tiene esa forma.
+		'''
+		cond = n.condition
+		if not (isinstance(cond, BinOp) and cond.operator in ('<', '<=') and isinstance(cond.left, NamedLocation)):
+			return False
+		var = cond.left.name
+		if self.var_type(var, func) != 'int' or len(n.statements) != 2:
+			return False
+		store, step = n.statements
+		if not (isinstance(store, Assignment) and isinstance(store.location, MemoryLocation)):
+			return False
+		addr = store.location.expr
+		if not (isinstance(addr, BinOp) and addr.operator == '+' and isinstance(addr.right, NamedLocation) and addr.right.name == var):
+			return False
+		if not (isinstance(step, Assignment) and isinstance(step.location, NamedLocation) and step.location.name == var):
+			return False
+		inc = step.expression
+		if not (isinstance(inc, BinOp) and inc.operator == '+' and isinstance(inc.left, NamedLocation) and inc.left.name == var
+				and isinstance(inc.right, Integer) and inc.right.value == 1):
+			return False
+		if not all(self.is_invariant(e, var) for e in (cond.right, addr.left, store.expression)):
+			return False
+		dataType = store.location.type
+		fill = { 'int': 'FILLI', 'bool': 'FILLI', 'float': 'FILLF' }.get(dataType)
+		if dataType == 'char' and self.CHAR_SIZE == 1:
+			fill = 'MEMSET'
+		if fill is None:
+			return False
+
+		is_global = var in func.module.globals
+		get_var = ('GLOBAL_GET' if is_global else 'LOCAL_GET', var)
+		set_var = ('GLOBAL_SET' if is_global else 'LOCAL_SET', var)
+		count = new_temp()
+		func.new_local(count, 'I', 'int')
+		# count = fin - i (+ 1 si la condición es <=). El checker garantiza
+		# que fin es int, porque se compara con i.
+		cond.right.accept(self, func)
+		func.append(get_var)
+		func.append(('SUBI',))
+		if cond.operator == '<=':
+			func.extend([('CONSTI', 1), ('ADDI',)])
+		func.append(('LOCAL_SET', count))
+		func.extend([('LOCAL_GET', count), ('CONSTI', 0), ('GTI',), ('IF',)])
+		# Dirección del primer elemento, igual que en MemoryLocation
+		if addr.left.accept(self, func) == 'float':
+			func.append(('FTOI',))
+		func.append(get_var)
+		scale = { 'FILLI': self.INT_SIZE, 'FILLF': self.FLOAT_SIZE, 'MEMSET': 1 }[fill]
+		if scale > 1:
+			func.extend([('CONSTI', scale), ('MULI',)])
+		func.append(('ADDI',))
+		value_type = store.expression.accept(self, func)
+		if fill == 'FILLI' and value_type == 'float':
+			func.append(('FTOI',))
+		elif fill == 'FILLF' and value_type == 'int':
+			func.append(('ITOF',))
+		func.extend([('LOCAL_GET', count), (fill,)])
+		# i = i + count
+		func.extend([get_var, ('LOCAL_GET', count), ('ADDI',), set_var])
+		func.append(('ENDIF',))
+		return True
+
 	# --- Statements
 	@singledispatchmethod
 	def visit(self, n, func):
@@ -417,15 +534,17 @@ class IRCode(Visitor):
 		func.append(('IF',))
 		# Procesar las instrucciones en la parte de la consecuencia (then)
 		for stmt in n.if_statements:
-			stmt.accept(self, func)
+			self.statement(stmt, func)
 		func.append(('ELSE',))
 		# Procesar las instrucciones en la parte alternativa (else)
 		for stmt in n.else_statements:
-			stmt.accept(self, func)
+			self.statement(stmt, func)
 		func.append(('ENDIF',))
 
 	@visit.register
 	def _(self, n: While, func: IRFunction):
+		if self.fill_loop(n, func):
+			return
 		func.append(('LOOP',))
 		func.append(('CONSTI', 1))
 		# Visitar n.test
@@ -434,7 +553,7 @@ class IRCode(Visitor):
 		func.append(('CBREAK',))
 		# Visitar n.body
 		for stmt in n.statements:
-			stmt.accept(self, func)
+			self.statement(stmt, func)
 		func.append(('ENDLOOP',))
 
 	@visit.register
@@ -463,12 +582,14 @@ class IRCode(Visitor):
 	def _(self, n: Variable, func: IRFunction):
 		irtype = _typemap.get(n.type, 'I')
 		if func.name == 'main':  # Variables globales
-			self.module.globals[n.name] = IRGlobal(n.name, irtype, n.type)
+			self.module.globals[n.name] = IRGlobal(n.name, irtype, n.type, n.is_const)
 			if n.value:
 				n.value.accept(self, func)
 				func.append(('GLOBAL_SET', n.name))
 			return
 		func.new_local(n.name, irtype, n.type)
+		if n.is_const:
+			func.consts.add(n.name)
 		# Visit the initializer if it exists
 		if n.value:
 			n.value.accept(self, func)
@@ -503,7 +624,7 @@ class IRCode(Visitor):
 		if not n.imported:
 			# Visitar n.stmts
 			for stmt in n.statements:
-				stmt.accept(self, newfunc)
+				self.statement(stmt, newfunc)
 			# Verificar si la última instrucción es RET
             # Si no lo es, agregar un return por defecto
 			if not newfunc.code or newfunc.code[-1][0] != 'RET':
@@ -581,8 +702,8 @@ class IRCode(Visitor):
 		if n.operator == '^' and type == 'int':
 			# This is our special allocation operator for an array of integers.
 			# The number of elements is now on the stack.
-			# Multiply it by INT_SIZE (assuming 4 bytes for an int).
-			func.append(('CONSTI', 4))  # Or use a way to get self.INT_SIZE if available/consistent
+			# Multiply it by INT_SIZE, the same size PEEKI/POKEI use.
+			func.append(('CONSTI', self.INT_SIZE))
 			func.append(('MULI',))
 			# Now the total number of bytes to allocate is on the stack.
 			# Proceed to emit the GROW instruction from _unaryop_code.
@@ -607,6 +728,11 @@ class IRCode(Visitor):
 		for arg_expr in n.args:
 			arg_gox_type = arg_expr.accept(self, func) # Evalúa el argumento y deja el valor en la pila
 			arg_gox_types.append(arg_gox_type)
+		# Las funciones incorporadas son una instrucción IR, no un CALL
+		if n.name in builtins and n.name not in self.module.functions:
+			_, return_type, code = builtins[n.name]
+			func.extend(code)
+			return return_type
 		# 2. Emitir la instrucción CALL
 		func.append(('CALL', n.name))
 		# 3. Determinar el tipo de retorno GoxLang de la función
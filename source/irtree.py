@@ -0,0 +1,271 @@
+# irtree.py
+'''
+Árboles a partir del código IR
+==============================
+
+Los backends que generan código (closures, Python, C) no trabajan sobre
+la pila: convierten el código IR enlazado de cada función (ver
+source/linker.py) en un árbol de instrucciones y expresiones. La pila se
+interpreta de forma simbólica: cada instrucción que produce un valor
+apila una expresión, y las instrucciones con efectos (asignaciones, POKE,
+PRINT, llamadas) generan instrucciones del árbol.
+
+Expresiones:
+
+    ('const', valor)
+    ('local', slot)               ; Variable local o temporal
+    ('global', slot)
+    ('binop', op, a, b)           ; op es el nombre IR: 'ADDI', 'LTF', ...
+    ('unop', op, a)               ; 'ITOF', 'FTOI', 'NEGI', 'NEGF', 'NOT', 'PEEKI', 'PEEKF', 'PEEKB'
+    ('call', indice, [args])      ; Solo como valor de un 'assign'
+    ('builtin', op, [args])       ; 'GROW', 'FREE', 'MEMCMP'; solo en 'assign'
+
+Instrucciones:
+
+    ('assign', slot, expr)        ; Local o temporal
+    ('gassign', slot, expr)
+    ('store', op, addr, valor)    ; 'POKEI', 'POKEF', 'POKEB'
+    ('print', op, expr)           ; 'PRINTI', 'PRINTF', 'PRINTB'
+    ('mem', op, a, b, c)          ; 'MEMSET', 'MEMCPY', 'FILLI', 'FILLF'
+    ('expr', expr)                ; Se evalúa y se descarta (DROP)
+    ('if', cond, [then], [else])
+    ('loop', [cuerpo])            ; Ciclo infinito, se sale con break_if
+    ('break_if', cond)            ; CBREAK_IF_FALSE es break_if de ('unop', 'NOT', cond)
+    ('continue',)
+    ('return', expr)
+
+Las expresiones pendientes en la pila se guardan en temporales antes de
+cualquier instrucción con efectos y antes de un IF o LOOP, así el orden
+de evaluación es el mismo que en la máquina de pila. Las llamadas siempre
+se asignan a un temporal. Un IF cuyas ramas dejan valores en la pila los
+asigna a los mismos temporales en ambas ramas.
+
+Los temporales son slots adicionales del frame, después de las variables
+de la función.
+'''
+from source.verifier import ir_signatures
+
+class TreeError(Exception):
+	'''
+	El código IR tiene una forma que los árboles no representan (por
+	ejemplo, un LOOP que sale con valores extra en la pila).
+	'''
+	pass
+
+_stores = { 'POKEI', 'POKEF', 'POKEB' }
+_prints = { 'PRINTI', 'PRINTF', 'PRINTB' }
+_memops = { 'MEMSET', 'MEMCPY', 'FILLI', 'FILLF' }
+_builtins = { 'GROW': 1, 'FREE': 1, 'MEMCMP': 3 }
+_unops = { 'ITOF', 'FTOI', 'NEGI', 'NEGF', 'NOT', 'PEEKI', 'PEEKF', 'PEEKB' }
+
+class FunctionTree:
+	def __init__(self, func, module):
+		self.func = func                              # LinkedFunction
+		self.module = module                          # LinkedModule
+		self.names = list(func.slots)                 # Nombre de cada slot
+		self.slot_types = list(func.slot_types)       # Tipo IR de cada slot
+		self.temps = set()                            # Slots temporales
+		self.body = []
+
+	@property
+	def nslots(self):
+		return len(self.slot_types)
+
+	def new_temp(self, ir_type):
+		slot = len(self.slot_types)
+		self.names.append(f'$t{slot}')
+		self.slot_types.append(ir_type)
+		self.temps.add(slot)
+		return slot
+
+	def typeof(self, expr):
+		kind = expr[0]
+		if kind == 'const':
+			return 'F' if isinstance(expr[1], float) else 'I'
+		if kind == 'local':
+			return self.slot_types[expr[1]]
+		if kind == 'global':
+			return self.module.global_types[expr[1]]
+		if kind in ('binop', 'unop'):
+			return ir_signatures[expr[1]][1][0]
+		if kind == 'call':
+			return self.module.functions[expr[1]].return_type
+		return 'I'
+
+def build_tree(func, module, start=0, end=None):
+	'''
+	Construye el FunctionTree de una LinkedFunction. Lanza TreeError si
+	el código no se puede representar. Con start/end solo se convierte
+	ese tramo del código (un LOOP completo, para el JIT) y no se agrega
+	el retorno final.
+	'''
+	tree = FunctionTree(func, module)
+	_Builder(tree).run(func.code[start:end], start == 0 and end is None)
+	return tree
+
+class _Builder:
+	def __init__(self, tree):
+		self.tree = tree
+
+	def is_stable(self, expr):
+		return expr[0] == 'const' or (expr[0] == 'local' and expr[1] in self.tree.temps)
+
+	def is_unused_read(self, expr):
+		# Una lectura que se descarta sin efecto: ni una local ni una
+		# global que pueden estar sin asignar, que fallan al leerlas
+		if expr[0] == 'local':
+			return expr[1] not in self.tree.func.unassigned
+		if expr[0] == 'global':
+			return expr[1] not in self.tree.module.unassigned_globals
+		return expr[0] == 'const'
+
+	def spill(self):
+		# Evalúa ahora las expresiones pendientes, guardándolas en temporales
+		for i, expr in enumerate(self.stack):
+			if not self.is_stable(expr):
+				slot = self.tree.new_temp(self.tree.typeof(expr))
+				self.stmts.append(('assign', slot, expr))
+				self.stack[i] = ('local', slot)
+
+	def pop(self, n):
+		if n == 0:
+			return []
+		if len(self.stack) < n:
+			raise TreeError("Stack underflow")
+		values = self.stack[-n:]
+		del self.stack[-n:]
+		return values
+
+	def to_temps(self, values, slots):
+		# Asigna los valores extra de una rama a los temporales del IF
+		if slots is None:
+			slots = [self.tree.new_temp(self.tree.typeof(value)) for value in values]
+		for slot, value in zip(slots, values):
+			self.stmts.append(('assign', slot, value))
+		return slots
+
+	def run(self, code, implicit_return=True):
+		self.stack = []            # Expresiones pendientes, None si el código es inalcanzable
+		self.stmts = self.tree.body
+		blocks = []
+		dead = 0                   # Profundidad de bloques dentro de código inalcanzable
+		for instr in code:
+			opname = instr[0]
+			if self.stack is None:
+				if opname in ('IF', 'LOOP'):
+					dead += 1
+					continue
+				if dead and opname in ('ENDIF', 'ENDLOOP'):
+					dead -= 1
+					continue
+				if dead or opname not in ('ELSE', 'ENDIF', 'ENDLOOP'):
+					continue
+			if opname == 'IF':
+				cond = self.pop(1)[0]
+				self.spill()
+				blocks.append({'kind': 'IF', 'cond': cond, 'outer': self.stmts, 'entry': list(self.stack),
+						'then': [], 'else': None, 'then_stack': None, 'phis': None})
+				self.stmts = blocks[-1]['then']
+			elif opname == 'ELSE':
+				block = blocks[-1]
+				if self.stack is not None:
+					block['phis'] = self.to_temps(self.stack[len(block['entry']):], None)
+				block['then_stack'] = self.stack
+				block['else'] = []
+				self.stmts = block['else']
+				self.stack = list(block['entry'])
+			elif opname == 'ENDIF':
+				block = blocks.pop()
+				entry = block['entry']
+				if block['else'] is None:
+					if self.stack is not None and len(self.stack) != len(entry):
+						raise TreeError("IF without ELSE changes the stack")
+					self.stack = list(entry)
+				else:
+					if self.stack is not None:
+						block['phis'] = self.to_temps(self.stack[len(entry):], block['phis'])
+					if self.stack is None and block['then_stack'] is None:
+						self.stack = None
+					else:
+						self.stack = entry + [('local', slot) for slot in block['phis']]
+				block['outer'].append(('if', block['cond'], block['then'], block['else'] or []))
+				self.stmts = block['outer']
+			elif opname == 'LOOP':
+				self.spill()
+				blocks.append({'kind': 'LOOP', 'outer': self.stmts, 'entry': list(self.stack), 'body': [], 'exits': False})
+				self.stmts = blocks[-1]['body']
+			elif opname in ('CBREAK', 'CBREAK_IF_FALSE'):
+				loop = next(block for block in reversed(blocks) if block['kind'] == 'LOOP')
+				cond = self.pop(1)[0]
+				if opname == 'CBREAK_IF_FALSE':
+					cond = ('unop', 'NOT', cond)
+				if len(self.stack) != len(loop['entry']):
+					raise TreeError("CBREAK leaves values on the stack")
+				self.stmts.append(('break_if', cond))
+				loop['exits'] = True
+			elif opname == 'CONTINUE':
+				self.stmts.append(('continue',))
+				self.stack = None
+			elif opname == 'ENDLOOP':
+				loop = blocks.pop()
+				loop['outer'].append(('loop', loop['body']))
+				self.stmts = loop['outer']
+				self.stack = list(loop['entry']) if loop['exits'] else None
+			elif opname == 'RET':
+				self.stmts.append(('return', self.pop(1)[0]))
+				self.stack = None
+			elif opname in ('CONSTI', 'CONSTF'):
+				self.stack.append(('const', instr[1]))
+			elif opname == 'LOCAL_GET':
+				self.stack.append(('local', instr[1]))
+			elif opname == 'GLOBAL_GET':
+				self.stack.append(('global', instr[1]))
+			elif opname == 'LOCAL_SET':
+				value = self.pop(1)[0]
+				self.spill()
+				self.stmts.append(('assign', instr[1], value))
+			elif opname == 'GLOBAL_SET':
+				value = self.pop(1)[0]
+				self.spill()
+				self.stmts.append(('gassign', instr[1], value))
+			elif opname == 'DROP':
+				value = self.pop(1)[0]
+				if not self.is_unused_read(value):
+					self.spill()
+					self.stmts.append(('expr', value))
+			elif opname in _stores:
+				addr, value = self.pop(2)
+				self.spill()
+				self.stmts.append(('store', opname, addr, value))
+			elif opname in _prints:
+				value = self.pop(1)[0]
+				self.spill()
+				self.stmts.append(('print', opname, value))
+			elif opname in _memops:
+				args = self.pop(3)
+				self.spill()
+				self.stmts.append(('mem', opname, *args))
+			elif opname == 'CALL':
+				callee = self.tree.module.functions[instr[1]]
+				self.value_stmt(('call', instr[1], self.pop(callee.nparams)))
+			elif opname in _builtins:
+				self.value_stmt(('builtin', opname, self.pop(_builtins[opname])))
+			elif opname in _unops:
+				self.stack.append(('unop', opname, self.pop(1)[0]))
+			elif opname in ir_signatures:
+				a, b = self.pop(2)
+				self.stack.append(('binop', opname, a, b))
+			else:
+				raise TreeError(f"Unknown instruction {opname}")
+		if blocks:
+			raise TreeError(f"Unterminated {blocks[-1]['kind']}")
+		if self.stack is not None and implicit_return:
+			# Igual que la máquina de pila: main puede terminar sin RET
+			self.stmts.append(('return', self.stack[-1] if self.stack else ('const', 0)))
+
+	def value_stmt(self, expr):
+		# Las llamadas (y GROW/FREE/MEMCMP) se evalúan en orden, en un temporal
+		self.spill()
+		slot = self.tree.new_temp(self.tree.typeof(expr))
+		self.stmts.append(('assign', slot, expr))
+		self.stack.append(('local', slot))
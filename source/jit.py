@@ -0,0 +1,111 @@
+# jit.py
+'''
+Ejecución por niveles (JIT)
+===========================
+
+Con "JitThreshold" mayor que 0, StackMachine empieza interpretando el
+módulo y cuenta por función las llamadas (CALL) y las vueltas de sus
+ciclos (ENDLOOP). Cuando un contador alcanza el umbral, la parte caliente
+se traduce a Python con el generador de source/pyback.py:
+
+* Llamadas: la función completa se compila y las siguientes llamadas,
+  desde el intérprete o desde código compilado, ejecutan la versión
+  compilada. Las llamadas que ya están en curso terminan interpretadas.
+* Vueltas de ciclo: el siguiente LOOP que empiece en esa función se
+  compila a una función que recibe la lista de variables locales del
+  frame, ejecuta el ciclo completo y la actualiza al salir. El
+  intérprete continúa después del ENDLOOP, o retorna si el ciclo ejecutó
+  RET.
+
+El código compilado usa la misma memoria, las mismas globales y la misma
+salida que el intérprete. Si llama a una función que todavía no está
+compilada, esa llamada se interpreta.
+
+Solo se compila en modo rápido (módulo verificado) y sin trazado. El
+código compilado no cuenta para MaxInstructions.
+
+    "JitThreshold": 1000    ; 0 desactiva el JIT
+    "JitLog": false         ; Informa cada compilación en stderr
+'''
+import sys
+import time
+
+from source.cfg import loop_end
+from source.irtree import build_tree, TreeError
+from source.pyback import PythonGenerator, function_name, runtime
+
+class Jit:
+	def __init__(self, vm, threshold, log=False):
+		self.vm = vm
+		self.threshold = threshold
+		self.log = log
+		self.generator = PythonGenerator(vm.linked)
+		self.namespace = runtime(vm)    # Compartido por todo el código compilado
+		for func in vm.functions:
+			func.calls = 0              # Llamadas interpretadas
+			func.backedges = 0          # ENDLOOP ejecutados
+			func.compiled = False if func.imported else None   # False = no se compila
+			func.loops = {}             # {pc del LOOP: (función, pc de salida) o None}
+			if not func.imported:
+				self.namespace[function_name(func)] = self.stub(func)
+
+	def report(self, message):
+		if self.log:
+			self.vm.output.flush()
+			print(f"[JIT]: {message}", file=sys.stderr)
+
+	def stub(self, func):
+		# Lo que llama el código compilado mientras func no esté compilada
+		vm = self.vm
+		def call(*args):
+			compiled = self.hot_function(func)
+			if compiled:
+				return compiled(*args)
+			return vm._call_interpreted(func, args)
+		return call
+
+	def hot_function(self, func):
+		'''
+		Cuenta una llamada a func. Retorna la función compilada si la
+		llamada alcanza el umbral y func se pudo compilar.
+		'''
+		if func.compiled is None:
+			func.calls += 1
+			if func.calls >= self.threshold:
+				self.compile_function(func)
+		return func.compiled
+
+	def hot_loop(self, func, pc):
+		'''
+		Retorna (función compilada, pc de salida) para el LOOP en `pc`, o
+		None si no se pudo compilar.
+		'''
+		if pc not in func.loops:
+			func.loops[pc] = self.compile_loop(func, pc)
+		return func.loops[pc]
+
+	def compile_function(self, func):
+		start = time.perf_counter()
+		try:
+			lines = self.generator.function_source(build_tree(func, self.vm.linked))
+		except TreeError as e:
+			func.compiled = False
+			self.report(f"Cannot compile '{func.name}': {e}")
+			return
+		# Al definirse reemplaza al stub en el espacio de nombres
+		exec(compile("\n".join(lines), f"<jit {func.name}>", 'exec'), self.namespace)
+		func.compiled = self.namespace[function_name(func)]
+		self.report(f"Compiled '{func.name}' after {func.calls} calls ({(time.perf_counter() - start) * 1000:.2f} ms)")
+
+	def compile_loop(self, func, pc):
+		start = time.perf_counter()
+		end = loop_end(func.code, pc)
+		name = f"loop_{func.name}_{pc}"
+		try:
+			lines = self.generator.loop_source(build_tree(func, self.vm.linked, pc, end + 1), name)
+		except TreeError as e:
+			self.report(f"Cannot compile loop {func.name}:{pc}: {e}")
+			return None
+		exec(compile("\n".join(lines), f"<jit {name}>", 'exec'), self.namespace)
+		self.report(f"Compiled loop {func.name}:{pc}-{end} after {func.backedges} back-edges ({(time.perf_counter() - start) * 1000:.2f} ms)")
+		return self.namespace[name], end + 1
@@ -0,0 +1,143 @@
+# licm.py
+'''
+Movimiento de código invariante de los ciclos
+=============================================
+
+Una expresión dentro de un LOOP cuyo valor no cambia entre vueltas se
+calcula una sola vez antes del ciclo, en un temporal (new_temp()):
+
+    LOOP                        LOCAL_GET width
+      ...                       ITOF
+      LOCAL_GET width           LOCAL_SET $temp1
+      ITOF                      LOOP
+      ...                         ...
+    ENDLOOP                       LOCAL_GET $temp1
+                                  ...
+                                ENDLOOP
+
+hoist_invariants() recorre el cuerpo de cada ciclo evaluando la pila de
+forma simbólica. Un valor es invariante si es una constante, una local
+que el cuerpo no asigna (LOCAL_SET), una global que el cuerpo no asigna
+(GLOBAL_SET) ni puede asignar (sin CALL), o una operación sin efectos
+sobre valores invariantes. Se mueven las expresiones invariantes más
+grandes, y las que se repiten comparten el temporal.
+
+La expresión se calcula antes del ciclo aunque el ciclo no dé ninguna
+vuelta o la expresión esté en una rama de un IF, así que solo se mueven
+operaciones que no pueden fallar: no se mueven lecturas de memoria (PEEK
+fuera de los límites), FTOI, ni divisiones, salvo por una constante
+distinta de cero. Por lo mismo, las variables que lee deben estar
+asignadas en todo camino que llega al LOOP (ver source/cfg.py); leer
+una sin asignar es un error. Los ciclos externos se procesan primero, así una
+expresión que no cambia en ninguno de los dos sale directamente antes del
+ciclo externo, y las que solo son invariantes en el interno salen después.
+'''
+from source.cfg import Analysis, global_assigned, loop_end
+from source.ircode import new_temp
+from source.verifier import ir_signatures, ir_leaves, ir_barriers, ir_safe, gox_types
+
+def hoist_invariants(func):
+	'''
+	Mueve las expresiones invariantes de los ciclos de func antes de cada
+	LOOP, en su lugar. Retorna la cantidad de expresiones movidas.
+	'''
+	hoisted = 0
+	pc = 0
+	while pc < len(func.code):
+		if func.code[pc][0] == 'LOOP':
+			# El código movido queda antes del LOOP, que se corre
+			count, pc = _hoist(func, pc)
+			hoisted += count
+		pc += 1
+	return hoisted
+
+def _hoist(func, start):
+	code = func.code
+	end = loop_end(code, start)
+	body = code[start + 1:end]
+	calls = any(instr[0] == 'CALL' for instr in body)
+	written = { instr[:2] for instr in body if instr[0] in ('LOCAL_SET', 'GLOBAL_SET') }
+
+	initialized = { }           # Lectura -> si la variable está asignada en el LOOP
+
+	def invariant(instr):
+		opname = instr[0]
+		if opname in ('CONSTI', 'CONSTF'):
+			return True
+		if opname in ('LOCAL_GET', 'GLOBAL_GET') and instr not in initialized:
+			initialized[instr] = assigned(func, start, instr)
+		if opname == 'LOCAL_GET':
+			return ('LOCAL_SET', instr[1]) not in written and initialized[instr]
+		if opname == 'GLOBAL_GET':
+			return not calls and ('GLOBAL_SET', instr[1]) not in written and initialized[instr]
+		if opname in ('DIVI', 'DIVF'):
+			return False
+		return opname in ir_safe
+
+	ranges = []                 # (inicio, fin) de las expresiones invariantes
+	stack = []                  # PC donde empieza cada valor, None si es variante
+	for pc in range(start + 1, end):
+		instr = code[pc]
+		opname = instr[0]
+		if opname in ir_barriers:
+			stack = []
+			continue
+		if opname in ir_leaves:
+			stack.append(pc if invariant(instr) else None)
+			continue
+		if opname == 'CALL':
+			callee = func.module.functions.get(instr[1])
+			pops, pushes = len(callee.parmnames) if callee else len(stack), 1
+		elif opname in ir_signatures:
+			pops, pushes = len(ir_signatures[opname][0]), len(ir_signatures[opname][1])
+		else:
+			pops, pushes = 1, 0     # CBREAK, CBREAK_IF_FALSE, DROP
+		args = stack[len(stack) - pops:] if pops else []
+		del stack[len(stack) - pops:]
+		first = args[0] if len(args) == pops and pops else None
+		hoistable = (first is not None and None not in args and pushes == 1
+				and (invariant(instr) or _constant_divisor(code, pc))
+				and all(invariant(other) or _constant_divisor(code, first + i)
+					for i, other in enumerate(code[first:pc + 1])))
+		if hoistable:
+			ranges.append((first, pc))
+		stack.extend([first if hoistable else None] * pushes)
+	# Solo las expresiones más grandes
+	ranges.sort(key=lambda item: (item[0], -item[1]))
+	outer = []
+	for first, last in ranges:
+		if not outer or last > outer[-1][1]:
+			outer.append((first, last))
+	if not outer:
+		return 0, start
+	temps = { }                 # Código de la expresión -> temporal
+	prelude = []
+	for first, last in outer:
+		key = tuple(code[first:last + 1])
+		if key not in temps:
+			temps[key] = new_temp()
+			ir_type = ir_signatures[key[-1][0]][1][0]
+			func.new_local(temps[key], ir_type, gox_types[ir_type])
+			prelude.extend(key)
+			prelude.append(('LOCAL_SET', temps[key]))
+	for first, last in reversed(outer):
+		code[first:last + 1] = [('LOCAL_GET', temps[tuple(code[first:last + 1])])]
+	code[start:start] = prelude
+	return len(outer), start + len(prelude)
+
+def _constant_divisor(code, pc):
+	# DIVI/DIVF en pc divide por una constante distinta de cero
+	return (code[pc][0] in ('DIVI', 'DIVF') and code[pc - 1][0] in ('CONSTI', 'CONSTF')
+			and code[pc - 1][1] != 0)
+
+def assigned(func, pc, instr):
+	'''
+	True si la variable que lee instr (LOCAL_GET o GLOBAL_GET) está
+	asignada en todo camino que llega a la instrucción pc de func. Las
+	constantes siempre lo están.
+	'''
+	if instr[0] == 'LOCAL_GET':
+		return Analysis.of(func).assigned(pc, instr[1])
+	if instr[0] == 'GLOBAL_GET':
+		return global_assigned(func.module, func, pc, instr[1])
+	return True
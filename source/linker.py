@@ -0,0 +1,85 @@
+# linker.py
+'''
+Enlazador de módulos IR
+=======================
+
+El código IR referencia variables y funciones por nombre. Buscar esos
+nombres en diccionarios en cada instrucción es costoso, así que antes de
+ejecutar un módulo se enlaza una sola vez:
+
+* Cada variable local de una función (IRFunction.locals) recibe un índice
+  (slot) dentro del frame de la función. Los parámetros ocupan los
+  primeros slots, en orden.
+* Cada variable global (IRModule.globals) recibe un índice en la tabla de
+  globales.
+* Cada función recibe un índice en la tabla de funciones.
+
+El código enlazado usa los mismos nombres de instrucción, pero con el
+índice en lugar del nombre:
+
+    ('LOCAL_GET', 'x')   ->  ('LOCAL_GET', 2)
+    ('GLOBAL_SET', 'n')  ->  ('GLOBAL_SET', 0)
+    ('CALL', 'fact')     ->  ('CALL', 3)
+
+Un frame es una lista de tamaño fijo que se construye copiando la
+plantilla de la función (LinkedFunction.template).
+
+El enlazador anota además qué variables se pueden leer antes de
+asignarse (LinkedFunction.unassigned, LinkedModule.unassigned_globals,
+según source/cfg.py). El intérprete verifica todas las lecturas; los
+backends compilados solo verifican esas.
+'''
+from source.cfg import Analysis, unassigned_globals
+
+class LinkedFunction:
+	def __init__(self, index, func):
+		self.index = index
+		self.name = func.name
+		self.parmtypes = func.parmtypes
+		self.return_type = func.return_type
+		self.imported = func.imported
+		self.nparams = len(func.parmnames)
+		self.host = None                           # HostFunction de un import func (ver source/host.py)
+		# Los parámetros se declaran primero, así que ocupan los primeros slots
+		self.slots = { name: slot for slot, name in enumerate(func.locals) }
+		self.slot_types = list(func.locals.values())
+		self.template = [None] * len(self.slots)   # None = variable sin asignar
+		# Slots que se pueden leer sin asignar: los backends compilados solo
+		# verifican None en estas lecturas
+		self.unassigned = set() if func.imported else { self.slots[name] for name in Analysis.of(func).unassigned_reads() }
+		self.source = func.code                   # Código IR original (con nombres)
+		self.code = []                             # Código IR enlazado (con índices)
+
+class LinkedModule:
+	def __init__(self, module):
+		self.name = module.name
+		self.functions = [ LinkedFunction(index, func) for index, func in enumerate(module.functions.values()) ]
+		self.function_index = { func.name: func.index for func in self.functions }
+		self.globals = list(module.globals)
+		self.global_index = { name: slot for slot, name in enumerate(self.globals) }
+		self.global_types = [ glob.type for glob in module.globals.values() ]
+		self.unassigned_globals = { self.global_index[name] for name in unassigned_globals(module) if name in self.global_index }
+		self.main = self.function_index.get('main')
+
+def link(module):
+	'''
+	Enlaza un IRModule y retorna un LinkedModule. Lanza NameError si el
+	código referencia una variable o función que no está declarada.
+	'''
+	linked = LinkedModule(module)
+	for func in linked.functions:
+		for pc, instr in enumerate(func.source):
+			opname = instr[0]
+			if opname in ('LOCAL_GET', 'LOCAL_SET'):
+				table, what = func.slots, 'Local variable'
+			elif opname in ('GLOBAL_GET', 'GLOBAL_SET'):
+				table, what = linked.global_index, 'Global variable'
+			elif opname == 'CALL':
+				table, what = linked.function_index, 'Function'
+			else:
+				func.code.append(instr)
+				continue
+			if instr[1] not in table:
+				raise NameError(f"{what} '{instr[1]}' not defined ({func.name}:{pc}).")
+			func.code.append((opname, table[instr[1]]))
+	return linked
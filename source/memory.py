@@ -0,0 +1,195 @@
+# memory.py
+'''
+Memoria lineal de la máquina de pila
+====================================
+
+La memoria es un bytearray. Los enteros y flotantes se leen y escriben en
+little-endian con objetos struct.Struct precompilados, usando unpack_from y
+pack_into directamente sobre el bytearray: no se copian rebanadas ni se
+interpreta un formato en cada instrucción.
+
+El tamaño de los valores se toma de settings/config.json:
+
+    "IntSize": 4      ; 1, 2, 4 u 8 bytes (con signo)
+    "FloatSize": 4    ; 4 (float) u 8 (double) bytes
+
+No se usan memoryviews tipados: mientras exista una vista, el bytearray no
+se puede redimensionar y GROW necesita extenderlo.
+
+Heap
+----
+El bytearray tiene una capacidad mayor o igual a la memoria asignada
+(Heap.top). Cuando GROW necesita más espacio la capacidad se duplica, así
+que asignar en un ciclo no copia toda la memoria en cada iteración.
+Cualquier acceso por encima de Heap.top está fuera de los límites.
+
+GROW es un "bump allocator": cada bloque nuevo empieza en Heap.top. Los
+bloques liberados con free() se guardan en listas por clase de tamaño
+(floor(log2(tamaño))) y GROW los reutiliza, llenos de ceros, antes de
+avanzar Heap.top.
+
+Con "Heap": "mmap" la memoria es un mmap anónimo, o de un archivo si se
+indica "HeapFile", que crece con mmap.resize() en lugar de copiarse. Con
+un archivo, al terminar la ejecución su contenido es la memoria de la
+máquina (los bytes por encima de Heap.top son ceros), así que otro
+programa puede leer los resultados directamente del archivo.
+
+    "Heap": "bytearray"         ; "bytearray" o "mmap"
+    "HeapFile": null            ; Archivo para el heap mmap (opcional)
+'''
+import mmap
+import os
+import struct
+
+_int_formats = { 1: '<b', 2: '<h', 4: '<i', 8: '<q' }
+_float_formats = { 4: '<f', 8: '<d' }
+
+def int_codec(size):
+	'''
+	Retorna el struct.Struct para enteros de `size` bytes.
+	'''
+	if size not in _int_formats:
+		raise ValueError(f"IntSize no soportado: {size} (se admite {sorted(_int_formats)})")
+	return struct.Struct(_int_formats[size])
+
+def float_codec(size):
+	'''
+	Retorna el struct.Struct para flotantes de `size` bytes.
+	'''
+	if size not in _float_formats:
+		raise ValueError(f"FloatSize no soportado: {size} (se admite {sorted(_float_formats)})")
+	return struct.Struct(_float_formats[size])
+
+class Heap:
+	def __init__(self, size=1024):
+		self.memory = self._allocate(size)  # Capacidad = len(memory)
+		self.top = size                 # Fin de la memoria asignada
+		self.blocks = {}                # Bloques asignados {dirección: tamaño}
+		self.free_lists = {}            # Bloques liberados {clase: [dirección]}
+		self.sizes = {}                 # Tamaño de los bloques liberados {dirección: tamaño}
+		self.max_class = -1             # Mayor clase con bloques liberados
+
+	@classmethod
+	def from_config(cls, config, size=1024):
+		kind = config.get("Heap", "bytearray")
+		if kind == "bytearray":
+			return cls(size)
+		if kind == "mmap":
+			path = config.get("HeapFile")
+			if path and not os.path.isabs(path):
+				path = os.path.join(os.path.dirname(__file__), '..', path)
+			return MmapHeap(size, path)
+		raise ValueError(f"Tipo de heap desconocido: {kind!r}")
+
+	def _allocate(self, size):
+		return bytearray(size)
+
+	def view(self, address, size):
+		'''
+		Retorna un memoryview de `size` bytes desde `address`, sin copiar,
+		para que el código anfitrión lea o escriba la memoria. La memoria
+		no puede crecer mientras la vista exista: hay que liberarla
+		(release()) antes de seguir ejecutando.
+		'''
+		if address < 0 or address + size > self.top:
+			raise IndexError(f"Memory view out of bounds. Address: {address}, Size: {size}, Memory size: {self.top}")
+		return memoryview(self.memory)[address:address + size]
+
+	def flush(self):
+		pass
+
+	def reserve(self, end):
+		'''
+		Asegura que la capacidad alcance hasta la dirección `end`,
+		duplicándola si es necesario. El bytearray se extiende en su lugar,
+		así que las referencias a Heap.memory siguen siendo válidas.
+		'''
+		capacity = len(self.memory)
+		if end > capacity:
+			self.memory.extend(bytes(max(end, 2 * capacity) - capacity))
+
+	def alloc(self, size):
+		'''
+		Asigna un bloque de `size` bytes llenos de ceros y retorna su
+		dirección.
+		'''
+		if size < 0:
+			raise ValueError("Cannot grow memory by a negative amount.")
+		if size == 0:
+			return self.top
+		if self.free_lists:
+			address = self._reuse(size)
+			if address is not None:
+				return address
+		address = self.top
+		self.reserve(address + size)
+		self.top = address + size
+		self.blocks[address] = size
+		return address
+
+	def _reuse(self, size):
+		# En la clase floor(log2(size)) hay que buscar un bloque que alcance;
+		# en las clases mayores cualquier bloque tiene al menos size bytes.
+		size_class = size.bit_length() - 1
+		free_list = self.free_lists.get(size_class)
+		index = None
+		if free_list:
+			index = next((i for i in range(len(free_list) - 1, -1, -1) if self.sizes[free_list[i]] >= size), None)
+		while index is None:
+			size_class += 1
+			if size_class > self.max_class:
+				return None
+			free_list = self.free_lists.get(size_class)
+			if free_list:
+				index = len(free_list) - 1
+		address = free_list.pop(index)
+		block_size = self.sizes.pop(address)
+		self.memory[address:address + block_size] = bytes(block_size)
+		self.blocks[address] = block_size
+		return address
+
+	def free(self, address):
+		'''
+		Libera el bloque que empieza en `address` y retorna su tamaño.
+		'''
+		size = self.blocks.pop(address, None)
+		if size is None:
+			raise ValueError(f"free: Address {address} is not the start of an allocated block.")
+		size_class = size.bit_length() - 1
+		self.free_lists.setdefault(size_class, []).append(address)
+		self.max_class = max(self.max_class, size_class)
+		self.sizes[address] = size
+		return size
+
+class MmapHeap(Heap):
+	def __init__(self, size=1024, path=None):
+		self.path = path
+		self.file = None
+		super().__init__(size)
+
+	def _allocate(self, size):
+		if self.path is None:
+			if hasattr(mmap, 'MAP_PRIVATE'):
+				# Privado: un mmap anónimo compartido vive en /dev/shm y
+				# falla con SIGBUS si ese espacio se agota.
+				return mmap.mmap(-1, size, flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+			return mmap.mmap(-1, size)
+		os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+		self.file = open(self.path, 'w+b')
+		self.file.truncate(size)
+		return mmap.mmap(self.file.fileno(), size)
+
+	def reserve(self, end):
+		# resize() remapea la región (y extiende el archivo): el mmap
+		# sigue siendo el mismo objeto y no se copia en Python.
+		capacity = len(self.memory)
+		if end > capacity:
+			self.memory.resize(max(end, 2 * capacity))
+
+	def flush(self):
+		self.memory.flush()
+
+	def close(self):
+		self.memory.close()
+		if self.file is not None:
+			self.file.close()
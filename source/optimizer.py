@@ -0,0 +1,459 @@
+# optimizer.py
+'''
+Optimizador de mirilla (peephole)
+=================================
+
+IRCode genera secuencias fáciles de producir pero costosas de ejecutar:
+
+    -x          CONSTI -1, MULI               ->  NEGI
+    !b          CONSTI 0, EQI                 ->  NOT
+    while c     CONSTI 1, <c>, SUBI, CBREAK   ->  <c>, CBREAK_IF_FALSE
+    if sin else IF, ..., ELSE, ENDIF          ->  IF, ..., ENDIF
+
+El optimizador recorre el código de cada función buscando los patrones
+de una tabla de reglas (peephole_rules) y reemplaza cada coincidencia,
+hasta que ninguna regla se aplica. Se ejecuta entre IRCode.gencode y la
+máquina virtual (ver compiler.py), así que todos los backends reciben el
+código optimizado, y el verificador lo revisa al cargarlo.
+
+Una regla es un patrón de instrucciones consecutivas y una función que
+recibe las instrucciones encontradas y retorna las que las reemplazan, o
+None si la regla no aplica. Un elemento del patrón es un nombre de
+instrucción o una instrucción completa (nombre y operando):
+
+    @peephole(('CONSTI', 1), 'MULI')
+    def mul_one(const, mul):
+        return []
+
+Con context=True la función recibe además, primero, el Optimizer, que
+tiene la función (func), su código (code), la posición de la
+coincidencia (index) y el módulo (module).
+
+Las operaciones entre constantes se calculan al compilar (CONSTI 2,
+CONSTI 3, ADDI -> CONSTI 5), salvo las que fallarían en ejecución (una
+división por cero) o darían un entero fuera de 64 bits. Las variables
+declaradas con const e inicializadas con un valor constante se propagan:
+cada lectura se reemplaza por el valor y, si no queda ninguna, se
+elimina la variable:
+
+    const xmin = -2.0;      GLOBAL_GET xmin, ...  ->  CONSTF -2.0, ...
+
+Después se elimina el código muerto (ver source/dce.py): instrucciones
+inalcanzables, asignaciones que nadie lee y funciones que main no llama.
+
+Optimizer cuenta cuántas veces se aplicó cada regla:
+
+    "Optimize": true          ; Activa el optimizador
+    "OptimizerStats": false   ; Imprime las reglas aplicadas
+'''
+from rich import print
+import math
+import operator
+
+from source.cfg import Analysis
+from source.verifier import ir_signatures, ir_leaves
+from source.cse import eliminate_subexpressions
+from source.dce import remove_dead_functions, remove_dead_stores, remove_unreachable
+from source.licm import hoist_invariants
+from source.induction import reduce_induction_variables
+
+class Rule:
+	def __init__(self, name, pattern, rewrite, context=False):
+		self.name = name
+		self.pattern = pattern      # Nombres o instrucciones completas
+		self.rewrite = rewrite      # rewrite(*instrs) -> [instrucciones] o None
+		self.context = context      # rewrite recibe el Optimizer primero
+
+	def matches(self, window):
+		for element, instr in zip(self.pattern, window):
+			if isinstance(element, str):
+				if instr[0] != element:
+					return False
+			elif instr != element:
+				return False
+		return True
+
+peephole_rules = []       # Tabla de reglas, en orden de prioridad
+
+def peephole(*pattern, context=False):
+	'''
+	Decorador que agrega una regla a peephole_rules.
+	'''
+	def register(rewrite):
+		peephole_rules.append(Rule(rewrite.__name__, pattern, rewrite, context))
+		return rewrite
+	return register
+
+class Optimizer:
+	def __init__(self, module, rules=None):
+		self.module = module
+		self.rules = peephole_rules if rules is None else rules
+		self.hits = { rule.name: 0 for rule in self.rules }
+		self.hits.update(propagate_constant=0, drop_constant=0, unreachable=0, dead_store=0, dead_function=0,
+				licm=0, induction=0, cse=0)
+		self.by_opname = { }        # Reglas por nombre de la primera instrucción
+		for rule in self.rules:
+			first = rule.pattern[0]
+			self.by_opname.setdefault(first if isinstance(first, str) else first[0], []).append(rule)
+		self.lookback = max((len(rule.pattern) for rule in self.rules), default=1) - 1
+		self.func = None
+		self.code = None
+		self.index = 0
+
+	@classmethod
+	def optimize(cls, module, inliner=None):
+		'''
+		Optimiza todas las funciones del módulo en su lugar. Con un
+		Inliner (ver source/inliner.py) expande además las llamadas a
+		funciones pequeñas. Retorna el Optimizer, con las veces que se
+		aplicó cada regla.
+		'''
+		optimizer = cls(module)
+		optimizer.optimize_functions()
+		# Las constantes propagadas y el código expandido pueden
+		# plegarse con lo que los rodea
+		changed = optimizer.propagate_constants()
+		if inliner is not None:
+			optimizer.hits['inline'] = inliner.run(module)
+			changed |= optimizer.hits['inline'] > 0
+		# Código muerto, incluidas las funciones que quedaron sin llamadas
+		optimizer.hits['dead_function'] += remove_dead_functions(module)
+		for func in module.functions.values():
+			if not func.imported:
+				optimizer.hits['unreachable'] += remove_unreachable(func)
+				optimizer.hits['dead_store'] += remove_dead_stores(func, module)
+		changed |= optimizer.hits['unreachable'] + optimizer.hits['dead_store'] > 0
+		if changed:
+			optimizer.optimize_functions()
+		# Código invariante de los ciclos, variables de inducción y
+		# subexpresiones comunes, sobre el código ya simplificado
+		for func in module.functions.values():
+			if not func.imported:
+				optimizer.hits['licm'] += hoist_invariants(func)
+				optimizer.hits['induction'] += reduce_induction_variables(func)
+				optimizer.hits['cse'] += eliminate_subexpressions(func)
+		return optimizer
+
+	def optimize_functions(self):
+		for func in self.module.functions.values():
+			if not func.imported:
+				self.optimize_function(func)
+
+	def optimize_function(self, func):
+		self.func = func
+		code = self.code = func.code
+		i = 0
+		while i < len(code):
+			for rule in self.by_opname.get(code[i][0], ()):
+				n = len(rule.pattern)
+				window = code[i:i + n]
+				if len(window) < n or not rule.matches(window):
+					continue
+				self.index = i
+				replacement = rule.rewrite(self, *window) if rule.context else rule.rewrite(*window)
+				if replacement is None:
+					continue
+				code[i:i + n] = replacement
+				self.hits[rule.name] += 1
+				# El reemplazo puede completar un patrón que empieza antes
+				i = max(0, i - self.lookback)
+				break
+			else:
+				i += 1
+
+	def propagate_constants(self):
+		'''
+		Reemplaza las lecturas de las variables const que se inicializan
+		con una constante por su valor, y elimina las que quedan sin
+		lecturas. Retorna True si reemplazó alguna lectura.
+		'''
+		module = self.module
+		functions = [ func for func in module.functions.values() if not func.imported ]
+		changed = False
+		# Globales: se asignan en main antes de cualquier CALL, así que
+		# ninguna función puede leerlas antes de la asignación
+		main = module.functions.get('main')
+		names = { name for name, glob in module.globals.items() if glob.const }
+		if main and names:
+			values = _constant_values(main, names, 'GLOBAL_SET', functions)
+			changed |= self.replace_reads(functions, values, 'GLOBAL_GET')
+			for name in values:
+				if not _reads(functions, 'GLOBAL_GET', name):
+					_remove_set(main, 'GLOBAL_SET', name)
+					del module.globals[name]
+					self.hits['drop_constant'] += 1
+		# Locales de cada función
+		for func in functions:
+			if not func.consts:
+				continue
+			values = _constant_values(func, func.consts, 'LOCAL_SET', [func])
+			changed |= self.replace_reads([func], values, 'LOCAL_GET')
+			for name in values:
+				if not _reads([func], 'LOCAL_GET', name):
+					_remove_set(func, 'LOCAL_SET', name)
+					del func.locals[name]
+					func.locals_gox.pop(name, None)
+					self.hits['drop_constant'] += 1
+		return changed
+
+	def replace_reads(self, functions, values, opname):
+		replaced = 0
+		for func in functions:
+			code = func.code
+			for pc, instr in enumerate(code):
+				if instr[0] == opname and instr[1] in values:
+					code[pc] = values[instr[1]]
+					replaced += 1
+		self.hits['propagate_constant'] += replaced
+		return replaced > 0
+
+	def report(self):
+		total = sum(self.hits.values())
+		print(f"[bold blue][OPTIMIZER][/bold blue] {total} reemplazos")
+		for name, hits in sorted(self.hits.items(), key=lambda item: -item[1]):
+			if hits:
+				print(f"    {name:24} {hits}")
+
+	# --- Utilidades para las reglas ---
+	def effect(self, instr):
+		'''
+		Retorna (valores que consume, valores que produce) de una
+		instrucción sin control de flujo, o None.
+		'''
+		opname = instr[0]
+		if opname in ir_leaves:
+			return 0, 1
+		if opname in ('LOCAL_SET', 'GLOBAL_SET', 'DROP'):
+			return 1, 0
+		if opname == 'CALL':
+			callee = self.module.functions.get(instr[1])
+			return None if callee is None else (len(callee.parmnames), 1)
+		if opname in ir_signatures:
+			pops, pushes = ir_signatures[opname]
+			return len(pops), len(pushes)
+		return None
+
+	def consumer(self, index):
+		'''
+		Retorna (pc, profundidad) de la instrucción que consume el valor
+		que apila la instrucción en `index`; profundidad es la cantidad de
+		valores apilados encima de él en ese momento. Retorna None si entre
+		medio hay un ciclo, un retorno o una instrucción desconocida.
+		'''
+		code = self.code
+		depth = 0
+		ifs = []                    # Profundidad al entrar a cada IF abierto
+		for pc in range(index + 1, len(code)):
+			opname = code[pc][0]
+			if opname == 'IF':
+				if depth == 0:
+					return pc, 0
+				depth -= 1
+				ifs.append(depth)
+			elif opname == 'ELSE':
+				if not ifs:
+					return None
+				depth = ifs[-1]
+			elif opname == 'ENDIF':
+				if not ifs:
+					return None
+				ifs.pop()
+			else:
+				effect = self.effect(code[pc])
+				if effect is None:
+					return None
+				pops, pushes = effect
+				if pops > depth:
+					return (pc, depth) if not ifs else None
+				depth += pushes - pops
+		return None
+
+def _constant_values(func, names, opname, functions):
+	'''
+	Retorna {nombre: instrucción CONSTI/CONSTF} de las variables de names
+	que en `functions` se asignan una sola vez, en el nivel superior de
+	func, antes de cualquier CALL y con una constante.
+	'''
+	sets = { }
+	for other in functions:
+		for instr in other.code:
+			if instr[0] == opname and instr[1] in names:
+				sets[instr[1]] = sets.get(instr[1], 0) + 1
+	values = { }
+	depth = 0
+	code = func.code
+	for pc, instr in enumerate(code):
+		if instr[0] in ('IF', 'LOOP'):
+			depth += 1
+		elif instr[0] in ('ENDIF', 'ENDLOOP'):
+			depth -= 1
+		elif instr[0] == 'CALL':
+			break
+		elif (depth == 0 and instr[0] == opname and sets.get(instr[1]) == 1
+				and pc > 0 and code[pc - 1][0] in ('CONSTI', 'CONSTF')):
+			values[instr[1]] = code[pc - 1]
+	return values
+
+def _reads(functions, opname, name):
+	return any(instr == (opname, name) for func in functions for instr in func.code)
+
+def _remove_set(func, opname, name):
+	pc = func.code.index((opname, name))
+	del func.code[pc - 1:pc + 1]
+
+# ----------------------------------------------------------------------
+# Reglas
+
+# Signo y negación
+@peephole(('CONSTI', -1), 'MULI')
+def negate_int(const, mul):
+	return [('NEGI',)]
+
+@peephole(('CONSTF', -1.0), 'MULF')
+def negate_float(const, mul):
+	return [('NEGF',)]
+
+@peephole('CONSTI', 'NEGI')
+def negate_int_constant(const, neg):
+	return [('CONSTI', -const[1])]
+
+@peephole('CONSTF', 'NEGF')
+def negate_float_constant(const, neg):
+	return [('CONSTF', -const[1])]
+
+@peephole('NEGI', 'NEGI')
+def double_negate_int(first, second):
+	return []
+
+@peephole('NEGF', 'NEGF')
+def double_negate_float(first, second):
+	return []
+
+@peephole(('CONSTI', 0), 'EQI')
+def logical_not(const, eq):
+	return [('NOT',)]
+
+@peephole('CONSTI', 'NOT')
+def not_constant(const, not_):
+	return [('CONSTI', 0 if const[1] else 1)]
+
+# Condiciones de los ciclos
+@peephole(('CONSTI', 1), context=True)
+def while_condition(optimizer, const):
+	# while: CONSTI 1, <condición>, SUBI, CBREAK -> <condición>, CBREAK_IF_FALSE
+	found = optimizer.consumer(optimizer.index)
+	if found is None:
+		return None
+	pc, depth = found
+	code = optimizer.code
+	if depth != 1 or code[pc] != ('SUBI',) or pc + 1 >= len(code) or code[pc + 1] != ('CBREAK',):
+		return None
+	code[pc:pc + 2] = [('CBREAK_IF_FALSE',)]
+	return []
+
+@peephole('NOT', 'CBREAK_IF_FALSE')
+def break_if_not(not_, cbreak):
+	return [('CBREAK',)]
+
+@peephole('NOT', 'CBREAK')
+def break_unless_not(not_, cbreak):
+	return [('CBREAK_IF_FALSE',)]
+
+@peephole(('CONSTI', 0), 'CBREAK')
+def never_break(const, cbreak):
+	return []
+
+@peephole('CONSTI', 'CBREAK_IF_FALSE')
+def never_break_if_false(const, cbreak):
+	return [] if const[1] else None
+
+# IF con ramas vacías
+@peephole('ELSE', 'ENDIF')
+def empty_else(else_, endif):
+	return [('ENDIF',)]
+
+@peephole('IF', 'ENDIF')
+def empty_if(if_, endif):
+	return [('DROP',)]
+
+@peephole('IF', 'ELSE')
+def empty_then(if_, else_):
+	return [('NOT',), ('IF',)]
+
+# Conversiones de tipo. ITOF, FTOI no se elimina: los enteros de la
+# máquina no tienen límite y float() pierde los bits después del 53
+@peephole('CONSTI', 'ITOF')
+def int_constant_to_float(const, itof):
+	return [('CONSTF', float(const[1]))]
+
+@peephole('CONSTF', 'FTOI')
+def float_constant_to_int(const, ftoi):
+	# inf y nan fallan en ejecución, como en _fold
+	if not math.isfinite(const[1]) or not _int64(int(const[1])):
+		return None
+	return [('CONSTI', int(const[1]))]
+
+# Identidades aritméticas (solo enteros: x + 0.0 no es x si x es -0.0)
+@peephole(('CONSTI', 0), 'ADDI')
+def add_zero(const, add):
+	return []
+
+@peephole(('CONSTI', 0), 'SUBI')
+def sub_zero(const, sub):
+	return []
+
+@peephole(('CONSTI', 1), 'MULI')
+def mul_one(const, mul):
+	return []
+
+@peephole(('CONSTI', 1), 'DIVI')
+def div_one(const, div):
+	return []
+
+# Valores apilados y descartados
+@peephole('CONSTI', 'DROP')
+def drop_int_constant(const, drop):
+	return []
+
+@peephole('CONSTF', 'DROP')
+def drop_float_constant(const, drop):
+	return []
+
+@peephole('LOCAL_GET', 'DROP', context=True)
+def drop_local(optimizer, get, drop):
+	# Leer una local sin asignar falla en ejecución
+	if not Analysis.of(optimizer.func).assigned(optimizer.index, get[1]):
+		return None
+	return []
+
+# Operaciones entre constantes
+def _int64(value):
+	return -2**63 <= value < 2**63
+
+def _fold(opname, const_op, compute):
+	def fold(a, b, op):
+		if opname in ('DIVI', 'DIVF') and b[1] == 0:
+			return None         # La división por cero falla en ejecución
+		value = compute(a[1], b[1])
+		if isinstance(value, bool):
+			return [('CONSTI', int(value))]
+		if not (_int64(value) if const_op == 'CONSTI' else math.isfinite(value)):
+			return None
+		return [(const_op, value)]
+	fold.__name__ = f"fold_{opname.lower()}"
+	return fold
+
+_int_folds = {
+	'ADDI': operator.add, 'SUBI': operator.sub, 'MULI': operator.mul, 'DIVI': operator.floordiv,
+	'LTI': operator.lt, 'LEI': operator.le, 'GTI': operator.gt,
+	'GEI': operator.ge, 'EQI': operator.eq, 'NEI': operator.ne,
+}
+_float_folds = {
+	'ADDF': operator.add, 'SUBF': operator.sub, 'MULF': operator.mul, 'DIVF': operator.truediv,
+	'LTF': operator.lt, 'LEF': operator.le, 'GTF': operator.gt,
+	'GEF': operator.ge, 'EQF': operator.eq, 'NEF': operator.ne,
+}
+for _opname, _compute in _int_folds.items():
+	peephole('CONSTI', 'CONSTI', _opname)(_fold(_opname, 'CONSTI', _compute))
+for _opname, _compute in _float_folds.items():
+	peephole('CONSTF', 'CONSTF', _opname)(_fold(_opname, 'CONSTF', _compute))
@@ -0,0 +1,99 @@
+# output.py
+'''
+Salida de la máquina de pila
+============================
+
+Las instrucciones PRINTI, PRINTF y PRINTB no imprimen directamente: le
+entregan el valor a un "sink" de salida. Así un programa que imprime miles
+de valores no paga el costo de la consola en cada uno.
+
+    StreamSink   ; Texto plano a stdout (o a otro stream), en lotes
+    FileSink     ; Texto plano a un archivo, en lotes
+    CaptureSink  ; Guarda los valores en memoria (para pruebas)
+    RichSink     ; Formato con rich, un valor a la vez ([OUTPUT] valor)
+
+Los sinks con buffer escriben cuando se acumulan `batch` valores y al
+terminar la ejecución (flush). Cada valor se escribe en su propia línea.
+
+Se configura en settings/config.json:
+
+    "Output": "stdout"              ; "stdout", "rich" o "file"
+    "OutputFile": "output/program.out"
+'''
+import os
+import sys
+
+DEFAULT_BATCH = 512
+DEFAULT_OUTPUT_FILE = os.path.join('output', 'program.out')
+
+class OutputSink:
+	'''
+	Interfaz de los sinks de salida. write() recibe el valor tal como
+	está en la pila (int o float).
+	'''
+	def write(self, value):
+		raise NotImplementedError
+
+	def flush(self):
+		pass
+
+	def close(self):
+		self.flush()
+
+	@classmethod
+	def from_config(cls, config):
+		mode = config.get("Output", "stdout")
+		if mode == "stdout":
+			return StreamSink()
+		if mode == "rich":
+			return RichSink()
+		if mode == "file":
+			path = config.get("OutputFile") or DEFAULT_OUTPUT_FILE
+			if not os.path.isabs(path):
+				path = os.path.join(os.path.dirname(__file__), '..', path)
+			return FileSink(path)
+		raise ValueError(f"Modo de salida desconocido: {mode!r}")
+
+class StreamSink(OutputSink):
+	def __init__(self, stream=None, batch=DEFAULT_BATCH):
+		self.stream = stream      # None = el sys.stdout vigente al escribir
+		self.batch = batch
+		self.buffer = []
+
+	def write(self, value):
+		buffer = self.buffer
+		buffer.append(value)
+		if len(buffer) >= self.batch:
+			self.flush()
+
+	def flush(self):
+		if self.buffer:
+			stream = self.stream or sys.stdout
+			stream.write('\n'.join(map(str, self.buffer)) + '\n')
+			stream.flush()
+			self.buffer.clear()
+
+class FileSink(StreamSink):
+	def __init__(self, path, batch=DEFAULT_BATCH):
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		super().__init__(open(path, 'w', encoding='utf-8'), batch)
+		self.path = path
+
+	def close(self):
+		self.flush()
+		self.stream.close()
+
+class CaptureSink(OutputSink):
+	def __init__(self):
+		self.values = []
+
+	def write(self, value):
+		self.values.append(value)
+
+	def text(self):
+		return ''.join(f"{value}\n" for value in self.values)
+
+class RichSink(OutputSink):
+	def write(self, value):
+		from rich import print
+		print(f"[bold dark_green][OUTPUT][/bold dark_green] {value}")
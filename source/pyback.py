@@ -0,0 +1,283 @@
+# pyback.py
+'''
+Backend de código fuente Python
+===============================
+
+PythonMachine traduce el módulo IR a código fuente Python, lo compila con
+compile() y lo ejecuta con exec(), así que el programa GoxLang corre
+sobre el intérprete de bytecode de CPython. La traducción parte de los
+árboles de source/irtree.py:
+
+* Cada función IR es una función de Python (f_<nombre>); las variables
+  locales son variables locales de Python (v_<nombre>) y los temporales
+  del árbol se llaman t<slot>.
+* IF/ELSE es if/else; LOOP es `while True`, CBREAK es `if ...: break`.
+* Las globales son la lista G, la memoria es M (el bytearray o mmap de
+  la máquina) y PRINT escribe en la salida de la máquina.
+* Las funciones importadas llaman a las funciones del anfitrión.
+* Las divisiones y las lecturas de variables que se pueden leer sin
+  asignar (LinkedFunction.unassigned, LinkedModule.unassigned_globals)
+  llaman a funciones auxiliares que lanzan los errores del intérprete.
+
+Con "GenerateOutputFile" el código generado se guarda en
+output/<nombre>/<nombre>.py para inspeccionarlo.
+
+PythonMachine hereda de ClosureMachine: solo se traducen módulos
+verificados, no hay límite de instrucciones y si el módulo no se puede
+traducir se usa el intérprete.
+
+Se selecciona con "Backend": "python" en settings/config.json.
+'''
+import math
+import os
+
+from source.stack_machine import CONFIG
+from source.closure import ClosureMachine
+from source.irtree import build_tree, TreeError
+
+_binops = {
+	'ADDI': '+', 'SUBI': '-', 'MULI': '*',
+	'ADDF': '+', 'SUBF': '-', 'MULF': '*',
+	'ANDI': '&', 'ORI': '|',
+}
+_compare = {
+	'LTI': '<', 'LEI': '<=', 'GTI': '>', 'GEI': '>=', 'EQI': '==', 'NEI': '!=',
+	'LTF': '<', 'LEF': '<=', 'GTF': '>', 'GEF': '>=', 'EQF': '==', 'NEF': '!=',
+}
+
+# Funciones auxiliares del código generado: lectura de memoria con
+# verificación de límites, división y variables sin asignar (se usan
+# dentro de expresiones), con los mismos errores que el intérprete.
+# runtime() las define en el espacio de nombres del código generado.
+_prelude = """\
+def _divi(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Integer division by zero")
+    return a // b
+
+def _divf(a, b):
+    if b == 0.0:
+        raise ZeroDivisionError("Floating point division by zero")
+    return a / b
+
+def _unset(kind, name):
+    raise ValueError(f"{kind} variable '{name}' accessed before assignment.")
+
+def _oob(op, a):
+    raise IndexError(f"{op}: Memory access out of bounds. Address: {a}, Memory size: {_heap.top}")
+
+def _peeki(a):
+    if a < 0 or a + INT_SIZE > _heap.top:
+        _oob('PEEKI', a)
+    return _unpack_int(M, a)[0]
+
+def _peekf(a):
+    if a < 0 or a + FLOAT_SIZE > _heap.top:
+        _oob('PEEKF', a)
+    return _unpack_float(M, a)[0]
+
+def _peekb(a):
+    if a < 0 or a >= _heap.top:
+        _oob('PEEKB', a)
+    return M[a]
+"""
+
+def function_name(func):
+	return f"f_{func.name}"
+
+class PythonGenerator:
+	'''
+	Genera el código fuente Python de las funciones de un módulo enlazado.
+	'''
+	def __init__(self, linked):
+		self.linked = linked
+
+	def module_source(self):
+		lines = [f"# Generado a partir del IR de '{self.linked.name}'", ""]
+		for func in self.linked.functions:
+			if not func.imported:
+				lines.extend(self.function_source(build_tree(func, self.linked)))
+				lines.append("")
+		return "\n".join(lines)
+
+	def function_source(self, tree):
+		self.tree = tree
+		func = tree.func
+		params = ", ".join(self.local(slot) for slot in range(func.nparams))
+		self.lines = [f"def {function_name(func)}({params}):"]
+		self.wrap_return = False
+		for slot in sorted(func.unassigned):
+			self.emit(1, f"{self.local(slot)} = None")
+		self.block(tree.body, 1)
+		return self.lines
+
+	def loop_source(self, tree, name):
+		'''
+		Genera una función name(L) que ejecuta el ciclo del árbol sobre la
+		lista L de variables locales de un frame del intérprete y la
+		actualiza al salir. Retorna None si el ciclo termina o (valor,) si
+		ejecuta un RET.
+		'''
+		self.tree = tree
+		variables = "".join(f"{self.local(slot)}, " for slot in range(len(tree.func.slots)))
+		self.lines = [f"def {name}(L):"]
+		self.wrap_return = True
+		if variables:
+			self.emit(1, f"{variables}= L")
+		self.block(tree.body, 1)
+		if variables:
+			self.emit(1, f"L[:] = ({variables})")
+		self.emit(1, "return None")
+		return self.lines
+
+	def local(self, slot):
+		if slot in self.tree.temps:
+			return f"t{slot}"
+		name = self.tree.names[slot]
+		# Los temporales del generador de IR ($temp1) no son identificadores
+		return f"v_{name}" if name.isidentifier() else f"v{slot}"
+
+	def emit(self, depth, line):
+		self.lines.append("    " * depth + line)
+
+	# --- Instrucciones ---
+	def block(self, stmts, depth):
+		if not stmts:
+			self.emit(depth, "pass")
+		for stmt in stmts:
+			self.stmt(stmt, depth)
+
+	def stmt(self, stmt, depth):
+		kind = stmt[0]
+		if kind == 'assign':
+			self.emit(depth, f"{self.local(stmt[1])} = {self.expr(stmt[2])}")
+		elif kind == 'gassign':
+			self.emit(depth, f"G[{stmt[1]}] = {self.expr(stmt[2])}")
+		elif kind == 'store':
+			op, size = stmt[1], { 'POKEI': 'INT_SIZE', 'POKEF': 'FLOAT_SIZE', 'POKEB': '1' }[stmt[1]]
+			self.emit(depth, f"_a = {self.expr(stmt[2])}")
+			self.emit(depth, f"if _a < 0 or _a + {size} > _heap.top:")
+			self.emit(depth + 1, f"_oob('{op}', _a)")
+			value = self.expr(stmt[3])
+			if op == 'POKEB':
+				self.emit(depth, f"M[_a] = {value}")
+			else:
+				self.emit(depth, f"{'_pack_int' if op == 'POKEI' else '_pack_float'}(M, _a, {value})")
+		elif kind == 'print':
+			self.emit(depth, f"_write({self.expr(stmt[2])})")
+		elif kind == 'mem':
+			args = ", ".join(self.expr(arg) for arg in stmt[2:])
+			self.emit(depth, f"_{stmt[1].lower()}({args})")
+		elif kind == 'expr':
+			self.emit(depth, self.expr(stmt[1]))
+		elif kind == 'if':
+			self.emit(depth, f"if {self.cond(stmt[1])}:")
+			self.block(stmt[2], depth + 1)
+			if stmt[3]:
+				self.emit(depth, "else:")
+				self.block(stmt[3], depth + 1)
+		elif kind == 'loop':
+			self.emit(depth, "while True:")
+			self.block(stmt[1], depth + 1)
+		elif kind == 'break_if':
+			self.emit(depth, f"if {self.cond(stmt[1])}:")
+			self.emit(depth + 1, "break")
+		elif kind == 'continue':
+			self.emit(depth, "continue")
+		elif kind == 'return':
+			value = self.expr(stmt[1])
+			self.emit(depth, f"return ({value},)" if self.wrap_return else f"return {value}")
+		else:
+			raise TreeError(f"Unknown statement {kind}")
+
+	# --- Expresiones ---
+	def cond(self, expr):
+		# En una condición basta la comparación, sin convertirla a 1/0
+		if expr[0] == 'binop' and expr[1] in _compare:
+			return f"{self.expr(expr[2])} {_compare[expr[1]]} {self.expr(expr[3])}"
+		# La negación de una comparación (1 - cmp) que genera el IR de los ciclos
+		if expr[0] == 'binop' and expr[1] == 'SUBI' and expr[2] == ('const', 1) and expr[3][0] == 'binop' and expr[3][1] in _compare:
+			return f"not ({self.cond(expr[3])})"
+		if expr[0] == 'unop' and expr[1] == 'NOT':
+			return f"not ({self.cond(expr[2])})"
+		return self.expr(expr)
+
+	def expr(self, expr):
+		kind = expr[0]
+		if kind == 'const':
+			value = expr[1]
+			if isinstance(value, float) and not math.isfinite(value):
+				return f"float('{value}')"
+			return repr(value) if value >= 0 else f"({value!r})"
+		if kind == 'local':
+			slot = expr[1]
+			if slot in self.tree.func.unassigned:
+				name = self.local(slot)
+				return f"({name} if {name} is not None else _unset('Local', {self.tree.names[slot]!r}))"
+			return self.local(slot)
+		if kind == 'global':
+			slot = expr[1]
+			if slot in self.linked.unassigned_globals:
+				return f"(G[{slot}] if G[{slot}] is not None else _unset('Global', {self.linked.globals[slot]!r}))"
+			return f"G[{slot}]"
+		if kind == 'binop':
+			op, left, right = expr[1], self.expr(expr[2]), self.expr(expr[3])
+			if op in _compare:
+				return f"(1 if {left} {_compare[op]} {right} else 0)"
+			if op in ('DIVI', 'DIVF'):
+				return f"_{op.lower()}({left}, {right})"
+			return f"({left} {_binops[op]} {right})"
+		if kind == 'unop':
+			op, value = expr[1], self.expr(expr[2])
+			if op == 'ITOF':
+				return f"float({value})"
+			if op == 'FTOI':
+				return f"int({value})"
+			if op in ('NEGI', 'NEGF'):
+				return f"(-{value})"
+			if op == 'NOT':
+				return f"(0 if {value} else 1)"
+			return f"_{op.lower()}({value})"
+		if kind == 'call':
+			args = ", ".join(self.expr(arg) for arg in expr[2])
+			return f"{function_name(self.linked.functions[expr[1]])}({args})"
+		if kind == 'builtin':
+			args = ", ".join(self.expr(arg) for arg in expr[2])
+			return f"_{expr[1].lower()}({args})"
+		raise TreeError(f"Unknown expression {kind}")
+
+class PythonMachine(ClosureMachine):
+	def __init__(self, output=None):
+		super().__init__(output)
+		self.source = None            # Código fuente generado
+
+	def compile_module(self):
+		self.source = PythonGenerator(self.linked).module_source()
+		if CONFIG.get("GenerateOutputFile", False) and self.linked.name:
+			path = os.path.join(os.path.dirname(__file__), '..', 'output', self.linked.name, f"{self.linked.name}.py")
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with open(path, 'w', encoding='utf-8') as f:
+				f.write(self.source)
+		namespace = runtime(self)
+		exec(compile(self.source, f"<{self.linked.name or 'goxlang'}>", 'exec'), namespace)
+		return [namespace[function_name(func)] for func in self.functions]
+
+def runtime(vm):
+	'''
+	Nombres que usa el código generado para una máquina: memoria,
+	globales, salida y funciones importadas.
+	'''
+	namespace = {
+		'G': vm.globals, 'M': vm.memory, '_heap': vm.heap,
+		'INT_SIZE': vm.INT_SIZE, 'FLOAT_SIZE': vm.FLOAT_SIZE,
+		'_unpack_int': vm.unpack_int, '_pack_int': vm.pack_int,
+		'_unpack_float': vm.unpack_float, '_pack_float': vm.pack_float,
+		'_write': vm.output.write,
+		'_memset': vm._memset, '_memcpy': vm._memcpy, '_filli': vm._filli, '_fillf': vm._fillf,
+		'_grow': vm.heap.alloc, '_free': vm.heap.free, '_memcmp': vm._memcmp,
+	}
+	for func in vm.functions:
+		if func.imported:
+			namespace[function_name(func)] = (lambda func: lambda *args: vm._call_imported(func, args))(func)
+	exec(_prelude, namespace)
+	return namespace
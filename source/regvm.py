@@ -0,0 +1,552 @@
+# regvm.py
+'''
+IR de registros y máquina de registros
+======================================
+
+En el IR de pila cada operación pasa por la pila: `x*x - y*y + x0` son
+10 instrucciones (4 LOCAL_GET, 2 MULF, SUBF, LOCAL_GET, ADDF, LOCAL_SET).
+Este módulo baja el código de cada función a un IR de tres direcciones
+donde los operandos son registros virtuales, y lo ejecuta con
+RegisterMachine. La misma expresión son 4 instrucciones:
+
+    MULF  t1, x, x
+    MULF  t2, y, y
+    SUBF  t1, t1, t2
+    ADDF  x, t1, x0
+
+Los registros son los slots del frame: primero las variables locales de
+la función (los mismos slots que en source/linker.py), luego los
+temporales y al final las constantes, que ya vienen cargadas en la
+plantilla del frame. Así todos los operandos son índices de registro.
+Antes de leer una local que puede no estar asignada (ver
+LinkedFunction.unassigned) se emite LCHK, que lanza el mismo error que
+el intérprete.
+
+Instrucciones (d = registro destino, a/b/c = registros, t = pc destino):
+
+    MOV d, a                       GGET d, global     GSET global, a
+    LCHK a, nombre                 ; Error si la local a no está asignada
+    ADDI d, a, b  (y las demás operaciones binarias y comparaciones)
+    ITOF d, a   FTOI d, a   NEGI d, a    NEGF d, a    NOT d, a
+    PEEKI d, a  PEEKF d, a  PEEKB d, a
+    POKEI a, b  POKEF a, b  POKEB a, b   ; dirección, valor
+    PRINTI a    PRINTF a    PRINTB a
+    MEMSET a, b, c   MEMCPY a, b, c   FILLI a, b, c   FILLF a, b, c
+    GROW d, a   FREE d, a   MEMCMP d, a, b, c
+    CALL d, función, (registros de los argumentos)
+    RET a
+    JUMP t
+    JT a, t     JF a, t                ; Saltar si a es verdadero/falso
+    JLTI a, b, t   JNLTI a, b, t  ...  ; Comparar y saltar (o saltar si no)
+
+El código se baja a partir de los árboles de source/irtree.py. IF y LOOP
+se convierten en saltos, y una condición que es una comparación se
+convierte en una sola instrucción de comparar y saltar.
+
+RegisterMachine solo ejecuta módulos verificados (valores sin etiqueta).
+Si el módulo no se puede bajar, lo ejecuta el intérprete de pila. Se
+selecciona con "Backend": "register" en settings/config.json.
+'''
+from source.stack_machine import StackMachine, CONFIG
+from source.irtree import build_tree, TreeError
+
+_compare = ('LT', 'LE', 'GT', 'GE', 'EQ', 'NE')
+
+class RegisterFunction:
+	def __init__(self, func, code, template):
+		self.func = func              # LinkedFunction
+		self.code = code              # Instrucciones [(op, operandos...)]
+		self.template = template      # Registros iniciales (constantes cargadas)
+		self.decoded = None           # [(handler, operandos)], lo llena RegisterMachine
+
+def lower(func, module):
+	'''
+	Baja una LinkedFunction al IR de registros. Lanza TreeError si el
+	código no se puede representar como árbol.
+	'''
+	return _Lowering(build_tree(func, module)).run()
+
+class _Lowering:
+	def __init__(self, tree):
+		self.tree = tree
+		self.code = []
+		self.nregs = tree.nslots      # Las variables y temporales del árbol
+		self.free_temps = []          # Temporales libres para reutilizar
+		self.used_temps = []          # Temporales de la instrucción actual
+		self.constants = {}           # {(tipo, repr): (registro, valor)}; repr separa 0.0 de -0.0
+		self.loops = []               # [(pc de inicio, saltos a la salida)]
+
+	def run(self):
+		self.block(self.tree.body)
+		template = [None] * self.nregs
+		for reg, value in self.constants.values():
+			template[reg] = value
+		return RegisterFunction(self.tree.func, self.code, template)
+
+	def emit(self, *instr):
+		self.code.append(instr)
+		return len(self.code) - 1
+
+	def patch(self, pc, target):
+		instr = self.code[pc]
+		self.code[pc] = instr[:-1] + (target,)
+
+	def temp(self):
+		reg = self.free_temps.pop() if self.free_temps else self.new_reg()
+		self.used_temps.append(reg)
+		return reg
+
+	def new_reg(self):
+		self.nregs += 1
+		return self.nregs - 1
+
+	def constant(self, value):
+		key = (type(value), repr(value))
+		if key not in self.constants:
+			self.constants[key] = (self.new_reg(), value)
+		return self.constants[key][0]
+
+	# --- Instrucciones ---
+	def block(self, stmts):
+		for stmt in stmts:
+			self.stmt(stmt)
+			# Los temporales solo viven dentro de una instrucción
+			self.free_temps.extend(self.used_temps)
+			self.used_temps.clear()
+
+	def stmt(self, stmt):
+		kind = stmt[0]
+		if kind == 'assign':
+			self.value(stmt[2], stmt[1])
+		elif kind == 'gassign':
+			self.emit('GSET', stmt[1], self.value(stmt[2]))
+		elif kind == 'store':
+			self.emit(stmt[1], self.value(stmt[2]), self.value(stmt[3]))
+		elif kind == 'print':
+			self.emit(stmt[1], self.value(stmt[2]))
+		elif kind == 'mem':
+			self.emit(stmt[1], *(self.value(arg) for arg in stmt[2:]))
+		elif kind == 'expr':
+			self.value(stmt[1])
+		elif kind == 'if':
+			jump = self.branch(stmt[1], False)
+			self.block(stmt[2])
+			if stmt[3]:
+				skip = self.emit('JUMP', None)
+				self.patch(jump, len(self.code))
+				self.block(stmt[3])
+				jump = skip
+			self.patch(jump, len(self.code))
+		elif kind == 'loop':
+			self.loops.append((len(self.code), []))
+			self.block(stmt[1])
+			start, exits = self.loops.pop()
+			self.emit('JUMP', start)
+			for pc in exits:
+				self.patch(pc, len(self.code))
+		elif kind == 'break_if':
+			self.loops[-1][1].append(self.branch(stmt[1], True))
+		elif kind == 'continue':
+			self.emit('JUMP', self.loops[-1][0])
+		elif kind == 'return':
+			self.emit('RET', self.value(stmt[1]))
+		else:
+			raise TreeError(f"Unknown statement {kind}")
+
+	def branch(self, cond, when):
+		'''
+		Emite un salto (sin destino) que se toma si cond es `when`.
+		Retorna su pc para fijar el destino después.
+		'''
+		# 1 - comparación (el IR de los ciclos) y NOT niegan la condición
+		while True:
+			if cond[0] == 'binop' and cond[1] == 'SUBI' and cond[2] == ('const', 1) and cond[3][0] == 'binop' and cond[3][1][:2] in _compare:
+				cond, when = cond[3], not when
+			elif cond[0] == 'unop' and cond[1] == 'NOT':
+				cond, when = cond[2], not when
+			else:
+				break
+		if cond[0] == 'binop' and cond[1][:2] in _compare:
+			op = ('J' if when else 'JN') + cond[1]
+			return self.emit(op, self.value(cond[2]), self.value(cond[3]), None)
+		return self.emit('JT' if when else 'JF', self.value(cond), None)
+
+	# --- Expresiones ---
+	def value(self, expr, dst=None):
+		'''
+		Retorna el registro con el valor de expr. Con dst el valor se
+		calcula en ese registro.
+		'''
+		kind = expr[0]
+		if kind in ('const', 'local'):
+			reg = self.constant(expr[1]) if kind == 'const' else expr[1]
+			if kind == 'local' and reg in self.tree.func.unassigned:
+				self.emit('LCHK', reg, self.tree.names[reg])
+			if dst is not None and dst != reg:
+				self.emit('MOV', dst, reg)
+				return dst
+			return reg
+		if kind == 'global':
+			args = (expr[1],)
+			op = 'GGET'
+		elif kind == 'binop':
+			op, args = expr[1], (self.value(expr[2]), self.value(expr[3]))
+		elif kind == 'unop':
+			op, args = expr[1], (self.value(expr[2]),)
+		elif kind == 'call':
+			op, args = 'CALL', (expr[1], tuple(self.value(arg) for arg in expr[2]))
+		elif kind == 'builtin':
+			op, args = expr[1], tuple(self.value(arg) for arg in expr[2])
+		else:
+			raise TreeError(f"Unknown expression {kind}")
+		if dst is None:
+			dst = self.temp()
+		self.emit(op, dst, *args)
+		return dst
+
+class RegisterFrame:
+	__slots__ = ('function', 'program', 'regs', 'dst', 'return_pc')
+
+class RegisterMachine(StackMachine):
+	def __init__(self, output=None):
+		super().__init__(output)
+		self.register_functions = None  # RegisterFunction por slot, None = intérprete de pila
+		self.regs = None                 # Registros del frame actual
+
+	def load_module(self, ir_module):
+		super().load_module(ir_module)
+		self.register_functions = None
+		if not self.fast:
+			self._log_debug("Module not verified, running in the stack interpreter.")
+			return
+		try:
+			functions = [None if func.imported else lower(func, self.linked) for func in self.functions]
+		except TreeError as e:
+			self._log_debug(f"Cannot lower module to registers, running in the stack interpreter: {e}")
+			return
+		for function in functions:
+			if function is not None:
+				function.decoded = self._decode_registers(function)
+		self.register_functions = functions
+
+	def _decode_registers(self, function):
+		decoded = []
+		for pc, instr in enumerate(function.code):
+			handler = getattr(self, f"reg_{instr[0]}", None)
+			if handler is None:
+				raise RuntimeError(f"Unknown register instruction: {instr[0]} at PC {pc} in {function.func.name}")
+			decoded.append((handler, instr[1:]))
+		decoded.append((self._reg_falloff, ()))
+		return decoded
+
+	def run(self):
+		if self.register_functions is None:
+			return super().run()
+		self.running = True
+		self.stack = []
+		instruction_count = 0
+		max_instructions = CONFIG.get("MaxInstructions", 10 * 10000*100)
+		self._log_debug("--- Starting register execution from 'main' ---")
+		self.reg_CALL(None, self.linked.main, ())
+		try:
+			while self.running:
+				pc = self.pc
+				handler, args = self.program[pc]
+				self.pc = pc + 1
+				handler(*args)
+				instruction_count += 1
+				if instruction_count >= max_instructions:
+					self.running = False
+					raise RuntimeError(f"Instruction limit ({max_instructions}) reached, possible infinite loop or very long program. Last instruction: {self.current_function.name}:{pc}")
+		finally:
+			self.instruction_count = instruction_count
+			self.output.close()
+			self.heap.flush()
+		self._log_debug("--- Execution halted ---")
+
+	def _reg_falloff(self):
+		raise RuntimeError(f"PC ({self.pc - 1}) out of bounds in register code of '{self.current_function.name}'")
+
+	# --- Movimientos y variables globales ---
+	def reg_MOV(self, d, a):
+		r = self.regs
+		r[d] = r[a]
+
+	def reg_LCHK(self, a, name):
+		if self.regs[a] is None:
+			raise ValueError(f"Local variable '{name}' accessed before assignment.")
+
+	def reg_GGET(self, d, slot):
+		value = self.globals[slot]
+		if value is None:
+			raise ValueError(f"Global variable '{self.linked.globals[slot]}' accessed before assignment.")
+		self.regs[d] = value
+
+	def reg_GSET(self, slot, a):
+		self.globals[slot] = self.regs[a]
+
+	# --- Aritmética ---
+	def reg_ADDI(self, d, a, b):
+		r = self.regs
+		r[d] = r[a] + r[b]
+
+	def reg_SUBI(self, d, a, b):
+		r = self.regs
+		r[d] = r[a] - r[b]
+
+	def reg_MULI(self, d, a, b):
+		r = self.regs
+		r[d] = r[a] * r[b]
+
+	def reg_DIVI(self, d, a, b):
+		r = self.regs
+		if r[b] == 0:
+			raise ZeroDivisionError("Integer division by zero")
+		r[d] = r[a] // r[b]
+
+	def reg_DIVF(self, d, a, b):
+		r = self.regs
+		if r[b] == 0.0:
+			raise ZeroDivisionError("Floating point division by zero")
+		r[d] = r[a] / r[b]
+
+	def reg_ANDI(self, d, a, b):
+		r = self.regs
+		r[d] = r[a] & r[b]
+
+	def reg_ORI(self, d, a, b):
+		r = self.regs
+		r[d] = r[a] | r[b]
+
+	def reg_LTI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] < r[b] else 0
+
+	def reg_LEI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] <= r[b] else 0
+
+	def reg_GTI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] > r[b] else 0
+
+	def reg_GEI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] >= r[b] else 0
+
+	def reg_EQI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] == r[b] else 0
+
+	def reg_NEI(self, d, a, b):
+		r = self.regs
+		r[d] = 1 if r[a] != r[b] else 0
+
+	# Floats are plain Python floats: the integer handlers work unchanged
+	reg_ADDF, reg_SUBF, reg_MULF = reg_ADDI, reg_SUBI, reg_MULI
+	reg_LTF, reg_LEF, reg_GTF, reg_GEF, reg_EQF, reg_NEF = reg_LTI, reg_LEI, reg_GTI, reg_GEI, reg_EQI, reg_NEI
+
+	def reg_ITOF(self, d, a):
+		r = self.regs
+		r[d] = float(r[a])
+
+	def reg_FTOI(self, d, a):
+		r = self.regs
+		r[d] = int(r[a])
+
+	def reg_NEGI(self, d, a):
+		r = self.regs
+		r[d] = -r[a]
+
+	reg_NEGF = reg_NEGI
+
+	def reg_NOT(self, d, a):
+		r = self.regs
+		r[d] = 0 if r[a] else 1
+
+	# --- Saltos ---
+	def reg_JUMP(self, target):
+		self.pc = target
+
+	def reg_JT(self, a, target):
+		if self.regs[a]:
+			self.pc = target
+
+	def reg_JF(self, a, target):
+		if not self.regs[a]:
+			self.pc = target
+
+	def reg_JLTI(self, a, b, target):
+		r = self.regs
+		if r[a] < r[b]:
+			self.pc = target
+
+	def reg_JLEI(self, a, b, target):
+		r = self.regs
+		if r[a] <= r[b]:
+			self.pc = target
+
+	def reg_JGTI(self, a, b, target):
+		r = self.regs
+		if r[a] > r[b]:
+			self.pc = target
+
+	def reg_JGEI(self, a, b, target):
+		r = self.regs
+		if r[a] >= r[b]:
+			self.pc = target
+
+	def reg_JEQI(self, a, b, target):
+		r = self.regs
+		if r[a] == r[b]:
+			self.pc = target
+
+	def reg_JNEI(self, a, b, target):
+		r = self.regs
+		if r[a] != r[b]:
+			self.pc = target
+
+	# "Jump if not": not (a < b) differs from a >= b for NaN
+	def reg_JNLTI(self, a, b, target):
+		r = self.regs
+		if not r[a] < r[b]:
+			self.pc = target
+
+	def reg_JNLEI(self, a, b, target):
+		r = self.regs
+		if not r[a] <= r[b]:
+			self.pc = target
+
+	def reg_JNGTI(self, a, b, target):
+		r = self.regs
+		if not r[a] > r[b]:
+			self.pc = target
+
+	def reg_JNGEI(self, a, b, target):
+		r = self.regs
+		if not r[a] >= r[b]:
+			self.pc = target
+
+	def reg_JNEQI(self, a, b, target):
+		r = self.regs
+		if not r[a] == r[b]:
+			self.pc = target
+
+	def reg_JNNEI(self, a, b, target):
+		r = self.regs
+		if not r[a] != r[b]:
+			self.pc = target
+
+	reg_JLTF, reg_JLEF, reg_JGTF, reg_JGEF, reg_JEQF, reg_JNEF = reg_JLTI, reg_JLEI, reg_JGTI, reg_JGEI, reg_JEQI, reg_JNEI
+	reg_JNLTF, reg_JNLEF, reg_JNGTF, reg_JNGEF, reg_JNEQF, reg_JNNEF = reg_JNLTI, reg_JNLEI, reg_JNGTI, reg_JNGEI, reg_JNEQI, reg_JNNEI
+
+	# --- Funciones ---
+	def reg_CALL(self, d, index, args):
+		func = self.functions[index]
+		r = self.regs
+		values = [r[a] for a in args]
+		if func.imported:
+			r[d] = self._call_imported(func, values)
+			return
+		function = self.register_functions[index]
+		regs = function.template[:]
+		regs[:len(values)] = values
+		frame = RegisterFrame()
+		frame.function = func
+		frame.program = function.decoded
+		frame.regs = regs
+		frame.dst = d
+		frame.return_pc = self.pc
+		self.call_stack.append(frame)
+		self.current_function = func
+		self.program = function.decoded
+		self.regs = regs
+		self.pc = 0
+
+	def reg_RET(self, a):
+		value = self.regs[a]
+		call_stack = self.call_stack
+		frame = call_stack.pop()
+		if not call_stack: # Returning from 'main'
+			self.running = False
+			self.regs = None
+			self.stack = [value]
+			return
+		caller = call_stack[-1]
+		self.current_function = caller.function
+		self.program = caller.program
+		self.regs = caller.regs
+		self.pc = frame.return_pc
+		self.regs[frame.dst] = value
+
+	# --- Memoria ---
+	def reg_PEEKI(self, d, a):
+		addr = self.regs[a]
+		if addr < 0 or addr + self.INT_SIZE > self.heap.top:
+			raise IndexError(f"PEEKI: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.regs[d] = self.unpack_int(self.memory, addr)[0]
+
+	def reg_PEEKF(self, d, a):
+		addr = self.regs[a]
+		if addr < 0 or addr + self.FLOAT_SIZE > self.heap.top:
+			raise IndexError(f"PEEKF: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.regs[d] = self.unpack_float(self.memory, addr)[0]
+
+	def reg_PEEKB(self, d, a):
+		addr = self.regs[a]
+		if addr < 0 or addr >= self.heap.top:
+			raise IndexError(f"PEEKB: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.regs[d] = self.memory[addr]
+
+	def reg_POKEI(self, a, b):
+		r = self.regs
+		addr = r[a]
+		if addr < 0 or addr + self.INT_SIZE > self.heap.top:
+			raise IndexError(f"POKEI: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.pack_int(self.memory, addr, r[b])
+
+	def reg_POKEF(self, a, b):
+		r = self.regs
+		addr = r[a]
+		if addr < 0 or addr + self.FLOAT_SIZE > self.heap.top:
+			raise IndexError(f"POKEF: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.pack_float(self.memory, addr, r[b])
+
+	def reg_POKEB(self, a, b):
+		r = self.regs
+		addr = r[a]
+		if addr < 0 or addr >= self.heap.top:
+			raise IndexError(f"POKEB: Memory access out of bounds. Address: {addr}, Memory size: {self.heap.top}")
+		self.memory[addr] = r[b]
+
+	def reg_GROW(self, d, a):
+		self.regs[d] = self.heap.alloc(self.regs[a])
+
+	def reg_FREE(self, d, a):
+		self.regs[d] = self.heap.free(self.regs[a])
+
+	def reg_MEMSET(self, a, b, c):
+		r = self.regs
+		self._memset(r[a], r[b], r[c])
+
+	def reg_MEMCPY(self, a, b, c):
+		r = self.regs
+		self._memcpy(r[a], r[b], r[c])
+
+	def reg_MEMCMP(self, d, a, b, c):
+		r = self.regs
+		r[d] = self._memcmp(r[a], r[b], r[c])
+
+	def reg_FILLI(self, a, b, c):
+		r = self.regs
+		self._filli(r[a], r[b], r[c])
+
+	def reg_FILLF(self, a, b, c):
+		r = self.regs
+		self._fillf(r[a], r[b], r[c])
+
+	# --- Salida ---
+	def reg_PRINTI(self, a):
+		self.output.write(self.regs[a])
+
+	reg_PRINTF = reg_PRINTB = reg_PRINTI
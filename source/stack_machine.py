@@ -49,7 +49,13 @@ La máquina debe ser capaz de interpretar y ejecutar instrucciones del lenguaje
 '''
 
 from rich import print
-import json,os
+from source.trace import Tracer
+from source.verifier import IRVerifier, VerifyError
+from source.linker import link
+from source.output import OutputSink
+from source.memory import Heap, int_codec, float_codec
+from source.host import host_functions
+import json,os,sys
 
 def load_config():
     try:
@@ -70,63 +76,201 @@ def load_config():
         return {"Debug": True, "GenerateOutputFile": False}
 
 CONFIG = load_config()
+# Python frames allowed while compiled code runs (JIT and compiled
+# backends), which recurses on the Python stack
+RECURSION_LIMIT = 1000000
 #------------------------------------------
+def resolve_jumps(code):
+    '''
+    Resolve the structured control flow of a function once, at load time.
+    Returns a list parallel to `code` where every IF/ELSE/LOOP/CBREAK/
+    CONTINUE/ENDLOOP holds the PC of the next instruction to execute when
+    the jump is taken:
+      IF       -> instruction after the matching ELSE, or after ENDIF
+      ELSE     -> instruction after the matching ENDIF
+      LOOP     -> instruction after the matching ENDLOOP
+      CBREAK   -> instruction after the matching ENDLOOP (also CBREAK_IF_FALSE)
+      CONTINUE -> first instruction of the loop body
+      ENDLOOP  -> first instruction of the loop body
+    '''
+    jumps = [None] * len(code)
+    blocks = []   # Open IF/LOOP blocks: [opname, pc, else_pc or pending breaks]
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        if opname == 'IF':
+            blocks.append(['IF', pc, None])
+        elif opname == 'ELSE':
+            if not blocks or blocks[-1][0] != 'IF' or blocks[-1][2] is not None:
+                raise RuntimeError(f"ELSE at PC {pc} without matching IF.")
+            blocks[-1][2] = pc
+            jumps[blocks[-1][1]] = pc + 1
+        elif opname == 'ENDIF':
+            if not blocks or blocks[-1][0] != 'IF':
+                raise RuntimeError(f"ENDIF at PC {pc} without matching IF.")
+            _, if_pc, else_pc = blocks.pop()
+            if else_pc is None:
+                jumps[if_pc] = pc + 1
+            else:
+                jumps[else_pc] = pc + 1
+        elif opname == 'LOOP':
+            blocks.append(['LOOP', pc, []])
+        elif opname in ('CBREAK', 'CBREAK_IF_FALSE', 'CONTINUE'):
+            loop = next((b for b in reversed(blocks) if b[0] == 'LOOP'), None)
+            if loop is None:
+                raise RuntimeError(f"{opname} at PC {pc} outside of a LOOP.")
+            if opname != 'CONTINUE':
+                loop[2].append(pc)
+            else:
+                jumps[pc] = loop[1] + 1
+        elif opname == 'ENDLOOP':
+            if not blocks or blocks[-1][0] != 'LOOP':
+                raise RuntimeError(f"ENDLOOP at PC {pc} without matching LOOP.")
+            _, loop_pc, breaks = blocks.pop()
+            jumps[pc] = loop_pc + 1
+            jumps[loop_pc] = pc + 1
+            for break_pc in breaks:
+                jumps[break_pc] = pc + 1
+    if blocks:
+        raise RuntimeError(f"Unterminated {blocks[-1][0]} at PC {blocks[-1][1]}.")
+    return jumps
+
+class Frame:
+    '''
+    Activation record of a function call. Frames are recycled through the
+    machine's free-list, so CALL usually just refills an existing object.
+    '''
+    __slots__ = ('function', 'program', 'locals', 'base', 'return_pc')
+
 class StackMachine:
-    def __init__(self):
-        self.stack = []                       # Pila principal (stores tuples: (type, value))
-        self.memory = bytearray([0] * 1024)   # Memoria lineal (bytearray for byte-addressable)
-        self.globals = {}                     # Variables globales {name: (value, type_str)}
-        self.locals_stack = []                # Stack de frames de variables locales [{name: (value, type_str)}]
-        self.call_stack = []                  # Stack de frames de llamada (pc_return, locals_frame_index)
-        self.functions = {}                   # Diccionario de funciones {name: func_data}
+    def __init__(self, output=None):
+        self.stack = []                       # Pila principal (tuples (type, value), or raw values in fast mode)
+        self.heap = Heap.from_config(CONFIG)  # Memoria lineal y su asignador (ver source/memory.py)
+        self.memory = self.heap.memory        # bytearray or mmap (byte-addressable), always the same object
+        self.globals = []                     # Variables globales [stack item], indexadas por slot
+        self.call_stack = []                  # Frames activos (Frame), el último es el de la función actual
+        self.free_frames = []                 # Frames libres para reutilizar en CALL
+        self.locals = None                    # Variables locales del frame actual [stack item]
+        self.functions = []                   # Funciones enlazadas (LinkedFunction), indexadas por slot
+        self.linked = None                    # Módulo enlazado (ver source/linker.py)
         self.pc = 0                           # Contador de programa
-        self.programInst = []                 # Programa IR cargado para la función actual
+        self.program = []                     # Programa decodificado de la función actual (ver _decode)
         self.running = False
-        self.current_function_name = None
+        self.current_function = None          # LinkedFunction en ejecución
 
         self.debug = CONFIG.get("Debug", True)
         self.INT_SIZE = CONFIG.get("IntSize", 4)
         self.FLOAT_SIZE = CONFIG.get("FloatSize", 4)
-
-        # For IF/LOOP control flow, to store previous PC values
-        self.control_flow_stack = []
-        self.pc_modified_by_operation = False 
-
+        # Precompiled codecs for PEEK/POKE (see source/memory.py)
+        int_struct = int_codec(self.INT_SIZE)
+        float_struct = float_codec(self.FLOAT_SIZE)
+        self.unpack_int, self.pack_int = int_struct.unpack_from, int_struct.pack_into
+        self.unpack_float, self.pack_float = float_struct.unpack_from, float_struct.pack_into
+        self.int_bytes, self.float_bytes = int_struct.pack, float_struct.pack
+        self.tracer = Tracer.from_config(CONFIG)  # None si el trazado está apagado
+        self.fast_mode = CONFIG.get("FastMode", True) # Pila sin etiquetas si el módulo se verifica
+        self.fast = False                     # Modo en el que se decodificó el módulo cargado
+        self.output = output or OutputSink.from_config(CONFIG) # Destino de PRINTI/PRINTF/PRINTB (ver source/output.py)
+        self.jit_threshold = CONFIG.get("JitThreshold", 0) # Llamadas/vueltas antes de compilar, 0 = sin JIT
+        self.jit = None                       # Jit del módulo cargado (ver source/jit.py)
 
     def _log_debug(self, message, flush=False):
         if self.debug:
+            self.output.flush() # Keep program output and debug messages in order
             print(f"[DEBUG SM]: {message}", flush=flush)
 
-    def load_program(self, program): # Kept for potential direct instruction list loading
-        self.programInst = program
-        self.pc = 0
-        self.running = False # Should not start running just by loading
-
     def load_module(self, ir_module):
-        self.functions = {}
-        for name, func_def in ir_module.functions.items():
-            self.functions[name] = {
-                'name': func_def.name,
-                'params': func_def.parmnames,
-                'param_types': func_def.parmtypes, # IR types ('I', 'F')
-                'code': func_def.code,
-                'locals_spec': func_def.locals, # {name: ir_type}
-                'locals_gox': func_def.locals_gox, # {name: gox_type}
-                'return_type': func_def.return_type, # IR type
-                'return_type_gox': func_def.return_type_gox,
-                'is_imported': func_def.imported
-            }
-        self.globals = { name: (None, ir_module.globals[name].type) for name in ir_module.globals } # Store as (value, IR_type)
-        if 'main' not in self.functions:
+        # Variables and call frames hold stack items unchanged, so only the
+        # handlers that inspect values differ between tagged and fast mode.
+        self.fast = False
+        if self.fast_mode:
+            try:
+                self.fast = IRVerifier.verify(ir_module)
+            except VerifyError as e:
+                self._log_debug(f"Verification failed, running in tagged mode: {e}")
+        # Locals, globals and functions are resolved to slots once, so the
+        # handlers below index lists instead of looking names up in dicts.
+        self.linked = link(ir_module)
+        if self.linked.main is None:
             raise RuntimeError("No 'main' function found in IR module to start execution.")
-        self._log_debug(f"Module loaded. Functions: {list(self.functions.keys())}. Globals: {list(self.globals.keys())}")
+        self.functions = self.linked.functions
+        self.globals = [None] * len(self.linked.globals) # None = not assigned yet
+        # Tiered execution needs raw values and no tracing wrappers. The
+        # import is deferred because the code generators import this module.
+        self.jit = None
+        if self.fast and self.jit_threshold > 0 and not self.tracer:
+            from source.jit import Jit
+            self.jit = Jit(self, self.jit_threshold, CONFIG.get("JitLog", False))
+        for func in self.functions:
+            func.decoded = None if func.imported else self._decode(func.code, func.name)
+            if func.imported and func.name in host_functions:
+                func.host = host_functions[func.name]
+                func.host.check(func.parmtypes, func.return_type)
+        self._log_debug(f"Module loaded ({'fast' if self.fast else 'tagged'} mode). Functions: {[func.name for func in self.functions]}. Globals: {self.linked.globals}")
+
+    def _decode(self, code, func_name):
+        '''
+        Decode a function's IR once into a list of (bound handler, operands)
+        pairs. Jump targets from resolve_jumps() become the operand of the
+        jumping instructions, so the run loop only has to index and call.
+        A trailing sentinel catches execution falling off the end.
+        Instructions in an active trace category get a tracing wrapper here,
+        so tracing costs nothing when it is off. In fast mode the fast_
+        handlers replace the op_ handlers that check tags, and with the JIT
+        on the jit_ handlers count calls and back-edges.
+        '''
+        jumps = resolve_jumps(code)
+        decoded = []
+        for pc, instr in enumerate(code):
+            opname = instr[0]
+            handler = getattr(self, f"jit_{opname}", None) if self.jit else None
+            if handler is None and self.fast:
+                handler = getattr(self, f"fast_{opname}", None)
+            if handler is None:
+                handler = getattr(self, f"op_{opname}", None)
+            if handler is None:
+                raise RuntimeError(f"Unknown instruction: {opname} at PC {pc}")
+            if jumps[pc] is not None and opname != 'LOOP':
+                args = (jumps[pc],)
+            elif opname == 'CONSTI':
+                args = (int(instr[1]),)
+            elif opname == 'CONSTF':
+                args = (float(instr[1]),)
+            else:
+                args = tuple(instr[1:])
+            category = self.tracer.category(opname) if self.tracer else None
+            if category:
+                handler = self._traced(handler, category, func_name, pc, opname)
+            decoded.append((handler, args))
+        decoded.append((self._op_falloff, ()))
+        return decoded
+
+    def _named_locals(self):
+        # Frames are plain lists; pair them with the slot names for display
+        if self.locals is None:
+            return 'N/A'
+        return dict(zip(self.current_function.slots, self.locals))
+
+    def _traced(self, handler, category, func_name, pc, opname):
+        tracer = self.tracer
+        def traced(*args):
+            before = self.stack[-3:]
+            try:
+                handler(*args)
+            except Exception as e:
+                tracer.emit(category, f"{func_name}:{pc} {opname} {args} stack={before} raised {e!r}")
+                raise
+            message = f"{func_name}:{pc} {opname} {args} stack={before} -> {self.stack[-3:]} next={self.current_function.name}:{self.pc}"
+            if category == 'dispatch':
+                message += f" locals={self._named_locals()}"
+            tracer.emit(category, message)
+        return traced
 
     def _initialize_execution(self):
-        if not self.functions or 'main' not in self.functions:
+        if self.linked is None or self.linked.main is None:
             print("Error: Program not loaded or 'main' function is missing.")
             return False
         # Simulate the initial call to main
-        self.op_CALL('main', is_initial_call=True)
+        self.op_CALL(self.linked.main)
         return True
 
     def run(self):
@@ -138,59 +282,47 @@ class StackMachine:
         # Max instructions to prevent accidental infinite loops during development
         max_instructions = CONFIG.get("MaxInstructions", 10 * 10000*100)  
 
-        self._log_debug(f"--- Starting execution from '{self.current_function_name}' ---")
-
-        while self.running:
-            self._log_debug(f"TOP OF RUN LOOP: PC={self.pc}, Current Function={self.current_function_name}") # <-- ADD THIS LINE
-            if self.pc < 0 or self.pc >= len(self.programInst):
-                if self.current_function_name == 'main' and not self.call_stack : # Normal exit if main finishes and no call stack left
-                     self._log_debug(f"Execution finished: PC ({self.pc}) out of bounds for main's program instructions ({len(self.programInst)}).")
-                     self.running = False
-                     break
-                elif not self.programInst: # Can happen if a function is empty or RET is the first instruction
-                    self._log_debug(f"Warning: Program instructions list is empty for function '{self.current_function_name}'. Attempting RET.")
-                    if not self.call_stack: # No place to return to
-                        self.running = False
-                        break
-                    self.op_RET() # Try to return
-                    continue # Re-evaluate loop condition with new pc/programInst
-                else:
-                    raise RuntimeError(f"PC ({self.pc}) out of bounds. Program length: {len(self.programInst)} for function '{self.current_function_name}'. Call Stack: {self.call_stack}")
-
-            instr = self.programInst[self.pc]
-            opname = instr[0]
-            args = instr[1:] if len(instr) > 1 else []
-
-            self._log_debug(f"PC: {self.pc}, Func: {self.current_function_name}, Instr: {opname} {args}, Stack: {self.stack}, Locals: {self.locals_stack[-1] if self.locals_stack else 'N/A'}")
-
-            method = getattr(self, f"op_{opname}", None)
-            if method:
-                original_pc = self.pc
-                self.pc_modified_by_operation = False # Reset done above
-                method(*args)
-                if not self.pc_modified_by_operation:
-                    # If the operation did not modify the PC itself,
-                    # and PC is still pointing at the instruction we just ran, increment it.
-                    if self.pc == original_pc:
-                        self.pc += 1
-                self._log_debug(f"END OF ITERATION: Next PC will be {self.pc}")
-                # If self.pc_modified_by_operation is True, the operation already set self.pc
-                # to the correct address for the *next* instruction fetch cycle.
-            else:
-                raise RuntimeError(f"Unknown instruction: {opname}")
+        self._log_debug(f"--- Starting execution from '{self.current_function.name}' ---")
+
+        # Compiled code recurses on the Python stack
+        recursion_limit = sys.getrecursionlimit()
+        if self.jit:
+            sys.setrecursionlimit(max(recursion_limit, RECURSION_LIMIT))
 
-            instruction_count += 1
-            if instruction_count >= max_instructions:
-                self.running = False # Stop before raising error
-                print(f"Stack: {self.stack}")
-                print(f"Locals: {self.locals_stack[-1] if self.locals_stack else 'N/A'}")
-                print(f"Globals: {self.globals}")
-                raise RuntimeError(f"Instruction limit ({max_instructions}) reached, possible infinite loop or very long program. Last instruction: {opname} {args} at PC {self.pc-1 if self.pc > 0 else 0} in {self.current_function_name}")
+        # The PC is advanced before dispatching, so jumping instructions
+        # simply overwrite self.pc with the next instruction to execute.
+        try:
+            while self.running:
+                pc = self.pc
+                handler, args = self.program[pc]
+                self.pc = pc + 1
+                handler(*args)
+
+                instruction_count += 1
+                if instruction_count >= max_instructions:
+                    self.running = False # Stop before raising error
+                    print(f"Stack: {self.stack}")
+                    print(f"Locals: {self._named_locals()}")
+                    print(f"Globals: {dict(zip(self.linked.globals, self.globals))}")
+                    raise RuntimeError(f"Instruction limit ({max_instructions}) reached, possible infinite loop or very long program. Last instruction: {self.current_function.source[pc]} at PC {pc} in {self.current_function.name}")
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+            self.instruction_count = instruction_count
+            self.output.close()
+            self.heap.flush()
+            if self.tracer:
+                self.tracer.close()
 
         self._log_debug("--- Execution halted ---")
         if self.stack:
             self._log_debug(f"Final stack (non-empty): {self.stack}")
 
+    def _op_falloff(self):
+        # Sentinel appended by _decode(): the function ran past its last instruction.
+        if self.current_function.name == 'main' and len(self.call_stack) == 1:
+            self.running = False
+            return
+        raise RuntimeError(f"PC ({self.pc - 1}) out of bounds. Program length: {len(self.current_function.source)} for function '{self.current_function.name}'. Call Stack: {[frame.function.name for frame in self.call_stack]}")
 
     # --- Helper methods ---
     def _pop_int(self):
@@ -206,17 +338,13 @@ class StackMachine:
         return float(value)
 
     def _pop_any(self):
-        self._log_debug(f"DEBUG POP_ANY: Stack BEFORE pop: {self.stack}, id(self.stack): {id(self.stack)}")
         if not self.stack:
-            self._log_debug("DEBUG POP_ANY: Stack is empty!")
             raise IndexError("Pop from empty stack")
-        item = self.stack.pop()
-        self._log_debug(f"DEBUG POP_ANY: Popped item: {item}, Stack AFTER pop: {self.stack}")
-        return item
+        return self.stack.pop()
 
     # --- Integer Arithmetic ---
     def op_CONSTI(self, value):
-        self.stack.append(('I', int(value)))
+        self.stack.append(('I', value))
 
     def op_ADDI(self):
         b = self._pop_int()
@@ -242,7 +370,7 @@ class StackMachine:
 
     # --- Floating Point Arithmetic ---
     def op_CONSTF(self, value):
-        self.stack.append(('F', float(value)))
+        self.stack.append(('F', value))
 
     def op_ADDF(self):
         b = self._pop_float()
@@ -352,300 +480,199 @@ class StackMachine:
             raise TypeError(f"FTOI requires a float, got {val_type}")
         self.stack.append(('I', int(value)))
 
+    def op_NEGI(self):
+        self.stack.append(('I', -self._pop_int()))
+
+    def op_NEGF(self):
+        self.stack.append(('F', -self._pop_float()))
+
+    def op_NOT(self):
+        self.stack.append(('I', 0 if self._pop_int() else 1))
+
     # --- Carga y almacenamiento de variables ---
-    def op_LOCAL_GET(self, name):
-        if not self.locals_stack:
-            raise RuntimeError("LOCAL_GET: No local scope available.")
-        current_locals = self.locals_stack[-1]
-        if name not in current_locals:
-            raise NameError(f"Local variable '{name}' not found in current scope.")
-        value, var_type = current_locals[name]
-        if value is None : # Check for uninitialized local variable
+    # Variables hold the stack item as-is, so these handlers are shared by
+    # tagged and fast mode. Operands are slots assigned by the linker and
+    # None marks a variable that was never assigned.
+    def op_LOCAL_GET(self, slot):
+        item = self.locals[slot]
+        if item is None: # Check for uninitialized local variable
+            name = list(self.current_function.slots)[slot]
             raise ValueError(f"Local variable '{name}' accessed before assignment.")
-        self.stack.append((var_type, value))
+        self.stack.append(item)
 
-    def op_LOCAL_SET(self, name):
-        if not self.locals_stack:
-            raise RuntimeError("LOCAL_SET: No local scope available.")
-        val_type, value = self._pop_any()
-        current_locals = self.locals_stack[-1]
-        # Optionally, check if var_type matches the declared type in func_def.locals_spec
-        # For now, we'll trust the IR generator or allow dynamic typing within stack machine vars
-        current_locals[name] = (value, val_type)
-
-
-    def op_GLOBAL_GET(self, name):
-        if name not in self.globals:
-            raise NameError(f"Global variable '{name}' not found.")
-        value, var_type = self.globals[name]
-        if value is None : # Check for uninitialized global variable
-            raise ValueError(f"Global variable '{name}' accessed before assignment.")
-        self.stack.append((var_type, value))
-
-    def op_GLOBAL_SET(self, name):
-        self._log_debug(f"DEBUG GLOBAL_SET: Called for name='{name}'. Globals BEFORE: {self.globals.get(name)}")
-        val_type, value = self._pop_any()
-        self.globals[name] = (value, val_type)
+    def op_LOCAL_SET(self, slot):
+        self.locals[slot] = self.stack.pop()
+
+    def op_GLOBAL_GET(self, slot):
+        item = self.globals[slot]
+        if item is None: # Check for uninitialized global variable
+            raise ValueError(f"Global variable '{self.linked.globals[slot]}' accessed before assignment.")
+        self.stack.append(item)
+
+    def op_GLOBAL_SET(self, slot):
+        self.globals[slot] = self.stack.pop()
+
+    def op_DROP(self):
+        self.stack.pop()
 
     # --- Funciones y retorno ---
-    def op_CALL(self, func_name, is_initial_call=False):
-        if func_name not in self.functions:
-            raise NameError(f"Function '{func_name}' not defined.")
-
-        func_def = self.functions[func_name]
-        if func_def['is_imported']:
-            # ... (keep your existing imported function handling) ...
-            # Example for handling imported functions if they might have loop contexts (unlikely for typical imports)
-            # self.pc_modified_by_operation = False # Or True if it behaves like a jump
-            self._log_debug(f"CALL: Imported function '{func_name}' handled.") # Minor log change
+    def op_CALL(self, index):
+        func = self.functions[index]
+        stack = self.stack
+        nparams = func.nparams
+        if len(stack) < nparams:
+            raise ValueError(f"Stack underflow when passing arguments to '{func.name}'. Expected {nparams} args.")
+        if func.imported:
+            # Imported functions have no body: call the host function bound
+            # to the name, if any, with a view of memory. Otherwise return 0.
+            args = stack[len(stack) - nparams:]
+            del stack[len(stack) - nparams:]
+            if not self.fast:
+                args = [value for _, value in args]
+            result = self._call_imported(func, args)
+            stack.append(result if self.fast else (func.return_type, result))
             return
-        # Argument passing should be before saving caller's state if args are on stack
-        new_locals = {}
-        for local_name, local_ir_type in func_def['locals_spec'].items():
-            new_locals[local_name] = (None, local_ir_type)
-
-        for i in range(len(func_def['params']) -1, -1, -1):
-            param_name = func_def['params'][i]
-            if not self.stack:
-                raise ValueError(f"Stack underflow when passing arguments to '{func_name}'. Expected {len(func_def['params'])} args.")
-            arg_type, arg_val = self._pop_any()
-            new_locals[param_name] = (arg_val, arg_type)
-        
-        self.locals_stack.append(new_locals)
-
-        if not is_initial_call:
-            # Save the caller's control_flow_stack depth
-            caller_control_flow_depth = len(self.control_flow_stack)
-            self.call_stack.append({
-                'pc_return': self.pc + 1,
-                'locals_frame_index': len(self.locals_stack) - 2, # Caller's locals frame index
-                'previous_function_name': self.current_function_name,
-                'previous_programInst': self.programInst,
-                'previous_control_flow_depth': caller_control_flow_depth # <-- STORE THIS
-            })
-            self._log_debug(f"CALL: Pushed {self.call_stack[-1]} to call_stack.")
-
-        self.current_function_name = func_name
-        self.programInst = func_def['code']
+        # The locals are a copy of the function's template; parameters take
+        # the first slots, in order.
+        new_locals = func.template[:]
+        if nparams:
+            new_locals[:nparams] = stack[-nparams:]
+            del stack[-nparams:]
+
+        frame = self.free_frames.pop() if self.free_frames else Frame()
+        frame.function = func
+        frame.program = func.decoded
+        frame.locals = new_locals
+        frame.base = len(stack)
+        frame.return_pc = self.pc
+        self.call_stack.append(frame)
+
+        self.current_function = func
+        self.program = func.decoded
+        self.locals = new_locals
         self.pc = 0
-        self.pc_modified_by_operation = True
-        self._log_debug(f"CALL: Jumping to {func_name}. New PC=0. Locals frame created. Program instructions loaded for {func_name}.")
-
-    def op_RET(self):
-        if not self.locals_stack: # This check should be after ensuring there is a scope to pop
-             if not (self.current_function_name == 'main' and not self.call_stack): # Main might not have locals if empty
-                 raise RuntimeError("RET: Locals stack is empty, cannot restore  (or was already popped).")
-        else:
-            self.locals_stack.pop()
 
-        if not self.call_stack: # Returning from 'main'
-            self._log_debug(f"RET: No call stack frame. Assuming return from '{self.current_function_name_or_none()}' or initial context. Halting.")
-            self.running = False
-            self.pc = -1 
-            self.pc_modified_by_operation = True
-            self.control_flow_stack.clear() # Clear any loop contexts from main
-            self._log_debug(f"RET: Cleared control_flow_stack as returning from last function. Stack: {self.control_flow_stack}")
-            return
+    def _call_imported(self, func, args):
+        # Host functions get a view of memory that is only valid during the call
+        result = None
+        if func.host is not None:
+            view = memoryview(self.memory)[:self.heap.top]
+            try:
+                result = func.host.func(view, *args)
+            finally:
+                view.release()
+        return float(result or 0) if func.return_type == 'F' else int(result or 0)
+
+    def _call_interpreted(self, func, args):
+        # Compiled code calling a function that is not compiled yet: run it
+        # in a nested dispatch loop until its frame returns.
+        call_stack = self.call_stack
+        depth = len(call_stack)
+        self.stack.extend(args)
+        self.op_CALL(func.index)
+        while len(call_stack) > depth:
+            pc = self.pc
+            handler, operands = self.program[pc]
+            self.pc = pc + 1
+            handler(*operands)
+        return self.stack.pop()
 
-        # Normal function return
-        return_frame = self.call_stack.pop()
-        self.pc = return_frame['pc_return']
-        self.current_function_name = return_frame['previous_function_name']
-        self.programInst = return_frame['previous_programInst']
-        self.pc_modified_by_operation = True # Ensure this is set for RET
-
-        # Restore/truncate control_flow_stack
-        if 'previous_control_flow_depth' in return_frame:
-            target_depth = return_frame['previous_control_flow_depth']
-            if len(self.control_flow_stack) > target_depth:
-                self._log_debug(f"RET: Truncating control_flow_stack from {len(self.control_flow_stack)} (top: {self.control_flow_stack[-1] if self.control_flow_stack else 'N/A'}) to depth {target_depth}.")
-                self.control_flow_stack = self.control_flow_stack[:target_depth]
-            # else:
-                # self._log_debug(f"RET: control_flow_stack depth ({len(self.control_flow_stack)}) already at or below target caller depth ({target_depth}). No change needed.")
-        else:
-            # This would be an issue if returning from a function that could have nested loops
-            # and was called by a mechanism that didn't save 'previous_control_flow_depth'.
-            # For now, this case might not arise if all CALLs are updated.
-            self._log_debug(f"RET: Warning - 'previous_control_flow_depth' not in return_frame. control_flow_stack not explicitly truncated by this mechanism for function {self.current_function_name}.")
-
-        self._log_debug(f"RET: Returning to {self.current_function_name} at PC {self.pc}. Locals restored. Call stack size: {len(self.call_stack)}. Control_flow_stack: {self.control_flow_stack}")
-        # ... (rest of your RET logic, e.g., for halting if main was empty) ...
-        if not self.programInst and self.current_function_name == 'main': # Edge case: main was empty
+    def op_RET(self):
+        call_stack = self.call_stack
+        frame = call_stack.pop()
+        # The return value stays on top; anything the callee left below it
+        # (only possible in unverified code) is discarded.
+        stack = self.stack
+        if len(stack) > frame.base + 1:
+            del stack[frame.base:-1]
+        frame.locals = None
+        self.free_frames.append(frame)
+
+        if not call_stack: # Returning from 'main'
             self.running = False
+            self.locals = None
             self.pc = -1
+            return
 
-
-    def current_function_name_or_none(self):
-        return self.current_function_name if self.current_function_name else "global/unknown context"
-
+        caller = call_stack[-1]
+        self.pc = frame.return_pc
+        self.current_function = caller.function
+        self.program = caller.program
+        self.locals = caller.locals
 
     # --- Control de flujo estructurado ---
-    # These require careful management of PC.
-    # The IR generator should produce labels or relative jumps.
-    # For this stack machine, we'll assume jump targets are absolute PCs
-    # or that IF/LOOP etc. implicitly manage blocks.
-    # A common way is IF jumps to ELSE or ENDIF if false.
-    # LOOP marks start, CBREAK jumps to ENDLOOP, ENDLOOP jumps to LOOP.
-
-    # For structured IF/ELSE/ENDIF, LOOP/CBREAK/ENDLOOP, the IR usually includes
-    # jump targets (labels that are resolved to PC values).
-    # If the IR has ('IF_FALSE_JUMP', label_else), ('JUMP', label_endif)
-    # For simplicity here, let's assume a block-based approach where the
-    # StackMachine finds matching ENDIF/ENDLOOP. This is harder to do efficiently
-    # without pre-calculating jump targets.
-
-    # A simpler model for IF: if condition is false, skip to matching ELSE or ENDIF.
-    # For now, IF will pop condition. If false, it will scan forward for ELSE or ENDIF.
-    # This is inefficient but demonstrates the logic. A real compiler would use labels/addresses.
-
-    # In class StackMachine:
-    def op_IF(self):
+    # Jump targets are resolved by resolve_jumps() and passed as operands
+    # by _decode(), so every jump below is a plain PC assignment.
+    def op_IF(self, target):
         condition_type, condition_value = self._pop_any()
         if condition_type != 'I':
-            raise TypeError("IF condition must be an integer (boolean).") #
-        
-        if condition_value == 0: # Condition is False
-            nesting_level = 1
-            scan_pc = self.pc + 1 # Start scanning instructions after the current IF
-            
-            while scan_pc < len(self.programInst):
-                instr_name = self.programInst[scan_pc][0]
-                if instr_name == 'IF':
-                    nesting_level += 1
-                elif instr_name == 'ENDIF':
-                    nesting_level -= 1
-                    if nesting_level == 0: 
-                        # Found the ENDIF for this IF, and no ELSE was found for this IF block.
-                        # This means it was an IF without an ELSE.
-                        self.pc = scan_pc # Jump to the ENDIF instruction.
-                        self.pc_modified_by_operation = True
-                        return
-                elif instr_name == 'ELSE' and nesting_level == 1:
-                    # Found the ELSE that matches the current IF.
-                    # Jump to the instruction *after* this ELSE instruction.
-                    self.pc = scan_pc + 1 
-                    self.pc_modified_by_operation = True
-                    return
-                scan_pc += 1
-            # If the loop finishes, a matching ENDIF (or ELSE if expected) was not found.
-            raise RuntimeError(f"IF(false) at PC {self.pc-1} did not find matching ELSE or ENDIF.")
-        else: # Condition is True
-            # Do nothing; self.pc_modified_by_operation remains False.
-            # The main run() loop will increment self.pc to execute the next instruction (the true-block).
-            # The ELSE instruction (if present) later on will handle skipping the else-block.
-            pass
-
-    def op_ELSE(self):
-        # This instruction implies the 'IF' block was executed.
-        # We need to skip to the matching ENDIF.
-        nesting_level = 1
-        target_pc = self.pc + 1
-        while target_pc < len(self.programInst):
-            instr_name = self.programInst[target_pc][0]
-            if instr_name == 'IF': # Should not happen if IFs are properly nested with ELSE
-                nesting_level +=1
-            elif instr_name == 'ENDIF':
-                nesting_level -= 1
-                if nesting_level == 0:
-                    self.pc = target_pc # Will be incremented by main loop, so ENDIF is executed next
-                    self.pc_modified_by_operation = True
-                    return
-            target_pc += 1
-        raise RuntimeError("ELSE without matching ENDIF.")
+            raise TypeError("IF condition must be an integer (boolean).")
+        if condition_value == 0: # Skip to the else-block (or past ENDIF)
+            self.pc = target
+
+    def op_ELSE(self, target):
+        # Reaching ELSE means the then-block was executed: skip the else-block.
+        self.pc = target
 
     def op_ENDIF(self):
         # ENDIF is a marker, no specific action other than being a jump target.
-        # PC will be incremented by the main loop.
         pass
 
     def op_LOOP(self):
-        # Mark the start of the loop for ENDLOOP and CONTINUE.
-        # We push the current PC (address of LOOP instruction) onto a control flow stack.
-        self._log_debug(f"LOOP instruction at PC={self.pc}. Pushing {{'type': 'LOOP_START', 'pc': {self.pc}}} to control_flow_stack.")
-        self.control_flow_stack.append({'type': 'LOOP_START', 'pc': self.pc})
-        # PC will be incremented by the main loop to enter the loop body.
+        # LOOP is a marker, ENDLOOP and CONTINUE jump to the instruction after it.
+        pass
+
+    # --- Ejecución por niveles (ver source/jit.py) ---
+    def jit_CALL(self, index):
+        func = self.functions[index]
+        compiled = func.compiled or self.jit.hot_function(func)
+        if not compiled:
+            return self.op_CALL(index)
+        stack = self.stack
+        nparams = func.nparams
+        args = stack[len(stack) - nparams:]
+        del stack[len(stack) - nparams:]
+        stack.append(compiled(*args))
+
+    def jit_LOOP(self):
+        # A loop entered in a hot function runs compiled, on the frame's locals
+        func = self.current_function
+        if func.backedges < self.jit.threshold:
+            return
+        loop = self.jit.hot_loop(func, self.pc - 1)
+        if loop is None:
+            return
+        compiled, exit_pc = loop
+        result = compiled(self.locals)
+        if result is None:
+            self.pc = exit_pc
+        else:
+            self.stack.append(result[0])
+            self.op_RET()
+
+    def jit_ENDLOOP(self, target):
+        self.current_function.backedges += 1
+        self.pc = target
 
-    def op_CBREAK(self): # Conditional Break
+    def op_CBREAK(self, target): # Conditional Break
         condition_type, condition_value = self._pop_any()
         if condition_type != 'I':
             raise TypeError("CBREAK condition must be an integer (boolean).")
+        if condition_value != 0: # True, so break to the instruction after ENDLOOP
+            self.pc = target
 
-        if condition_value != 0: # True, so break
-            # Find matching ENDLOOP
-            scan_pc = self.pc + 1 # Start scanning from instruction after CBREAK
-            temp_nesting = 0
-            found_endloop = False
-            
-            while scan_pc < len(self.programInst):
-                instr_name = self.programInst[scan_pc][0]
-                if instr_name == 'LOOP':
-                    temp_nesting += 1
-                elif instr_name == 'ENDLOOP':
-                    if temp_nesting == 0: # This ENDLOOP matches our current CBREAK's loop level
-                        # Set PC to instruction AFTER this ENDLOOP
-                        self.pc = scan_pc + 1 
-                        self.pc_modified_by_operation = True
-                        found_endloop = True
-                        break
-                    else: # This ENDLOOP belongs to an inner, nested loop
-                        temp_nesting -= 1
-                scan_pc += 1
-            
-            if not found_endloop:
-                raise RuntimeError("CBREAK without matching ENDLOOP or loop structure error.")
-
-            # Clean up the control_flow_stack for the loop being exited.
-            # CBREAK exits the innermost loop it's part of, so its LOOP_START marker should be at the top.
-            if self.control_flow_stack and self.control_flow_stack[-1]['type'] == 'LOOP_START':
-                self.control_flow_stack.pop() # Pop the LOOP_START of the broken loop
-            else:
-                # This signifies a problem, as CBREAK should be within a loop
-                # context that has placed its marker on the control_flow_stack.
-                self._log_debug("Critical Warning: CBREAK executed but control_flow_stack was empty or its top was not a LOOP_START marker. This could indicate a prior issue.")
-            
-            return # PC is set to after ENDLOOP, control_flow_stack adjusted. Main run loop will continue from new PC.
-        
-        # If condition_value is 0 (false), do nothing. 
-        # PC will be incremented by the main run loop to the next instruction.
-
+    def op_CBREAK_IF_FALSE(self, target):
+        condition_type, condition_value = self._pop_any()
+        if condition_type != 'I':
+            raise TypeError("CBREAK_IF_FALSE condition must be an integer (boolean).")
+        if condition_value == 0:
+            self.pc = target
 
-    def op_CONTINUE(self):
-        # Jump to the beginning of the current (innermost) loop.
-        # The beginning is the instruction *after* the LOOP instruction.
-        if not self.control_flow_stack:
-            raise RuntimeError("CONTINUE without active LOOP.")
+    def op_CONTINUE(self, target):
+        self.pc = target
 
-        loop_start_info = None
-        for i in range(len(self.control_flow_stack) - 1, -1, -1):
-            if self.control_flow_stack[i]['type'] == 'LOOP_START':
-                loop_start_info = self.control_flow_stack[i]
-                break
-        
-        if not loop_start_info:
-            raise RuntimeError("CONTINUE found no LOOP_START on control_flow_stack.")
-
-        self.pc = loop_start_info['pc'] # PC of the LOOP instruction. Main loop will increment it.
-                                        # So effectively jumps to instruction *after* LOOP.
-                                        # No, it should jump TO the LOOP instruction itself, which then proceeds.
-                                        # The run loop increments PC *after* instruction execution.
-                                        # So, setting PC to loop_start_info['pc'] means LOOP will be re-executed.
-                                        # This might be okay if LOOP itself doesn't have side effects other than marking.
-                                        # Or, it should be loop_start_info['pc'] and LOOP does nothing on re-entry if already marked.
-                                        # Let's set it to loop_start_info['pc'] - 1 so after increment it's the LOOP instr.
-                                        # No, set to loop_start_info['pc'] directly. The LOOP instruction should be idempotent or simply a marker.
-
-        self.pc = loop_start_info['pc'] # The run() loop will execute this LOOP instruction next, then increment PC.
-        self.pc_modified_by_operation = True
-    def op_ENDLOOP(self):
-        # Jump back to the corresponding LOOP instruction.
-        if not self.control_flow_stack or self.control_flow_stack[-1]['type'] != 'LOOP_START':
-            raise RuntimeError("ENDLOOP without matching LOOP or malformed control_flow_stack.")
-        
-        loop_start_info = self.control_flow_stack.pop() # Remove this loop's mark
-        self._log_debug(f"ENDLOOP at PC={self.pc}. Popped loop_start_info: {loop_start_info}. Jumping to PC={loop_start_info['pc']}.")
-        self.pc = loop_start_info['pc'] # Jump to the LOOP instruction itself.
-                                        # The run loop will execute LOOP, then increment PC to enter body.
-        self.pc_modified_by_operation = True
+    def op_ENDLOOP(self, target):
+        self.pc = target
 
     # --- Expansión de memoria ---
     # In class StackMachine:
@@ -653,21 +680,18 @@ class StackMachine:
         num_bytes_type, num_bytes = self._pop_any()
         if num_bytes_type != 'I':
             raise TypeError("GROW expects an integer (number of bytes) on stack.")
-        if num_bytes < 0:
-            raise ValueError("Cannot grow memory by a negative amount.")
 
-        base_address_of_new_block = len(self.memory) # This is current_size before growth
-        
         try:
-            self.memory.extend(bytearray(num_bytes))
+            base_address_of_new_block = self.heap.alloc(num_bytes)
         except MemoryError: # It's good practice to catch potential MemoryError during extend
-            current_total_size = len(self.memory) # Get current size before erroring
-            raise MemoryError(f"Failed to grow memory by {num_bytes} bytes. Current total size: {current_total_size}")
+            raise MemoryError(f"Failed to grow memory by {num_bytes} bytes. Current total size: {self.heap.top}")
         
         # Push ONLY the base address of the newly allocated block
         self.stack.append(('I', base_address_of_new_block)) 
-        
-        self._log_debug(f"Memory grown by {num_bytes} bytes. Base of new block: {base_address_of_new_block}, New total size: {len(self.memory)}. Pushed base address of new block.")
+
+    def op_FREE(self):
+        address = self._pop_int()
+        self.stack.append(('I', self.heap.free(address)))
 
 
     # --- Entrada/salida ---
@@ -675,13 +699,13 @@ class StackMachine:
         val_type, value = self._pop_any()
         if val_type != 'I':
             raise TypeError(f"PRINTI requires an integer, got {val_type}")
-        print(f"[bold dark_green][OUTPUT][/bold dark_green] {int(value)}")
+        self.output.write(int(value))
 
     def op_PRINTF(self):
         val_type, value = self._pop_any()
         if val_type != 'F':
             raise TypeError(f"PRINTF requires a float, got {val_type}")
-        print(f"[bold dark_green][OUTPUT][/bold dark_green] {float(value)}")
+        self.output.write(float(value))
 
     def op_PRINTB(self): # Prints byte as integer value, or as char? "PRINTB ; Imprimir el elemento superior de la pila" (value presented as integer)
         val_type, value = self._pop_any()
@@ -689,86 +713,330 @@ class StackMachine:
             raise TypeError(f"PRINTB requires an integer (representing a byte), got {val_type}")
         # Assuming it prints the integer value of the byte.
         # If it should print as a character: print(chr(int(value)))
-        print(f"[bold dark_green][OUTPUT][/bold dark_green] {int(value)}")
+        self.output.write(int(value))
 
     # --- Acceso a memoria ---
     # PEEKI, POKEI, PEEKF, POKEF, PEEKB, POKEB 
     
     def op_PEEKI(self): # Address is on stack
-        """Read 4-byte integer from memory at address (little-endian)"""
+        """Read IntSize-byte integer from memory at address (little-endian)"""
         address = self._pop_int()
-        if address < 0 or address + self.INT_SIZE > len(self.memory):
-            raise IndexError(f"PEEKI: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address + self.INT_SIZE > self.heap.top:
+            raise IndexError(f"PEEKI: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
-        # Read 4 bytes in little-endian order
-        bytes_data = self.memory[address:address + self.INT_SIZE]
-        value = int.from_bytes(bytes_data, byteorder='little', signed=True)
+        value = self.unpack_int(self.memory, address)[0]
         self.stack.append(('I', value))
-        self._log_debug(f"PEEKI: Read integer {value} from address {address}")
 
     def op_POKEI(self): # Value, then Address on stack
-        """Write 4-byte integer to memory at address (little-endian)"""
+        """Write IntSize-byte integer to memory at address (little-endian)"""
         value = self._pop_int()  # El valor está en el tope de la pila
         address = self._pop_int()  # La dirección está debajo del valor
         
-        if address < 0 or address + self.INT_SIZE > len(self.memory):
-            raise IndexError(f"POKEI: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address + self.INT_SIZE > self.heap.top:
+            raise IndexError(f"POKEI: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
-        # Write 4 bytes in little-endian order
-        bytes_data = value.to_bytes(self.INT_SIZE, byteorder='little', signed=True)
-        self.memory[address:address + self.INT_SIZE] = bytes_data
-        self._log_debug(f"POKEI: Wrote integer {value} to address {address}")
+        self.pack_int(self.memory, address, value)
 
 
     def op_PEEKF(self): # Address is on stack
-        """Read 4-byte float from memory at address (little-endian)"""
-        import struct
+        """Read FloatSize-byte float from memory at address (little-endian)"""
         address = self._pop_int()
         
-        if address < 0 or address + self.FLOAT_SIZE > len(self.memory):
-            raise IndexError(f"PEEKF: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address + self.FLOAT_SIZE > self.heap.top:
+            raise IndexError(f"PEEKF: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
-        # Read 4 bytes and convert to float using IEEE 754 format
-        bytes_data = self.memory[address:address + self.FLOAT_SIZE]
-        value = struct.unpack('<f', bytes_data)[0]  # '<f' = little-endian float
+        value = self.unpack_float(self.memory, address)[0]
         self.stack.append(('F', value))
-        self._log_debug(f"PEEKF: Read float {value} from address {address}")
 
     def op_POKEF(self): # Value, then Address on stack
-        """Write 4-byte float to memory at address (little-endian)"""
-        import struct
+        """Write FloatSize-byte float to memory at address (little-endian)"""
         value = self._pop_float()  # El valor está en el tope de la pila
         address = self._pop_int()  # La dirección está debajo del valor
         
-        if address < 0 or address + self.FLOAT_SIZE > len(self.memory):
-            raise IndexError(f"POKEF: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address + self.FLOAT_SIZE > self.heap.top:
+            raise IndexError(f"POKEF: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
-        # Convert float to 4 bytes using IEEE 754 format
-        bytes_data = struct.pack('<f', value)  # '<f' = little-endian float
-        self.memory[address:address + self.FLOAT_SIZE] = bytes_data
-        self._log_debug(f"POKEF: Wrote float {value} to address {address}")
+        self.pack_float(self.memory, address, value)
 
     def op_PEEKB(self): # Address is on stack
         """Read 1 byte from memory at address"""
         address = self._pop_int()
         
-        if address < 0 or address >= len(self.memory):
-            raise IndexError(f"PEEKB: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address >= self.heap.top:
+            raise IndexError(f"PEEKB: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
         value = self.memory[address]
         self.stack.append(('I', value))  # Bytes are represented as integers
-        self._log_debug(f"PEEKB: Read byte {value} from address {address}")
 
     def op_POKEB(self): # Value, then Address on stack
         """Write 1 byte to memory at address"""
         value = self._pop_int()  # El valor está en el tope de la pila
         address = self._pop_int()  # La dirección está debajo del valor
         
-        if address < 0 or address >= len(self.memory):
-            raise IndexError(f"POKEB: Memory access out of bounds. Address: {address}, Memory size: {len(self.memory)}")
+        if address < 0 or address >= self.heap.top:
+            raise IndexError(f"POKEB: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
         
         if value < 0 or value > 255:
             raise ValueError(f"POKEB: Byte value must be 0-255, got {value}")
         
         self.memory[address] = value
-        self._log_debug(f"POKEB: Wrote byte {value} to address {address}")
\ No newline at end of file
+
+    # --- Operaciones sobre rangos de memoria ---
+    # MEMSET, MEMCPY, MEMCMP, FILLI and FILLF work on a whole range with a
+    # single slice operation. The _mem* helpers are shared by tagged and
+    # fast mode; operands are in push order.
+    def _check_range(self, opname, address, size):
+        if size < 0:
+            raise ValueError(f"{opname}: Size must be non-negative, got {size}")
+        if address < 0 or address + size > self.heap.top:
+            raise IndexError(f"{opname}: Memory access out of bounds. Address: {address}, Size: {size}, Memory size: {self.heap.top}")
+
+    def _memset(self, address, value, size):
+        self._check_range('MEMSET', address, size)
+        if value < 0 or value > 255:
+            raise ValueError(f"MEMSET: Byte value must be 0-255, got {value}")
+        self.memory[address:address + size] = bytes((value,)) * size
+
+    def _memcpy(self, dst, src, size):
+        self._check_range('MEMCPY', dst, size)
+        self._check_range('MEMCPY', src, size)
+        self.memory[dst:dst + size] = self.memory[src:src + size]
+
+    def _memcmp(self, a, b, size):
+        self._check_range('MEMCMP', a, size)
+        self._check_range('MEMCMP', b, size)
+        left, right = self.memory[a:a + size], self.memory[b:b + size]
+        return (left > right) - (left < right)
+
+    def _filli(self, address, value, count):
+        self._check_range('FILLI', address, count * self.INT_SIZE)
+        self.memory[address:address + count * self.INT_SIZE] = self.int_bytes(value) * count
+
+    def _fillf(self, address, value, count):
+        self._check_range('FILLF', address, count * self.FLOAT_SIZE)
+        self.memory[address:address + count * self.FLOAT_SIZE] = self.float_bytes(value) * count
+
+    def op_MEMSET(self):
+        size = self._pop_int()
+        value = self._pop_int()
+        self._memset(self._pop_int(), value, size)
+
+    def op_MEMCPY(self):
+        size = self._pop_int()
+        src = self._pop_int()
+        self._memcpy(self._pop_int(), src, size)
+
+    def op_MEMCMP(self):
+        size = self._pop_int()
+        b = self._pop_int()
+        self.stack.append(('I', self._memcmp(self._pop_int(), b, size)))
+
+    def op_FILLI(self):
+        count = self._pop_int()
+        value = self._pop_int()
+        self._filli(self._pop_int(), value, count)
+
+    def op_FILLF(self):
+        count = self._pop_int()
+        value = self._pop_float()
+        self._fillf(self._pop_int(), value, count)
+
+    # --- Modo rápido (pila sin etiquetas) ---
+    # Once IRVerifier has proven the module well typed, _decode() binds these
+    # fast_ handlers instead of the op_ handlers above. The stack then holds
+    # raw ints and floats: no tag tuples are built and no tags are checked.
+    # Instructions without a fast_ handler use the shared op_ handler.
+    def fast_CONSTI(self, value):
+        self.stack.append(value)
+
+    fast_CONSTF = fast_CONSTI
+
+    def fast_ADDI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] += b
+
+    fast_ADDF = fast_ADDI
+
+    def fast_SUBI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] -= b
+
+    fast_SUBF = fast_SUBI
+
+    def fast_MULI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] *= b
+
+    fast_MULF = fast_MULI
+
+    def fast_DIVI(self):
+        stack = self.stack
+        b = stack.pop()
+        if b == 0:
+            raise ZeroDivisionError("Integer division by zero")
+        stack[-1] //= b
+
+    def fast_DIVF(self):
+        stack = self.stack
+        b = stack.pop()
+        if b == 0.0:
+            raise ZeroDivisionError("Floating point division by zero")
+        stack[-1] /= b
+
+    def fast_ANDI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] &= b
+
+    def fast_ORI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] |= b
+
+    def fast_LTI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] < b else 0
+
+    def fast_LEI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] <= b else 0
+
+    def fast_GTI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] > b else 0
+
+    def fast_GEI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] >= b else 0
+
+    def fast_EQI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] == b else 0
+
+    def fast_NEI(self):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = 1 if stack[-1] != b else 0
+
+    fast_LTF = fast_LTI
+    fast_LEF = fast_LEI
+    fast_GTF = fast_GTI
+    fast_GEF = fast_GEI
+    fast_EQF = fast_EQI
+    fast_NEF = fast_NEI
+
+    def fast_ITOF(self):
+        self.stack[-1] = float(self.stack[-1])
+
+    def fast_FTOI(self):
+        self.stack[-1] = int(self.stack[-1])
+
+    def fast_NEGI(self):
+        self.stack[-1] = -self.stack[-1]
+
+    fast_NEGF = fast_NEGI
+
+    def fast_NOT(self):
+        stack = self.stack
+        stack[-1] = 0 if stack[-1] else 1
+
+    def fast_IF(self, target):
+        if not self.stack.pop():
+            self.pc = target
+
+    def fast_CBREAK(self, target):
+        if self.stack.pop():
+            self.pc = target
+
+    def fast_CBREAK_IF_FALSE(self, target):
+        if not self.stack.pop():
+            self.pc = target
+
+    def fast_GROW(self):
+        self.stack[-1] = self.heap.alloc(self.stack[-1])
+
+    def fast_FREE(self):
+        self.stack[-1] = self.heap.free(self.stack[-1])
+
+    def fast_PRINTI(self):
+        self.output.write(self.stack.pop())
+
+    fast_PRINTF = fast_PRINTI
+    fast_PRINTB = fast_PRINTI
+
+    def fast_PEEKI(self):
+        address = self.stack.pop()
+        if address < 0 or address + self.INT_SIZE > self.heap.top:
+            raise IndexError(f"PEEKI: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.stack.append(self.unpack_int(self.memory, address)[0])
+
+    def fast_POKEI(self):
+        value = self.stack.pop()
+        address = self.stack.pop()
+        if address < 0 or address + self.INT_SIZE > self.heap.top:
+            raise IndexError(f"POKEI: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.pack_int(self.memory, address, value)
+
+    def fast_PEEKF(self):
+        address = self.stack.pop()
+        if address < 0 or address + self.FLOAT_SIZE > self.heap.top:
+            raise IndexError(f"PEEKF: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.stack.append(self.unpack_float(self.memory, address)[0])
+
+    def fast_POKEF(self):
+        value = self.stack.pop()
+        address = self.stack.pop()
+        if address < 0 or address + self.FLOAT_SIZE > self.heap.top:
+            raise IndexError(f"POKEF: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.pack_float(self.memory, address, value)
+
+    def fast_PEEKB(self):
+        address = self.stack.pop()
+        if address < 0 or address >= self.heap.top:
+            raise IndexError(f"PEEKB: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.stack.append(self.memory[address])
+
+    def fast_POKEB(self):
+        value = self.stack.pop()
+        address = self.stack.pop()
+        if address < 0 or address >= self.heap.top:
+            raise IndexError(f"POKEB: Memory access out of bounds. Address: {address}, Memory size: {self.heap.top}")
+        self.memory[address] = value
+
+    def fast_MEMSET(self):
+        stack = self.stack
+        size = stack.pop()
+        value = stack.pop()
+        self._memset(stack.pop(), value, size)
+
+    def fast_MEMCPY(self):
+        stack = self.stack
+        size = stack.pop()
+        src = stack.pop()
+        self._memcpy(stack.pop(), src, size)
+
+    def fast_MEMCMP(self):
+        stack = self.stack
+        size = stack.pop()
+        b = stack.pop()
+        stack[-1] = self._memcmp(stack[-1], b, size)
+
+    def fast_FILLI(self):
+        stack = self.stack
+        count = stack.pop()
+        value = stack.pop()
+        self._filli(stack.pop(), value, count)
+
+    def fast_FILLF(self):
+        stack = self.stack
+        count = stack.pop()
+        value = stack.pop()
+        self._fillf(stack.pop(), value, count)
@@ -0,0 +1,91 @@
+# trace.py
+'''
+Trazado de la máquina de pila
+=============================
+
+El trazado reemplaza los mensajes de depuración que la máquina de pila
+imprimía en cada instrucción. Cada instrucción pertenece a una categoría
+y solo las categorías activas generan salida:
+
+    dispatch   ; Todas las instrucciones (PC, función, pila y locales)
+    calls      ; CALL y RET
+    memory     ; PEEK*, POKE*, GROW, FREE, MEM* y FILL*
+    control    ; IF, ELSE, ENDIF, LOOP, CBREAK, CONTINUE, ENDLOOP
+
+El costo es cero cuando el trazado está apagado: la máquina envuelve los
+manejadores de las instrucciones trazadas al decodificar el módulo, así
+que el ciclo de ejecución no revisa ninguna bandera ni construye cadenas.
+
+La salida va a un archivo de texto. Se configura en settings/config.json:
+
+    "Trace": ["calls", "memory"],
+    "TraceFile": "output/trace.log"
+
+Si "Debug" está activo y "Trace" no se indica, se trazan todas las
+categorías.
+'''
+import os
+
+CATEGORIES = ('dispatch', 'calls', 'memory', 'control')
+
+# Categoría de cada instrucción (dispatch aplica a todas)
+_opcategory = {
+	'CALL': 'calls', 'RET': 'calls',
+	'PEEKI': 'memory', 'POKEI': 'memory',
+	'PEEKF': 'memory', 'POKEF': 'memory',
+	'PEEKB': 'memory', 'POKEB': 'memory',
+	'GROW': 'memory', 'FREE': 'memory',
+	'MEMSET': 'memory', 'MEMCPY': 'memory', 'MEMCMP': 'memory',
+	'FILLI': 'memory', 'FILLF': 'memory',
+	'IF': 'control', 'ELSE': 'control', 'ENDIF': 'control',
+	'LOOP': 'control', 'CBREAK': 'control', 'CBREAK_IF_FALSE': 'control',
+	'CONTINUE': 'control', 'ENDLOOP': 'control',
+}
+
+DEFAULT_TRACE_FILE = os.path.join('output', 'trace.log')
+
+class Tracer:
+	def __init__(self, categories, path=DEFAULT_TRACE_FILE):
+		unknown = set(categories) - set(CATEGORIES)
+		if unknown:
+			raise ValueError(f"Categorías de trazado desconocidas: {sorted(unknown)}")
+		self.categories = frozenset(categories)
+		self.path = path
+		self.file = None
+
+	@classmethod
+	def from_config(cls, config):
+		'''
+		Crea un Tracer a partir de la configuración, o None si el
+		trazado está apagado.
+		'''
+		categories = config.get("Trace")
+		if categories is None:
+			categories = CATEGORIES if config.get("Debug", False) else ()
+		if not categories:
+			return None
+		path = config.get("TraceFile") or DEFAULT_TRACE_FILE
+		if not os.path.isabs(path):
+			path = os.path.join(os.path.dirname(__file__), '..', path)
+		return cls(categories, path)
+
+	def category(self, opname):
+		'''
+		Retorna la categoría activa con la que se traza la instrucción
+		o None si no se traza.
+		'''
+		if 'dispatch' in self.categories:
+			return 'dispatch'
+		category = _opcategory.get(opname)
+		return category if category in self.categories else None
+
+	def emit(self, category, message):
+		if self.file is None:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			self.file = open(self.path, 'w', encoding='utf-8')
+		self.file.write(f"[{category}] {message}\n")
+
+	def close(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
@@ -0,0 +1,219 @@
+# verifier.py
+'''
+Verificador de código IR
+========================
+
+Antes de ejecutar un módulo en modo rápido (pila sin etiquetas de tipo),
+la máquina de pila necesita la garantía de que cada instrucción recibe
+operandos del tipo correcto y de que la pila está balanceada. El checker
+y el generador IRCode ya lo garantizan, pero el verificador lo comprueba
+sobre el código IR final, después de cualquier transformación.
+
+El verificador hace una interpretación abstracta de cada función: en vez
+de valores, la pila contiene tipos IR ('I' o 'F'). Para cada instrucción
+se comprueban los tipos que consume y se apilan los que produce. En las
+estructuras de control se exige que:
+
+* Las dos ramas de un IF terminen con la misma pila.
+* Un LOOP vuelva al inicio (ENDLOOP/CONTINUE) con la misma pila con la que
+  entró, y que todos los CBREAK (y CBREAK_IF_FALSE) salgan con la misma pila.
+* Cada RET encuentre exactamente un valor, del tipo de retorno de la función.
+* Todo camino de la función termine en un RET.
+
+Uso:
+
+    IRVerifier.verify(module)     # Lanza VerifyError si el IR no es válido
+'''
+
+class VerifyError(Exception):
+	'''
+	Se lanza cuando el código IR de una función no está bien tipado o la
+	pila no está balanceada.
+	'''
+	pass
+
+# Firma de cada instrucción: (tipos que consume, tipos que produce).
+# Los tipos consumidos se listan en el orden en que fueron apilados.
+# Las instrucciones que dependen de su operando (variables, llamadas)
+# y las de control de flujo se tratan aparte.
+ir_signatures = {
+	'CONSTI': ((), ('I',)),
+	'ADDI':   (('I', 'I'), ('I',)),
+	'SUBI':   (('I', 'I'), ('I',)),
+	'MULI':   (('I', 'I'), ('I',)),
+	'DIVI':   (('I', 'I'), ('I',)),
+	'ANDI':   (('I', 'I'), ('I',)),
+	'ORI':    (('I', 'I'), ('I',)),
+	'LTI':    (('I', 'I'), ('I',)),
+	'LEI':    (('I', 'I'), ('I',)),
+	'GTI':    (('I', 'I'), ('I',)),
+	'GEI':    (('I', 'I'), ('I',)),
+	'EQI':    (('I', 'I'), ('I',)),
+	'NEI':    (('I', 'I'), ('I',)),
+	'PRINTI': (('I',), ()),
+	'PEEKI':  (('I',), ('I',)),
+	'POKEI':  (('I', 'I'), ()),
+	'ITOF':   (('I',), ('F',)),
+	'NEGI':   (('I',), ('I',)),
+	'NOT':    (('I',), ('I',)),
+
+	'CONSTF': ((), ('F',)),
+	'ADDF':   (('F', 'F'), ('F',)),
+	'SUBF':   (('F', 'F'), ('F',)),
+	'MULF':   (('F', 'F'), ('F',)),
+	'DIVF':   (('F', 'F'), ('F',)),
+	'LTF':    (('F', 'F'), ('I',)),
+	'LEF':    (('F', 'F'), ('I',)),
+	'GTF':    (('F', 'F'), ('I',)),
+	'GEF':    (('F', 'F'), ('I',)),
+	'EQF':    (('F', 'F'), ('I',)),
+	'NEF':    (('F', 'F'), ('I',)),
+	'PRINTF': (('F',), ()),
+	'PEEKF':  (('I',), ('F',)),
+	'POKEF':  (('I', 'F'), ()),
+	'FTOI':   (('F',), ('I',)),
+	'NEGF':   (('F',), ('F',)),
+
+	'PRINTB': (('I',), ()),
+	'PEEKB':  (('I',), ('I',)),
+	'POKEB':  (('I', 'I'), ()),
+
+	'GROW':   (('I',), ('I',)),
+	'FREE':   (('I',), ('I',)),
+	'MEMSET': (('I', 'I', 'I'), ()),
+	'MEMCPY': (('I', 'I', 'I'), ()),
+	'MEMCMP': (('I', 'I', 'I'), ('I',)),
+	'FILLI':  (('I', 'I', 'I'), ()),
+	'FILLF':  (('I', 'F', 'I'), ()),
+}
+
+# Grupos de instrucciones que comparten las optimizaciones (source/cse.py,
+# licm.py y dce.py)
+ir_leaves = { 'CONSTI', 'CONSTF', 'LOCAL_GET', 'GLOBAL_GET' }   # Apilan un valor sin consumir
+ir_barriers = { 'IF', 'ELSE', 'ENDIF', 'LOOP', 'ENDLOOP', 'CONTINUE', 'RET' }   # Terminan un bloque
+# Operaciones sin efectos que no pueden fallar (sin memoria, FTOI ni divisiones)
+ir_safe = {
+	'ADDI', 'SUBI', 'MULI', 'ANDI', 'ORI', 'LTI', 'LEI', 'GTI', 'GEI', 'EQI', 'NEI', 'NEGI', 'NOT', 'ITOF',
+	'ADDF', 'SUBF', 'MULF', 'LTF', 'LEF', 'GTF', 'GEF', 'EQF', 'NEF', 'NEGF',
+}
+gox_types = { 'I': 'int', 'F': 'float' }   # Tipo GoxLang de los temporales de cada tipo IR
+
+class IRVerifier:
+	def __init__(self, module):
+		self.module = module
+
+	@classmethod
+	def verify(cls, module):
+		'''
+		Verifica todas las funciones del módulo. Retorna True o lanza
+		VerifyError con la primera falla encontrada.
+		'''
+		verifier = cls(module)
+		for func in module.functions.values():
+			if not func.imported:
+				verifier.verify_function(func)
+		return True
+
+	def error(self, func, pc, message):
+		instr = func.code[pc] if 0 <= pc < len(func.code) else None
+		raise VerifyError(f"{func.name}:{pc} {instr}: {message}")
+
+	def pop(self, func, pc, state, expected):
+		if not state:
+			self.error(func, pc, f"se esperaba '{expected}' pero la pila está vacía")
+		got = state.pop()
+		if expected is not None and got != expected:
+			self.error(func, pc, f"se esperaba '{expected}' en la pila, se encontró '{got}'")
+		return got
+
+	def merge(self, func, pc, first, second, what):
+		# None representa un camino inalcanzable (después de RET/CONTINUE)
+		if first is None:
+			return second
+		if second is None or first == second:
+			return first
+		self.error(func, pc, f"{what}: pilas distintas {first} y {second}")
+
+	def verify_function(self, func):
+		state = []        # Tipos en la pila, o None si el código es inalcanzable
+		blocks = []       # Bloques IF/LOOP abiertos
+		for pc, instr in enumerate(func.code):
+			opname = instr[0]
+			if opname == 'IF':
+				if state is not None:
+					self.pop(func, pc, state, 'I')
+				blocks.append({'kind': 'IF', 'entry': None if state is None else list(state), 'then': None, 'has_else': False})
+			elif opname == 'ELSE':
+				if not blocks or blocks[-1]['kind'] != 'IF' or blocks[-1]['has_else']:
+					self.error(func, pc, "ELSE sin IF")
+				block = blocks[-1]
+				block['then'], block['has_else'] = state, True
+				state = None if block['entry'] is None else list(block['entry'])
+			elif opname == 'ENDIF':
+				if not blocks or blocks[-1]['kind'] != 'IF':
+					self.error(func, pc, "ENDIF sin IF")
+				block = blocks.pop()
+				if block['has_else']:
+					state = self.merge(func, pc, block['then'], state, "ramas del IF")
+				else:
+					state = self.merge(func, pc, block['entry'], state, "IF sin ELSE")
+			elif opname == 'LOOP':
+				blocks.append({'kind': 'LOOP', 'entry': None if state is None else list(state), 'exit': None})
+			elif opname in ('CBREAK', 'CBREAK_IF_FALSE', 'CONTINUE', 'ENDLOOP'):
+				loop = next((b for b in reversed(blocks) if b['kind'] == 'LOOP'), None)
+				if loop is None or (opname == 'ENDLOOP' and blocks[-1] is not loop):
+					self.error(func, pc, f"{opname} fuera de un LOOP")
+				if opname in ('CBREAK', 'CBREAK_IF_FALSE'):
+					if state is not None:
+						self.pop(func, pc, state, 'I')
+						loop['exit'] = self.merge(func, pc, loop['exit'], list(state), "salidas del LOOP")
+				else:
+					if state is not None:
+						self.merge(func, pc, loop['entry'], state, "regreso al inicio del LOOP")
+					if opname == 'ENDLOOP':
+						blocks.pop()
+						state = loop['exit']
+					else:
+						state = None
+			elif state is None:
+				continue      # Código inalcanzable, no aporta a la pila
+			elif opname == 'RET':
+				if len(state) != 1:
+					self.error(func, pc, f"RET espera exactamente un valor en la pila, hay {state}")
+				self.pop(func, pc, state, func.return_type)
+				state = None
+			elif opname == 'DROP':
+				self.pop(func, pc, state, None)
+			elif opname in ('LOCAL_GET', 'LOCAL_SET'):
+				if instr[1] not in func.locals:
+					self.error(func, pc, f"variable local '{instr[1]}' no declarada")
+				self.access(func, pc, state, opname, func.locals[instr[1]])
+			elif opname in ('GLOBAL_GET', 'GLOBAL_SET'):
+				glob = self.module.globals.get(instr[1])
+				if glob is None:
+					self.error(func, pc, f"variable global '{instr[1]}' no declarada")
+				self.access(func, pc, state, opname, glob.type)
+			elif opname == 'CALL':
+				callee = self.module.functions.get(instr[1])
+				if callee is None:
+					self.error(func, pc, f"función '{instr[1]}' no definida")
+				for parmtype in reversed(callee.parmtypes):
+					self.pop(func, pc, state, parmtype)
+				state.append(callee.return_type)
+			elif opname in ir_signatures:
+				pops, pushes = ir_signatures[opname]
+				for expected in reversed(pops):
+					self.pop(func, pc, state, expected)
+				state.extend(pushes)
+			else:
+				self.error(func, pc, "instrucción desconocida")
+		if blocks:
+			self.error(func, len(func.code), f"{blocks[-1]['kind']} sin cerrar")
+		if state is not None:
+			self.error(func, len(func.code), "la función puede terminar sin RET")
+
+	def access(self, func, pc, state, opname, var_type):
+		if opname.endswith('_GET'):
+			state.append(var_type)
+		else:
+			self.pop(func, pc, state, var_type)